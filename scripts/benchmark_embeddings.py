@@ -0,0 +1,114 @@
+"""
+Embedding backend benchmark
+
+Compares query latency and batch throughput of the embedding backends.
+Throughput is reported per wall-clock second and per CPU-second consumed
+by this process, which approximates throughput per core.
+
+Usage:
+    python scripts/benchmark_embeddings.py --backends openai local --queries 50
+"""
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import get_settings
+from src.core.rag.embedding_backends import create_embedding_backend
+from src.core.rag.loaders import iter_documents
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SAMPLE_QUERIES = [
+    "What is Ashish's experience with Python?",
+    "Where did Ashish study?",
+    "What projects has Ashish built?",
+    "Which cloud platforms does Ashish know?",
+    "What are Ashish's hobbies?",
+]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def benchmark_backend(
+    backend_name: str,
+    documents: list[str],
+    num_queries: int,
+) -> dict:
+    """Measure one backend"""
+    load_start = time.perf_counter()
+    backend = create_embedding_backend(backend_name)
+    load_ms = (time.perf_counter() - load_start) * 1000
+
+    # Warm up (model load / connection setup)
+    await backend.aembed_query(SAMPLE_QUERIES[0])
+
+    latencies = []
+    for i in range(num_queries):
+        query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+        start = time.perf_counter()
+        await backend.aembed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    await backend.aembed_documents(documents)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    return {
+        "backend": backend_name,
+        "load_ms": load_ms,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "docs_per_sec": len(documents) / wall if wall else 0.0,
+        "docs_per_cpu_sec": len(documents) / cpu if cpu else float("inf"),
+    }
+
+
+async def run_benchmark(backends: list[str], data_dir: str, num_queries: int) -> None:
+    from src.core.rag.vector_store import get_vector_store_manager
+
+    chunks = [
+        chunk for chunk, _ in get_vector_store_manager().iter_chunks(iter_documents(Path(data_dir)))
+    ]
+    logger.info(f"Benchmarking with {len(chunks)} chunks and {num_queries} queries")
+
+    results = []
+    for backend_name in backends:
+        try:
+            results.append(await benchmark_backend(backend_name, chunks, num_queries))
+        except Exception as e:
+            logger.error(f"❌ {backend_name} failed: {e}")
+
+    header = f"{'backend':<10}{'load ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'docs/s':>10}{'docs/cpu-s':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['backend']:<10}{r['load_ms']:>10.0f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['docs_per_sec']:>10.1f}{r['docs_per_cpu_sec']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["openai", "local"])
+    parser.add_argument("--data-dir", default=settings.knowledge_base_directory)
+    parser.add_argument("--queries", type=int, default=50)
+
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.backends, args.data_dir, args.queries))
@@ -0,0 +1,192 @@
+"""
+Tenant switching benchmark
+
+Creates N synthetic tenants (random vectors, no embedding calls) in a
+scratch Chroma directory and measures, through the TenantRegistry:
+- cold switch latency: first request for a tenant (load + warm + query)
+- warm switch latency: request for a resident tenant (lookup + query)
+- process RSS and the registry's estimated resident bytes
+
+Usage:
+    python scripts/benchmark_tenants.py --tenants 1000 10000 --budget-mb 256
+"""
+import asyncio
+import logging
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import get_settings
+from src.core.rag import vector_store as vector_store_module
+from src.core.rag.embedding_backends import get_embedding_identity
+from src.services.tenants import TenantRegistry, load_tenant, tenant_vector_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _rss_mb() -> float:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_tenants(root: Path, num_tenants: int, chunks: int, dimension: int) -> list[str]:
+    """Create tenant directories and pre-populated collections"""
+    identity = get_embedding_identity()
+    rng = np.random.default_rng(0)
+
+    tenant_ids = []
+    for i in range(num_tenants):
+        tenant_id = f"t{i:05d}"
+        (root / "tenants" / tenant_id / "knowledge_base").mkdir(parents=True)
+
+        vectors = rng.standard_normal((chunks, dimension), dtype=np.float32)
+        vector_store = tenant_vector_store(load_tenant(tenant_id))
+        collection = vector_store.client.create_collection(f"tenant_{tenant_id}", metadata=dict(identity))
+        collection.add(
+            ids=[f"{tenant_id}-{c}" for c in range(chunks)],
+            embeddings=vectors.tolist(),
+            documents=[f"Chunk {c} of {tenant_id}" for c in range(chunks)],
+            metadatas=[{"source": f"{tenant_id}.md", "chunk_index": c} for c in range(chunks)],
+        )
+        vector_store.close()
+        tenant_ids.append(tenant_id)
+        if (i + 1) % 1000 == 0:
+            logger.info(f"Created {i + 1}/{num_tenants} tenants")
+    return tenant_ids
+
+
+async def run_requests(
+    registry: TenantRegistry,
+    tenant_ids: list[str],
+    samples: int,
+    dimension: int,
+    hot_fraction: float
+) -> dict:
+    """Replay a skewed tenant mix and time each request"""
+    rng = random.Random(0)
+    hot = tenant_ids[:max(1, int(len(tenant_ids) * hot_fraction))]
+    query = np.random.default_rng(1).standard_normal(dimension, dtype=np.float32).tolist()
+
+    cold, warm = [], []
+    for _ in range(samples):
+        # 80% of traffic goes to the hot set
+        tenant_id = rng.choice(hot) if rng.random() < 0.8 else rng.choice(tenant_ids)
+        misses = registry.misses
+        start = time.perf_counter()
+        async with registry.use(tenant_id) as resident:
+            vector_store = resident.vector_store
+            collection = vector_store.client.get_collection(vector_store.active_collection_name)
+            await asyncio.to_thread(collection.query, query_embeddings=[query], n_results=4)
+        elapsed = (time.perf_counter() - start) * 1000
+        (cold if registry.misses > misses else warm).append(elapsed)
+
+    def summary(values: list[float]) -> dict:
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "p50_ms": round(statistics.median(values), 2),
+            "p95_ms": round(_percentile(values, 95), 2),
+            "p99_ms": round(_percentile(values, 99), 2),
+        }
+
+    return {"cold": summary(cold), "warm": summary(warm)}
+
+
+async def benchmark(
+    num_tenants: int,
+    chunks: int,
+    dimension: int,
+    samples: int,
+    budget_mb: int,
+    pinned: int
+) -> dict:
+    """Benchmark one tenant count in a fresh scratch store"""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        settings.chroma_persist_directory = str(root / "chroma")
+        settings.tenants_directory = str(root / "tenants")
+        settings.tenant_memory_budget_mb = budget_mb
+        vector_store_module._chroma_client = None
+
+        build_start = time.perf_counter()
+        tenant_ids = await asyncio.to_thread(create_tenants, root, num_tenants, chunks, dimension)
+        build_s = time.perf_counter() - build_start
+
+        rss_before = _rss_mb()
+        registry = TenantRegistry(
+            budget_bytes=budget_mb * 1024 * 1024,
+            pinned=set(tenant_ids[:pinned]),
+        )
+        latencies = await run_requests(registry, tenant_ids, samples, dimension, hot_fraction=0.01)
+        stats = registry.get_stats()
+
+        return {
+            "tenants": num_tenants,
+            "build_s": round(build_s, 1),
+            **latencies,
+            "resident_tenants": stats["resident"],
+            "resident_mb_estimated": round(stats["resident_bytes"] / 1024 / 1024, 1),
+            "rss_before_mb": round(rss_before, 1),
+            "rss_after_mb": round(_rss_mb(), 1),
+        }
+
+
+def print_report(results: list[dict]) -> None:
+    print()
+    print(
+        f"{'tenants':>8} {'cold p50':>9} {'cold p99':>9} {'warm p50':>9} {'warm p99':>9} "
+        f"{'resident':>9} {'est MB':>7} {'RSS MB':>7}"
+    )
+    for r in results:
+        print(
+            f"{r['tenants']:>8} {r['cold'].get('p50_ms', 0):>9} {r['cold'].get('p99_ms', 0):>9} "
+            f"{r['warm'].get('p50_ms', 0):>9} {r['warm'].get('p99_ms', 0):>9} "
+            f"{r['resident_tenants']:>9} {r['resident_mb_estimated']:>7} {r['rss_after_mb']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark tenant switching")
+    parser.add_argument("--tenants", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per tenant")
+    parser.add_argument("--dimension", type=int, default=384, help="Vector dimension")
+    parser.add_argument("--samples", type=int, default=2000, help="Requests per run")
+    parser.add_argument("--budget-mb", type=int, default=64, help="Tenant memory budget")
+    parser.add_argument("--pinned", type=int, default=10, help="Hot tenants to pin")
+
+    args = parser.parse_args()
+
+    async def main():
+        results = []
+        for num_tenants in args.tenants:
+            logger.info(f"Benchmarking {num_tenants} tenants...")
+            results.append(await benchmark(
+                num_tenants, args.chunks, args.dimension, args.samples, args.budget_mb, args.pinned
+            ))
+        print_report(results)
+
+    asyncio.run(main())
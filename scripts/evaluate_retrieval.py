@@ -0,0 +1,304 @@
+"""
+Retrieval evaluation and parameter sweep
+
+Builds a temporary index for every (chunk_size, chunk_overlap) pair over
+the knowledge base, replays a labeled question set at each top-k and
+reports per configuration:
+- recall@k: share of each question's expected facts found in the results
+- MRR: reciprocal rank of the first result containing an expected fact
+- index build time (embedding time reported separately) and index bytes
+- search latency percentiles
+- average prompt tokens of the resulting LLM request
+
+Embeddings are kept in an on-disk cache keyed by backend and model, so a
+sweep only pays for chunks it has never embedded before. Configurations
+not dominated on any metric are marked as Pareto-optimal.
+
+Questions are JSONL: {"question": ..., "expected": [facts], "sources": [files]}
+(``sources`` is optional and restricts which files count as evidence).
+
+Usage:
+    python scripts/evaluate_retrieval.py --chunk-sizes 500 1000 1500 \\
+        --overlaps 0 100 200 --top-k 2 4 6 --output sweep.json
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import get_settings
+from src.core.llm.client import get_llm_client
+from src.core.rag import vector_store as vector_store_module
+from src.core.rag.embedding_backends import get_embedding_identity
+from src.core.rag.embeddings import get_embeddings_manager
+from src.core.rag.loaders import iter_documents
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# (metric, higher is better) used for Pareto dominance
+OBJECTIVES = [
+    ("recall", True),
+    ("mrr", True),
+    ("p95_ms", False),
+    ("prompt_tokens", False),
+    ("index_bytes", False),
+]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class EmbeddingCache:
+    """
+    Embeddings persisted between runs, one file per backend and model
+
+    Loaded into the EmbeddingsManager's in-memory cache, which is keyed by
+    a hash of the text, and written back after the sweep.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        identity = json.dumps(get_embedding_identity(), sort_keys=True)
+        digest = hashlib.sha256(identity.encode()).hexdigest()[:16]
+        self.path = directory / f"embeddings-{digest}.npz"
+        self.loaded = 0
+
+    def load(self, cache: dict[str, list[float]]) -> None:
+        if not self.path.exists():
+            return
+        data = np.load(self.path)
+        for key, vector in zip(data["keys"], data["vectors"]):
+            cache[str(key)] = vector.tolist()
+        self.loaded = len(data["keys"])
+
+    def save(self, cache: dict[str, list[float]]) -> None:
+        if not cache:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        keys = list(cache)
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp_path,
+            keys=np.array(keys),
+            vectors=np.asarray([cache[key] for key in keys], dtype=np.float32),
+        )
+        tmp_path.replace(self.path)
+
+
+def load_questions(path: Path) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _found(content: str, metadata: dict, question: dict) -> set[str]:
+    """Expected facts present in one retrieved chunk"""
+    sources = question.get("sources")
+    if sources and metadata.get("source") not in sources:
+        return set()
+    text = content.lower()
+    return {fact for fact in question["expected"] if fact.lower() in text}
+
+
+def _directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+async def build_index(
+    root: Path,
+    knowledge_base: Path,
+    chunk_size: int,
+    chunk_overlap: int
+) -> tuple[vector_store_module.VectorStoreManager, dict]:
+    """Build and activate an index in its own Chroma directory"""
+    persist_directory = root / f"cs{chunk_size}_ov{chunk_overlap}"
+    settings.chunk_size = chunk_size
+    settings.chunk_overlap = chunk_overlap
+    settings.chroma_persist_directory = str(persist_directory)
+    vector_store_module._chroma_client = None
+
+    vector_store = vector_store_module.VectorStoreManager(
+        collection_name="eval",
+        data_dir=knowledge_base,
+    )
+    embeddings_manager = vector_store.embeddings_manager
+
+    build_start = time.perf_counter()
+    ids, chunks, metadatas = [], [], []
+    for chunk, metadata in vector_store.iter_chunks(iter_documents(knowledge_base)):
+        ids.append(metadata["chunk_id"])
+        chunks.append(chunk)
+        metadatas.append(metadata)
+
+    embed_start = time.perf_counter()
+    cached_before = embeddings_manager.get_cache_size()
+    embeddings = await embeddings_manager.embed_documents(chunks)
+    embed_s = time.perf_counter() - embed_start
+
+    name = await vector_store.build_version(
+        ids, chunks, metadatas, embeddings=np.asarray(embeddings, dtype=np.float32)
+    )
+    await vector_store.activate_version(name)
+    build_s = time.perf_counter() - build_start
+
+    return vector_store, {
+        "chunks": len(chunks),
+        "embedded": embeddings_manager.get_cache_size() - cached_before,
+        "embed_s": round(embed_s, 2),
+        "build_s": round(build_s - embed_s, 2),
+        "index_bytes": _directory_bytes(persist_directory),
+    }
+
+
+async def evaluate(
+    vector_store: vector_store_module.VectorStoreManager,
+    questions: list[dict],
+    k: int
+) -> dict:
+    """Replay the questions against one index at one top-k"""
+    llm_client = get_llm_client()
+    embeddings_manager = vector_store.embeddings_manager
+
+    # Warm up so the first query does not pay for index loading
+    await vector_store.similarity_search(questions[0]["question"], k=k)
+
+    recalls, reciprocal_ranks, latencies, prompt_tokens = [], [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        results = await vector_store.similarity_search(question["question"], k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        found: set[str] = set()
+        first_hit = None
+        for rank, (content, metadata, _) in enumerate(results, 1):
+            hits = _found(content, metadata, question)
+            if hits and first_hit is None:
+                first_hit = rank
+            found |= hits
+        recalls.append(len(found) / len(question["expected"]))
+        reciprocal_ranks.append(1 / first_hit if first_hit else 0.0)
+
+        messages = llm_client._build_messages(question["question"], results)
+        prompt_tokens.append(sum(embeddings_manager.count_tokens(m.content) for m in messages))
+
+    return {
+        "recall": round(statistics.mean(recalls), 3),
+        "mrr": round(statistics.mean(reciprocal_ranks), 3),
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "prompt_tokens": round(statistics.mean(prompt_tokens), 1),
+    }
+
+
+def mark_pareto(results: list[dict]) -> None:
+    """Flag configurations no other configuration beats on every objective"""
+    def dominates(a: dict, b: dict) -> bool:
+        at_least = all(
+            (a[m] >= b[m]) if higher else (a[m] <= b[m]) for m, higher in OBJECTIVES
+        )
+        better = any(
+            (a[m] > b[m]) if higher else (a[m] < b[m]) for m, higher in OBJECTIVES
+        )
+        return at_least and better
+
+    for result in results:
+        result["pareto"] = not any(dominates(other, result) for other in results)
+
+
+async def sweep(
+    knowledge_base: Path,
+    questions: list[dict],
+    chunk_sizes: list[int],
+    overlaps: list[int],
+    top_ks: list[int],
+    cache_dir: Path
+) -> list[dict]:
+    embeddings_manager = get_embeddings_manager()
+    cache = EmbeddingCache(cache_dir)
+    cache.load(embeddings_manager._cache)
+    logger.info(f"Loaded {cache.loaded} cached embeddings from {cache.path}")
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for chunk_size in chunk_sizes:
+                for chunk_overlap in overlaps:
+                    if chunk_overlap >= chunk_size:
+                        continue
+                    vector_store, build = await build_index(
+                        Path(tmp), knowledge_base, chunk_size, chunk_overlap
+                    )
+                    for k in top_ks:
+                        results.append({
+                            "chunk_size": chunk_size,
+                            "chunk_overlap": chunk_overlap,
+                            "top_k": k,
+                            **build,
+                            **await evaluate(vector_store, questions, k),
+                        })
+                    logger.info(
+                        f"chunk_size={chunk_size} overlap={chunk_overlap}: "
+                        f"{build['chunks']} chunks, {build['embedded']} newly embedded"
+                    )
+    finally:
+        cache.save(embeddings_manager._cache)
+
+    mark_pareto(results)
+    return results
+
+
+def print_report(results: list[dict]) -> None:
+    print()
+    print(
+        f"{'size':>5} {'overlap':>7} {'k':>3} {'recall':>7} {'MRR':>6} {'build s':>8} "
+        f"{'index KB':>9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'tokens':>7}  pareto"
+    )
+    for r in results:
+        print(
+            f"{r['chunk_size']:>5} {r['chunk_overlap']:>7} {r['top_k']:>3} {r['recall']:>7} "
+            f"{r['mrr']:>6} {r['build_s']:>8} {r['index_bytes'] // 1024:>9} {r['p50_ms']:>7} "
+            f"{r['p95_ms']:>7} {r['p99_ms']:>7} {r['prompt_tokens']:>7}  "
+            f"{'*' if r['pareto'] else ''}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate retrieval settings")
+    parser.add_argument("--questions", type=Path, default=Path("data/eval/questions.jsonl"))
+    parser.add_argument("--knowledge-base", type=Path, default=Path(settings.knowledge_base_directory))
+    parser.add_argument("--chunk-sizes", nargs="+", type=int, default=[settings.chunk_size])
+    parser.add_argument("--overlaps", nargs="+", type=int, default=[settings.chunk_overlap])
+    parser.add_argument("--top-k", nargs="+", type=int, default=[settings.retrieval_top_k])
+    parser.add_argument("--cache-dir", type=Path, default=Path("data/eval/cache"))
+    parser.add_argument("--output", type=Path, help="Also write results as JSON")
+
+    args = parser.parse_args()
+
+    results = asyncio.run(sweep(
+        args.knowledge_base,
+        load_questions(args.questions),
+        args.chunk_sizes,
+        args.overlaps,
+        args.top_k,
+        args.cache_dir,
+    ))
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
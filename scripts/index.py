@@ -0,0 +1,121 @@
+"""
+Index snapshot CLI
+
+Usage:
+    python scripts/index.py build --data-dir ./data/knowledge_base --output ./data/index
+    python scripts/index.py verify --path ./data/index
+"""
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import get_settings
+from src.core.rag.loaders import iter_documents
+from src.core.rag.snapshot import compute_corpus_hash, load_snapshot, write_snapshot
+from src.core.rag.vector_store import get_vector_store_manager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def build_index(data_dir: str, output_dir: str) -> None:
+    """
+    Build an index snapshot from the knowledge base
+
+    Steps:
+    1. Load supported files
+    2. Split into chunks
+    3. Create embeddings
+    4. Write vectors, chunks and metadata with checksums
+    """
+    start = time.perf_counter()
+    data_path = Path(data_dir)
+    vector_store = get_vector_store_manager()
+
+    logger.info(f"📂 Loading documents from: {data_path}")
+    pairs = list(vector_store.iter_chunks(iter_documents(data_path)))
+    if not pairs:
+        logger.warning("⚠️  No documents found!")
+        return
+
+    chunks = [chunk for chunk, _ in pairs]
+    chunk_metadatas = [metadata for _, metadata in pairs]
+    ids = [metadata["chunk_id"] for metadata in chunk_metadatas]
+
+    identity = vector_store.embedding_identity
+    logger.info(
+        f"🧮 Embedding {len(chunks)} chunks with "
+        f"{identity['embedding_backend']}:{identity['embedding_model']}..."
+    )
+    batch_size = settings.ingest_batch_size
+    embeddings = []
+    for start in range(0, len(chunks), batch_size):
+        embeddings.extend(
+            await vector_store.embeddings.aembed_documents(chunks[start:start + batch_size])
+        )
+
+    snapshot = write_snapshot(
+        output_dir=Path(output_dir),
+        ids=ids,
+        chunks=chunks,
+        metadatas=chunk_metadatas,
+        embeddings=embeddings,
+        corpus_hash=compute_corpus_hash(data_path),
+    )
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"✅ Built snapshot {snapshot.version} with {snapshot.count} chunks in {elapsed:.1f}s"
+    )
+
+
+def verify_index(path: str) -> bool:
+    """Verify a snapshot's checksums"""
+    snapshot = load_snapshot(Path(path), verify=True)
+    if snapshot is None:
+        logger.error(f"❌ No valid snapshot at {path}")
+        return False
+
+    logger.info(
+        f"✅ Snapshot {snapshot.version}: {snapshot.count} chunks, "
+        f"matches current settings: {snapshot.matches()}"
+    )
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build and inspect index snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build a snapshot from the knowledge base")
+    build_parser.add_argument(
+        "--data-dir",
+        default=settings.knowledge_base_directory,
+        help="Directory with markdown files"
+    )
+    build_parser.add_argument(
+        "--output",
+        default=settings.index_snapshot_directory,
+        help="Snapshot output directory"
+    )
+
+    verify_parser = subparsers.add_parser("verify", help="Verify a snapshot's checksums")
+    verify_parser.add_argument(
+        "--path",
+        default=settings.index_snapshot_directory,
+        help="Snapshot directory"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        asyncio.run(build_index(args.data_dir, args.output))
+    elif args.command == "verify":
+        sys.exit(0 if verify_index(args.path) else 1)
@@ -1,3 +1,13 @@
+"""
+Knowledge base ingestion
+
+Re-indexes a knowledge base in this process (see
+src/services/ingest_worker.py), optionally watching it for edits afterwards.
+
+Usage:
+    python scripts/ingest_data.py --data-dir ./data/knowledge_base
+    python scripts/ingest_data.py --tenant acme --watch
+"""
 import asyncio
 import logging
 import sys
@@ -5,91 +15,13 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.core.rag.vector_store import get_vector_store_manager
+from src.config.settings import get_settings
+from src.services.ingest_worker import ingest_data
+from src.services.tenants import resolve_target
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-
-
-async def load_markdown_files(directory: Path) -> list[tuple[str, dict]]:
-    """
-    Load all .md files from a directory
-    
-    Returns:
-        List of (content, metadata) tuples
-    """
-    documents = []
-    
-    if not directory.exists():
-        logger.error(f"Directory not found: {directory}")
-        return documents
-    
-    # Find all markdown files
-    for file_path in directory.glob("**/*.md"):
-        try:
-            # Read file content
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            
-            # Create metadata
-            metadata = {
-                "source": file_path.name,
-                "path": str(file_path.relative_to(directory)),
-                "type": "markdown"
-            }
-            
-            documents.append((content, metadata))
-            logger.info(f"✅ Loaded: {file_path.name}")
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to load {file_path}: {e}")
-    
-    return documents
-
-
-async def ingest_data(data_dir: str = "./data/knowledge_base"):
-    """
-    Main ingestion function
-    
-    Steps:
-    1. Load markdown files
-    2. Split into chunks
-    3. Create embeddings
-    4. Store in vector database
-    """
-    try:
-        vector_store = get_vector_store_manager()
-        
-        # Load documents
-        data_path = Path(data_dir)
-        logger.info(f"📂 Loading documents from: {data_path}")
-        
-        doc_data = await load_markdown_files(data_path)
-        
-        if not doc_data:
-            logger.warning("⚠️  No documents found!")
-            return
-        
-        # Separate content and metadata
-        documents = [content for content, _ in doc_data]
-        metadatas = [metadata for _, metadata in doc_data]
-        
-        # Add to vector store
-        logger.info(f"💾 Adding {len(documents)} documents to vector store...")
-        doc_ids = await vector_store.add_documents(
-            documents=documents,
-            metadatas=metadatas
-        )
-        
-        logger.info(f"✅ Successfully added {len(doc_ids)} document chunks")
-        
-        # Show stats
-        stats = await vector_store.get_collection_stats()
-        logger.info(f"📊 Collection now has {stats.get('count', 0)} total chunks")
-        
-    except Exception as e:
-        logger.error(f"❌ Ingestion failed: {e}", exc_info=True)
-        raise
+settings = get_settings()
 
 
 if __name__ == "__main__":
@@ -99,10 +31,35 @@ if __name__ == "__main__":
     parser.add_argument(
         "--data-dir",
         default="./data/knowledge_base",
-        help="Directory with markdown files"
+        help="Knowledge base directory"
+    )
+    
+    parser.add_argument(
+        "--tenant",
+        default=None,
+        help="Ingest a tenant's knowledge base into its own collection"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After ingesting, keep the index in sync with edits to the directory"
     )
     
     args = parser.parse_args()
     
+    async def main():
+        await ingest_data(args.data_dir, tenant_id=args.tenant)
+        if args.watch:
+            from src.core.rag.watcher import KnowledgeBaseWatcher
+            
+            vector_store, data_path = resolve_target(args.data_dir, args.tenant)
+            watcher = KnowledgeBaseWatcher(
+                vector_store=vector_store,
+                data_dir=data_path,
+                interval=settings.knowledge_base_watch_interval,
+                debounce=settings.knowledge_base_watch_debounce,
+            )
+            await watcher.run()
+    
     # Run ingestion
-    asyncio.run(ingest_data(args.data_dir))
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Ingestion worker
+
+Runs re-index jobs queued through /admin/ingest/jobs (or by the API at
+startup with INGEST_WORKER_ENABLED=true), so embedding and writing never
+share a process with live queries.
+
+Usage:
+    python scripts/ingest_worker.py
+    python scripts/ingest_worker.py --once --concurrency 2
+"""
+import asyncio
+import logging
+import signal
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import get_settings
+from src.services.ingest_jobs import get_ingest_queue
+from src.services.ingest_worker import create_worker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def run_worker(once: bool = False, concurrency: int | None = None) -> None:
+    """Drain the queue until SIGTERM/SIGINT (or until empty with ``once``)"""
+    queue = get_ingest_queue()
+    worker = create_worker(queue)
+    if concurrency is not None:
+        worker.concurrency = concurrency
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run(once=once)
+    finally:
+        await queue.store.close()
+        logger.info("Ingest worker stopped")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run queued ingestion jobs")
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Exit when the queue is empty"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"Jobs run at once (default {settings.ingest_worker_concurrency})"
+    )
+
+    args = parser.parse_args()
+    asyncio.run(run_worker(once=args.once, concurrency=args.concurrency))
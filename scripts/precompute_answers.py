@@ -0,0 +1,139 @@
+"""
+Answer precompute job
+
+Generates answers for a curated and/or mined list of questions against the
+current index and stores them in the answer table. Ingest jobs refresh the
+table after a re-index; run with --refresh after edits picked up by the
+knowledge base watcher, which leave the stored answers stale.
+
+Usage:
+    python scripts/precompute_answers.py --questions data/answers/questions.txt
+    python scripts/precompute_answers.py --from-logs logs/app.jsonl --top 100
+    python scripts/precompute_answers.py --refresh
+"""
+import asyncio
+import json
+import logging
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import get_settings
+from src.services.answer_table import get_answer_table
+from src.services.chat_service import get_chat_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def load_questions(path: Path) -> list[str]:
+    """
+    Read questions from a text file (one per line, # comments) or a JSONL
+    file with a "question" field
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.suffix == ".jsonl":
+                question = json.loads(line).get("question")
+                if question:
+                    questions.append(question)
+            else:
+                questions.append(line)
+    return questions
+
+
+def mine_questions_from_logs(paths: list[Path], top: int) -> list[str]:
+    """
+    Most frequent questions in JSON request logs
+
+    Reads the "question" field of the request summary lines (LOG_FORMAT=json)
+    written for every chat request at INFO.
+    """
+    counts: Counter[str] = Counter()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                question = (record.get("request") or {}).get("question")
+                if isinstance(question, str) and question.strip():
+                    counts[" ".join(question.split())] += 1
+    return [question for question, _ in counts.most_common(top)]
+
+
+async def precompute(questions: list[str]) -> None:
+    """Generate and store answers for ``questions``"""
+    # Deduplicate while keeping order
+    seen = set()
+    unique = []
+    for question in questions:
+        key = question.lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(question)
+
+    if not unique:
+        logger.warning("⚠️  No questions to precompute")
+        return
+
+    chat_service = get_chat_service()
+    table = get_answer_table()
+
+    logger.info(f"🧮 Precomputing {len(unique)} answers...")
+    count = await table.regenerate(chat_service.precompute_answer, questions=unique)
+    logger.info(f"✅ Stored {count} answers in {table.path}")
+
+
+async def refresh() -> None:
+    """Regenerate the stored questions if the index changed since"""
+    count = await get_chat_service().refresh_answer_table()
+    if count:
+        logger.info(f"✅ Regenerated {count} answers in {get_answer_table().path}")
+    else:
+        logger.info("Precomputed answers are up to date")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute answers for known questions")
+    parser.add_argument(
+        "--questions",
+        nargs="*",
+        default=["./data/answers/questions.txt"],
+        help="Question files (.txt or .jsonl)"
+    )
+    parser.add_argument(
+        "--from-logs",
+        nargs="*",
+        default=[],
+        help="JSON log files to mine frequent questions from"
+    )
+    parser.add_argument("--top", type=int, default=100, help="Questions to take from logs")
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Regenerate the stored questions against the current index instead"
+    )
+
+    args = parser.parse_args()
+    if args.refresh:
+        asyncio.run(refresh())
+        sys.exit(0)
+
+    questions = []
+    for path in args.questions:
+        questions.extend(load_questions(Path(path)))
+    if args.from_logs:
+        questions.extend(mine_questions_from_logs([Path(p) for p in args.from_logs], args.top))
+
+    asyncio.run(precompute(questions))
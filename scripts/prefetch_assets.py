@@ -0,0 +1,48 @@
+"""
+Asset prefetch CLI
+
+Downloads tokenizer encodings (and the local embedding model when
+EMBEDDING_BACKEND=local) into the versioned asset cache and writes a
+checksum manifest. Run at image build time so containers start without
+network access.
+
+Usage:
+    python scripts/prefetch_assets.py
+    python scripts/prefetch_assets.py --verify
+"""
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.assets import AssetError, asset_root, load_assets, prefetch_assets
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prefetch tokenizer and model assets")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Verify and time the existing cache instead of downloading"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        if not args.verify:
+            manifest = prefetch_assets()
+            for asset in manifest["assets"]:
+                logger.info(f"✅ {asset['name']}: {len(asset['files'])} files, {asset['bytes']} bytes")
+        report = load_assets(verify=True)
+        if not report:
+            logger.error(f"❌ No assets found in {asset_root()}")
+            sys.exit(1)
+    except AssetError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
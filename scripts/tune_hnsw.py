@@ -0,0 +1,229 @@
+"""
+HNSW auto-tuner
+
+Sweeps the HNSW graph degree (M) and query-time candidate list (ef_search)
+over the vectors of the live index and reports, per setting:
+- recall@k against exact search in the configured distance space
+- single-query search latency percentiles
+- graph build time
+
+Queries are held out: the labeled questions (embedded through the same
+on-disk cache as evaluate_retrieval.py) plus a sample of stored chunk
+vectors that are left out of the index being measured. The fastest
+setting (by p95) that reaches the target recall is recorded as the
+recommendation; apply it through the settings and re-index.
+
+Usage:
+    python scripts/tune_hnsw.py --target-recall 0.95 --m 8 16 32 \\
+        --ef-search 10 20 40 80 160 --output data/eval/hnsw_tuning.json
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import hnswlib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.evaluate_retrieval import EmbeddingCache, _percentile, load_questions
+from src.config.settings import get_settings
+from src.core.rag.distance import DISTANCE_SPACES, distances
+from src.core.rag.embeddings import get_embeddings_manager
+from src.core.rag.snapshot import load_snapshot
+from src.core.rag.vector_store import get_vector_store_manager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def load_index_vectors(snapshot_path: Optional[Path], page_size: int = 1000) -> np.ndarray:
+    """Vectors of a snapshot, or of the active collection version"""
+    if snapshot_path is not None:
+        snapshot = load_snapshot(snapshot_path, verify=False)
+        if snapshot is None:
+            raise ValueError(f"No index snapshot at {snapshot_path}")
+        return np.asarray(snapshot.vectors, dtype=np.float32)
+
+    vector_store = get_vector_store_manager()
+    collection = vector_store.client.get_collection(vector_store.active_collection_name)
+    pages, offset = [], 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += page_size
+    if not pages:
+        raise ValueError(f"Collection {collection.name} is empty; ingest first")
+    return np.concatenate(pages)
+
+
+async def embed_questions(questions: list[dict], cache_dir: Path) -> np.ndarray:
+    """Question embeddings, reusing and extending the evaluation cache"""
+    embeddings_manager = get_embeddings_manager()
+    cache = EmbeddingCache(cache_dir)
+    cache.load(embeddings_manager._cache)
+    try:
+        vectors = [await embeddings_manager.embed_text(q["question"]) for q in questions]
+    finally:
+        cache.save(embeddings_manager._cache)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def split_holdout(
+    vectors: np.ndarray,
+    fraction: float,
+    seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """(indexed, held-out) rows; held-out chunks are queries, not results"""
+    count = int(len(vectors) * fraction)
+    if count == 0:
+        return vectors, vectors[:0]
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[count:]], vectors[order[:count]]
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Row indices of the true ``k`` nearest vectors of every query"""
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+    truth = np.empty((len(queries), k), dtype=np.int64)
+    for row, query in enumerate(queries):
+        d = distances(vectors, query, space, norms)
+        nearest = np.argpartition(d, k - 1)[:k]
+        truth[row] = nearest[np.argsort(d[nearest], kind="stable")]
+    return truth
+
+
+def sweep(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    space: str,
+    k: int,
+    ms: list[int],
+    ef_searches: list[int],
+    construction_ef: int
+) -> list[dict]:
+    """Recall and latency of every (M, ef_search) pair"""
+    k = min(k, len(vectors))
+    truth = exact_neighbours(vectors, queries, k, space)
+
+    results = []
+    for m in ms:
+        index = hnswlib.Index(space=space, dim=vectors.shape[1])
+        build_start = time.perf_counter()
+        index.init_index(max_elements=len(vectors), ef_construction=construction_ef, M=m)
+        index.add_items(vectors, np.arange(len(vectors)))
+        build_s = time.perf_counter() - build_start
+
+        for ef_search in ef_searches:
+            index.set_ef(max(ef_search, k))  # hnswlib never searches fewer than k
+            latencies, recalls = [], []
+            for row, query in enumerate(queries):
+                start = time.perf_counter()
+                labels, _ = index.knn_query(query, k=k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(set(labels[0].tolist()) & set(truth[row].tolist())) / k)
+
+            results.append({
+                "m": m,
+                "ef_search": ef_search,
+                "recall": round(float(np.mean(recalls)), 4),
+                "p50_ms": round(_percentile(latencies, 50), 4),
+                "p95_ms": round(_percentile(latencies, 95), 4),
+                "build_s": round(build_s, 3),
+            })
+        logger.info(f"M={m}: built in {build_s:.2f}s, {len(ef_searches)} ef_search values measured")
+    return results
+
+
+def recommend(results: list[dict], target_recall: float) -> Optional[dict]:
+    """Fastest setting meeting the target (smaller M, then ef_search, on ties)"""
+    eligible = [r for r in results if r["recall"] >= target_recall]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda r: (r["p95_ms"], r["m"], r["ef_search"]))
+
+
+def print_report(results: list[dict], best: Optional[dict]) -> None:
+    print()
+    print(f"{'M':>4} {'ef_search':>9} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for r in results:
+        print(
+            f"{r['m']:>4} {r['ef_search']:>9} {r['recall']:>7} {r['p50_ms']:>8} "
+            f"{r['p95_ms']:>8} {r['build_s']:>8}  {'<- recommended' if r is best else ''}"
+        )
+
+
+async def tune(args) -> dict:
+    vectors = load_index_vectors(args.snapshot)
+    indexed, held_out = split_holdout(vectors, args.holdout)
+    query_sets = [held_out]
+    if args.questions is not None and args.questions.exists():
+        query_sets.append(await embed_questions(load_questions(args.questions), args.cache_dir))
+    queries = np.concatenate(query_sets)
+    if not len(queries):
+        raise ValueError("No held-out queries; pass --questions or raise --holdout")
+    logger.info(
+        f"Tuning {args.space} over {len(indexed)} vectors with {len(queries)} held-out queries"
+    )
+
+    results = sweep(
+        indexed, queries, args.space, args.top_k, args.m, args.ef_search, args.construction_ef
+    )
+    best = recommend(results, args.target_recall)
+    print_report(results, best)
+
+    report = {
+        "space": args.space,
+        "top_k": args.top_k,
+        "target_recall": args.target_recall,
+        "construction_ef": args.construction_ef,
+        "vectors": len(indexed),
+        "queries": len(queries),
+        "recommended": None,
+        "results": results,
+    }
+    if best is None:
+        print(f"\nNo setting reached recall {args.target_recall}; try larger --m or --ef-search values")
+    else:
+        report["recommended"] = {
+            "vector_distance": args.space,
+            "hnsw_m": best["m"],
+            "hnsw_construction_ef": args.construction_ef,
+            "hnsw_search_ef": best["ef_search"],
+        }
+        print("\nApply with (then re-index):")
+        for key, value in report["recommended"].items():
+            print(f"  {key.upper()}={value}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tune HNSW parameters for a target recall")
+    parser.add_argument("--snapshot", type=Path, help="Tune on an index snapshot instead of the live collection")
+    parser.add_argument("--questions", type=Path, default=Path("data/eval/questions.jsonl"))
+    parser.add_argument("--cache-dir", type=Path, default=Path("data/eval/cache"))
+    parser.add_argument("--holdout", type=float, default=0.1, help="Share of chunk vectors used as queries")
+    parser.add_argument("--space", choices=DISTANCE_SPACES, default=settings.vector_distance)
+    parser.add_argument("--top-k", type=int, default=settings.retrieval_fetch_k)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--m", nargs="+", type=int, default=[8, 16, 32, 48])
+    parser.add_argument("--ef-search", nargs="+", type=int, default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--construction-ef", type=int, default=settings.hnsw_construction_ef)
+    parser.add_argument("--output", type=Path, default=Path("data/eval/hnsw_tuning.json"))
+
+    args = parser.parse_args()
+
+    report = asyncio.run(tune(args))
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Recorded results in {args.output}")
@@ -0,0 +1,95 @@
+"""
+Custom Middleware
+"""
+import logging
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.structured_logging import RequestSampler, start_request_context
+
+logger = logging.getLogger("src.access")
+
+# Streams that must reach the client unbuffered
+UNCOMPRESSED_MEDIA_TYPES = ("text/event-stream",)
+
+
+class _StreamAwareGZipResponder(GZipResponder):
+    """GZip responder that passes streaming media types through untouched"""
+
+    passthrough = False
+
+    async def send_with_gzip(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            self.passthrough = content_type.startswith(UNCOMPRESSED_MEDIA_TYPES)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        await super().send_with_gzip(message)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    GZip compression that skips Server-Sent Events
+
+    The stock middleware buffers small chunks inside the gzip stream, which
+    holds back SSE tokens until enough output has accumulated.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "gzip" in headers.get("Accept-Encoding", ""):
+                responder = _StreamAwareGZipResponder(
+                    self.app, self.minimum_size, compresslevel=self.compresslevel
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class RequestLoggingMiddleware:
+    """
+    Emit one structured summary line per request
+
+    The line is written when the response body completes (so streamed
+    responses are timed end to end) and carries whatever the pipeline
+    attached to the request context: conversation_id, stage timings and
+    token counts. Summaries are sampled per route; 5xx are always logged.
+    """
+
+    def __init__(self, app: ASGIApp, sampler: RequestSampler) -> None:
+        self.app = app
+        self.sampler = sampler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = start_request_context(scope["method"], scope["path"])
+        status_code = 500
+        logged = False
+
+        def emit() -> None:
+            nonlocal logged
+            if not logged and self.sampler.should_log(context.path, status_code):
+                logger.info("request", extra={"request": context.summary(status_code)})
+            logged = True
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                emit()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            emit()
@@ -3,15 +3,29 @@ Chat API Routes
 Handles chat-related endpoints
 """
 import logging
-from uuid import UUID
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
 from starlette.requests import Request
 
-from src.models.schemas import ChatRequest, ChatResponse, ErrorResponse
+from src.api.serialization import (
+    RawJSONResponse,
+    get_response_cache,
+    serialize_chat_response,
+)
+from src.core.deadline import Deadline, DeadlineExceeded, request_deadline
+from src.core.structured_logging import set_context_field
+from src.models.schemas import ChatRequest, ChatResponse, ErrorResponse, SourcesMode
+from src.services.admission import (
+    AdmissionRejected,
+    get_admission_controller,
+    get_request_priority,
+)
 from src.services.chat_service import get_chat_service, ChatService
-from src.core.security.auth import verify_api_key, limiter, get_rate_limit_string
+from src.services.tenants import Tenant, get_request_tenant
+from src.core.security.auth import verify_api_key, enforce_rate_limit
+from src.core.usage import TokenBudgetExceeded, UsageScope, get_usage_accountant, get_usage_scope
 
 logger = logging.getLogger(__name__)
 
@@ -26,29 +40,77 @@ router = APIRouter(prefix="/chat", tags=["chat"])
         401: {"model": ErrorResponse},
         429: {"model": ErrorResponse},
         500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+        504: {"model": ErrorResponse},
     },
     summary="Ask a question about Ashish",
-    description="Submit a question and get an AI-generated answer based on RAG retrieval"
+    description="Submit a question and get an AI-generated answer based on RAG retrieval",
+    dependencies=[Depends(verify_api_key), Depends(enforce_rate_limit)]
 )
-@limiter.limit(get_rate_limit_string())
 async def ask_question(
     request: Request,
     chatRequest: ChatRequest,
+    sources: SourcesMode = Query(
+        default=SourcesMode.FULL,
+        description="Return sources in full, as truncated snippets, or as IDs only"
+    ),
     chat_service: ChatService = Depends(get_chat_service),
-    _: str = Depends(verify_api_key)
-) -> ChatResponse:
+    deadline: Deadline = Depends(request_deadline),
+    priority: str = Depends(get_request_priority),
+    tenant: Tenant = Depends(get_request_tenant),
+    usage: UsageScope = Depends(get_usage_scope)
+) -> RawJSONResponse:
     """
     Ask a question about Ashish
     
     - **question**: The question to ask (required)
     - **conversation_id**: Optional UUID to maintain conversation context
+    - **filter**: Optional metadata filter, e.g. `{"source": ["skills.md"]}`
     - **stream**: Whether to stream the response (not used in this endpoint)
+    - **sources** (query): `full`, `snippets` or `ids`
+    - **X-Request-Timeout-Ms** (header): Optional time budget, capped by the server
+    - **X-Priority** (header): Optionally lower this request's priority class
+    - **X-Tenant-ID** (header): Profile to answer about (defaults to Ashish)
     """
     try:
-        logger.info(f"Received question: {chatRequest.question[:100]}")
-        response = await chat_service.ask_question(chatRequest)
-        return response
+        logger.debug("Received question: %.100s", chatRequest.question)
+        set_context_field("question", chatRequest.question)  # Mined by precompute_answers.py
+        response_cache = get_response_cache()
         
+        # Stateless, unfiltered questions can be answered from pre-serialized bytes
+        cacheable = chatRequest.conversation_id is None and chatRequest.filter is None
+        if cacheable:
+            cached = response_cache.get(chatRequest.question, sources, tenant.tenant_id)
+            if cached is not None:
+                # Stateless: no turn is stored, or every hit would grow the conversation store
+                _, body = cached
+                return RawJSONResponse(response_cache.render_hit(body, uuid4()))
+        
+        async with get_admission_controller().admit(priority, deadline):
+            response = await chat_service.ask_question(
+                chatRequest, deadline=deadline, tenant=tenant
+            )
+        
+        if cacheable:
+            return RawJSONResponse(
+                response_cache.put(chatRequest.question, response, sources, tenant.tenant_id)
+            )
+        return RawJSONResponse(serialize_chat_response(response, sources))
+        
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except DeadlineExceeded as e:
+        logger.warning(f"Request deadline exceeded during {e.stage}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Request timed out during {e.stage}"
+        )
     except Exception as e:
         logger.error(f"Error processing question: {e}", exc_info=True)
         raise HTTPException(
@@ -62,14 +124,17 @@ async def ask_question(
     response_class=StreamingResponse,
     status_code=status.HTTP_200_OK,
     summary="Ask a question with streaming response",
-    description="Submit a question and get a streamed AI-generated answer"
+    description="Submit a question and get a streamed AI-generated answer",
+    dependencies=[Depends(verify_api_key), Depends(enforce_rate_limit)]
 )
-@limiter.limit(get_rate_limit_string())
 async def ask_question_stream(
     request: Request,
     chatRequest: ChatRequest,
     chat_service: ChatService = Depends(get_chat_service),
-    _: str = Depends(verify_api_key)
+    deadline: Deadline = Depends(request_deadline),
+    priority: str = Depends(get_request_priority),
+    tenant: Tenant = Depends(get_request_tenant),
+    usage: UsageScope = Depends(get_usage_scope)
 ) -> StreamingResponse:
     """
     Ask a question with streaming response
@@ -77,14 +142,36 @@ async def ask_question_stream(
     The response will be streamed as Server-Sent Events (SSE)
     """
     try:
-        logger.info(f"Received streaming question: {request.question[:100]}")
+        logger.debug("Received streaming question: %.100s", chatRequest.question)
+        set_context_field("question", chatRequest.question)
+        
+        # Reject before opening the stream if the backlog is already too long
+        admission = get_admission_controller()
+        priority_class = admission.resolve_class(priority)
+        if admission.projected_wait(priority_class) > deadline.remaining():
+            raise AdmissionRejected(503, "Projected wait exceeds request deadline")
+        
+        # Refuse before the stream opens; the service checks again with the conversation
+        if chatRequest.conversation_id:
+            usage.conversation_id = str(chatRequest.conversation_id)
+        await get_usage_accountant().check_budget(usage)
         
         async def generate():
             try:
-                async for chunk in chat_service.ask_question_stream(request):
-                    # Send as SSE format
-                    yield f"data: {chunk}\n\n"
+                async with admission.admit(priority, deadline):
+                    async for chunk in chat_service.ask_question_stream(
+                        chatRequest, deadline=deadline, tenant=tenant
+                    ):
+                        # Send as SSE format
+                        yield f"data: {chunk}\n\n"
                 yield "data: [DONE]\n\n"
+            except AdmissionRejected as e:
+                yield f"data: Error: {e.reason}\n\n"
+            except TokenBudgetExceeded as e:
+                yield f"data: Error: {e}\n\n"
+            except DeadlineExceeded as e:
+                logger.warning(f"Streaming deadline exceeded during {e.stage}")
+                yield "data: Error: request timed out\n\n"
             except Exception as e:
                 logger.error(f"Error during streaming: {e}")
                 yield f"data: Error: {str(e)}\n\n"
@@ -99,6 +186,14 @@ async def ask_question_stream(
             }
         )
         
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
     except Exception as e:
         logger.error(f"Error setting up stream: {e}", exc_info=True)
         raise HTTPException(
@@ -112,7 +207,7 @@ async def ask_question_stream(
     response_model=dict,
     status_code=status.HTTP_200_OK,
     summary="Get conversation summary",
-    description="Get a summary of a conversation by ID"
+    description="Get the running summary of a conversation by ID (maintained in the background)"
 )
 async def get_conversation_summary(
     conversation_id: UUID,
@@ -1,15 +1,21 @@
 """
 Health Check and Admin Routes
 """
+import asyncio
 import logging
+import os
 import time
 from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
 
 from src.models.schemas import HealthResponse
 from src.config.settings import get_settings
-from src.core.rag.vector_store import get_vector_store_manager
+from src.core.health_monitor import get_health_monitor
+from src.core.metrics import get_metrics
+from src.core.rag.vector_store import ReadOnlyIndexError, get_vector_store_manager
 from src.core.security.auth import verify_api_key
 settings = get_settings()
 
@@ -32,41 +38,16 @@ async def health_check() -> HealthResponse:
     """
     Health check endpoint
     
-    Returns the health status of the application and its components
+    Returns the status of the application and its dependencies as of the
+    health monitor's last probe round; nothing is probed per request.
     """
-    checks = {}
-    
-    # Check vector store
-    try:
-        vector_store = get_vector_store_manager()
-        stats = await vector_store.get_collection_stats()
-        checks["vector_store"] = "error" not in stats
-    except Exception as e:
-        logger.error(f"Vector store health check failed: {e}")
-        checks["vector_store"] = False
-    
-    # Check OpenAI connectivity (simple check)
-    try:
-        from src.core.llm.client import get_llm_client
-        llm_client = get_llm_client()
-        checks["llm"] = llm_client.llm is not None
-    except Exception as e:
-        logger.error(f"LLM health check failed: {e}")
-        checks["llm"] = False
-    
-    # Determine overall status
-    all_healthy = all(checks.values())
-    status_str = "healthy" if all_healthy else "degraded"
-    
-    if not any(checks.values()):
-        status_str = "unhealthy"
-    
+    monitor = get_health_monitor()
     return HealthResponse(
-        status=status_str,
+        status=monitor.status,
         version=settings.app_version,
         environment=settings.environment,
-        checks=checks,
-        timestamp=datetime.utcnow()
+        checks=monitor.checks,
+        timestamp=monitor.checked_at or datetime.utcnow()
     )
 
 
@@ -88,28 +69,129 @@ async def liveness_probe() -> dict:
     description="Readiness check - returns 200 if application is ready to serve traffic"
 )
 async def readiness_probe() -> dict:
-    """Readiness probe - checks if app can handle requests"""
-    try:
-        # Quick check of critical components
-        vector_store = get_vector_store_manager()
-        stats = await vector_store.get_collection_stats()
-        
-        if "error" in stats:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Vector store not ready"
-            )
-        
-        return {"status": "ready"}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Readiness check failed: {e}")
+    """
+    Readiness probe - 503 until the first probe round, and while a
+    critical local dependency is down (shared ones are only reported)
+    """
+    monitor = get_health_monitor()
+    if not monitor.ready:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Application not ready"
+            detail=f"Application not ready: {monitor.status}"
         )
+    return {"status": "ready" if monitor.status == "healthy" else monitor.status}
+
+
+@router.get(
+    "/admin/health",
+    status_code=status.HTTP_200_OK,
+    summary="Dependency health",
+    description="Probe latency percentiles, error rates and SLOs per dependency (requires API key)"
+)
+async def get_dependency_health(
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Get the health monitor's view of each dependency"""
+    return get_health_monitor().get_stats()
+
+@router.get(
+    "/metrics",
+    status_code=status.HTTP_200_OK,
+    summary="Metrics",
+    description="Process metrics in Prometheus text format (or JSON with format=json)"
+)
+async def get_process_metrics(format: str = "prometheus"):
+    """Expose in-process metrics"""
+    if not settings.enable_metrics:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Metrics are disabled"
+        )
+    
+    metrics = get_metrics()
+    if format == "json":
+        return metrics.snapshot()
+    return PlainTextResponse(metrics.render_prometheus())
+
+
+@router.get(
+    "/admin/startup",
+    status_code=status.HTTP_200_OK,
+    summary="Startup timing report",
+    description="Duration of each startup phase and asset load (requires API key)"
+)
+async def get_startup_timings(
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Get the startup timing report"""
+    from src.core.startup import get_startup_report
+    return get_startup_report().as_dict()
+
+
+@router.get(
+    "/admin/admission/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Admission control statistics",
+    description="Queue depth and slot usage per priority class (requires API key)"
+)
+async def get_admission_stats(
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Get admission control statistics"""
+    from src.services.admission import get_admission_controller
+    return get_admission_controller().get_stats()
+
+
+@router.get(
+    "/admin/tenants/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Tenant registry statistics",
+    description="Resident tenant indexes and memory budget (requires API key)"
+)
+async def get_tenant_stats(
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Get tenant registry statistics"""
+    from src.services.tenants import get_tenant_registry
+    return get_tenant_registry().get_stats()
+
+
+@router.get(
+    "/admin/usage",
+    status_code=status.HTTP_200_OK,
+    summary="Token usage",
+    description="Prompt, completion and embedding tokens per API key and conversation, with budgets (requires API key)"
+)
+async def get_token_usage(
+    top: int = Query(20, ge=1, le=500),
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """
+    Get token usage
+    
+    API keys are shown as hashed IDs. Totals cover all workers as of the
+    last flush plus this worker's unflushed tokens.
+    """
+    from src.core.usage import get_usage_accountant
+    return get_usage_accountant().get_stats(top)
+
+
+@router.get(
+    "/admin/llm/hedging",
+    status_code=status.HTTP_200_OK,
+    summary="LLM hedging statistics",
+    description="Hedge delays, rate and extra prompt tokens spent (requires API key)"
+)
+async def get_hedging_stats(
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Get hedged request statistics"""
+    from src.core.llm.client import get_llm_client
+    hedging = get_llm_client().hedging
+    if hedging is None:
+        return {"enabled": False}
+    return {"enabled": True, **hedging.get_stats()}
+
 
 @router.get(
     "/admin/vector-store/stats",
@@ -134,11 +216,124 @@ async def get_vector_store_stats(
         )
 
 
+@router.post(
+    "/admin/profile/cpu",
+    status_code=status.HTTP_200_OK,
+    summary="CPU profile",
+    description="Sample this worker's stacks for a few seconds; folded output for flame graphs (requires API key)"
+)
+async def profile_cpu(
+    seconds: float = Query(5.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    idle: bool = False,
+    format: str = "folded",
+    _: str = Depends(verify_api_key)
+):
+    """
+    Profile the worker that receives the request
+    
+    The default output is one "frame;frame;... count" line per stack, as
+    read by flamegraph.pl, speedscope and inferno. ``format=json``
+    returns the 50 hottest stacks instead. Threads waiting for work are
+    left out unless ``idle`` is set.
+    """
+    from src.core.profiling import ProfilerBusyError, folded, sample_cpu
+    
+    try:
+        profile = await asyncio.to_thread(sample_cpu, seconds, interval_ms / 1000, idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    if format == "json":
+        return {
+            "seconds": profile["seconds"],
+            "samples": profile["samples"],
+            "stacks": [
+                {"stack": stack.split(";"), "count": count}
+                for stack, count in profile["stacks"].most_common(50)
+            ],
+        }
+    return PlainTextResponse(folded(profile["stacks"]))
+
+
+@router.post(
+    "/admin/profile/memory/start",
+    status_code=status.HTTP_200_OK,
+    summary="Start heap tracing",
+    description="Start tracemalloc in this worker (requires API key)"
+)
+async def start_heap_tracing(
+    frames: int = Query(10, ge=1, le=50),
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Trace allocations until stopped; every allocation gets slower meanwhile"""
+    from src.core.profiling import get_heap_tracker
+    get_heap_tracker().start(frames)
+    return {"tracing": True, "pid": os.getpid()}
+
+
+@router.post(
+    "/admin/profile/memory/snapshot",
+    status_code=status.HTTP_200_OK,
+    summary="Heap snapshot",
+    description="Top allocation sites and their growth since the previous snapshot (requires API key)"
+)
+async def take_heap_snapshot(
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(25, ge=1, le=200),
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Snapshot the traced heap; compare two snapshots to find what grows"""
+    from src.core.profiling import get_heap_tracker
+    
+    try:
+        report = await asyncio.to_thread(get_heap_tracker().snapshot, group_by, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"pid": os.getpid(), **report}
+
+
+@router.post(
+    "/admin/profile/memory/stop",
+    status_code=status.HTTP_200_OK,
+    summary="Stop heap tracing",
+    description="Stop tracemalloc and free its traces (requires API key)"
+)
+async def stop_heap_tracing(
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Stop tracing allocations"""
+    from src.core.profiling import get_heap_tracker
+    get_heap_tracker().stop()
+    return {"tracing": False, "pid": os.getpid()}
+
+
+@router.get(
+    "/admin/profile/event-loop",
+    status_code=status.HTTP_200_OK,
+    summary="Event loop health",
+    description="Event-loop lag sampled for a moment, and pending tasks (requires API key)"
+)
+async def get_event_loop_health(
+    seconds: float = Query(1.0, gt=0, le=10),
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Measure how long callbacks wait to run and what the loop is holding"""
+    from src.core.profiling import measure_loop_lag, pending_tasks
+    
+    tasks = pending_tasks()
+    return {
+        "pid": os.getpid(),
+        "lag": await measure_loop_lag(seconds),
+        "tasks": tasks,
+    }
+
+
 @router.post(
     "/admin/vector-store/reset",
     status_code=status.HTTP_200_OK,
     summary="Reset vector store",
-    description="Delete all documents from vector store (requires API key, use with caution!)"
+    description="Switch to an empty collection version; the old data is kept for rollback (requires API key)"
 )
 async def reset_vector_store(
     confirm: bool = False,
@@ -147,7 +342,8 @@ async def reset_vector_store(
     """
     Reset vector store (requires confirmation)
     
-    This will delete ALL documents from the vector store!
+    Queries stop seeing ALL documents; the previous version stays
+    available to /admin/vector-store/rollback until garbage-collected.
     """
     if not confirm:
         raise HTTPException(
@@ -157,17 +353,194 @@ async def reset_vector_store(
     
     try:
         vector_store = get_vector_store_manager()
-        await vector_store.reset_collection()
+        active = await vector_store.reset_collection()
         
         logger.warning("Vector store has been reset")
         return {
             "status": "success",
-            "message": "Vector store has been reset"
+            "message": "Vector store has been reset",
+            "active_version": active
         }
         
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
         logger.error(f"Error resetting vector store: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to reset vector store"
-        )
\ No newline at end of file
+        )
+
+
+@router.post(
+    "/admin/vector-store/reindex",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Re-index knowledge base",
+    description="Build a new collection version in the background and switch to it when ready (requires API key)"
+)
+async def reindex_vector_store(
+    background_tasks: BackgroundTasks,
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """
+    Start a blue/green re-index
+    
+    Live queries keep using the current version until the new one is
+    built and warmed. With the ingest worker enabled the re-index is
+    queued for it instead of running in this process.
+    """
+    from src.services.ingest_worker import ingest_data
+    
+    vector_store = get_vector_store_manager()
+    try:
+        vector_store.check_writable()
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    if settings.ingest_worker_enabled:
+        from src.services.ingest_jobs import get_ingest_queue
+        job, created = await get_ingest_queue().enqueue()
+        return {
+            "status": "accepted",
+            "message": "Re-index queued" if created else "Re-index already queued",
+            "job": job.as_dict(),
+            "active_version": vector_store.active_collection_name
+        }
+    
+    background_tasks.add_task(ingest_data, settings.knowledge_base_directory)
+    return {
+        "status": "accepted",
+        "message": "Re-index started",
+        "active_version": vector_store.active_collection_name
+    }
+
+
+@router.post(
+    "/admin/ingest/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Queue ingestion job",
+    description="Queue a re-index for the ingest worker; returns the pending job if one exists (requires API key)"
+)
+async def create_ingest_job(
+    tenant: Optional[str] = Query(None, description="Tenant to re-index (default knowledge base if omitted)"),
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Enqueue a re-index of the default knowledge base or a tenant's"""
+    from src.services.ingest_jobs import get_ingest_queue
+    
+    if tenant is not None:
+        from src.services.tenants import load_tenant
+        if load_tenant(tenant) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown tenant '{tenant}'")
+    
+    job, created = await get_ingest_queue().enqueue(tenant)
+    return {"created": created, "job": job.as_dict()}
+
+
+@router.get(
+    "/admin/ingest/jobs",
+    status_code=status.HTTP_200_OK,
+    summary="List ingestion jobs",
+    description="Recent ingestion jobs with their progress, newest first (requires API key)"
+)
+async def list_ingest_jobs(
+    limit: int = Query(20, ge=1, le=200),
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """List recent ingestion jobs"""
+    from src.services.ingest_jobs import get_ingest_queue
+    jobs = await get_ingest_queue().list(limit)
+    return {"jobs": [job.as_dict() for job in jobs]}
+
+
+@router.get(
+    "/admin/ingest/jobs/{job_id}",
+    status_code=status.HTTP_200_OK,
+    summary="Ingestion job progress",
+    description="Status, checkpoint and progress of one ingestion job (requires API key)"
+)
+async def get_ingest_job(
+    job_id: str,
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Get one ingestion job"""
+    from src.services.ingest_jobs import get_ingest_queue
+    job = await get_ingest_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job.as_dict()
+
+
+@router.post(
+    "/admin/ingest/jobs/{job_id}/cancel",
+    status_code=status.HTTP_200_OK,
+    summary="Cancel ingestion job",
+    description="Cancel a queued job, or stop a running one after its current batch (requires API key)"
+)
+async def cancel_ingest_job(
+    job_id: str,
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Request cancellation; the partial version is dropped"""
+    from src.services.ingest_jobs import get_ingest_queue
+    job = await get_ingest_queue().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job.as_dict()
+
+
+@router.post(
+    "/admin/ingest/jobs/{job_id}/resume",
+    status_code=status.HTTP_200_OK,
+    summary="Resume ingestion job",
+    description="Queue a failed job again; it continues from its last checkpoint (requires API key)"
+)
+async def resume_ingest_job(
+    job_id: str,
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Resume a failed job"""
+    from src.services.ingest_jobs import FAILED, QUEUED, get_ingest_queue
+    job = await get_ingest_queue().resume(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job.status != QUEUED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Only {FAILED} jobs can be resumed (job is {job.status})"
+        )
+    return job.as_dict()
+
+
+@router.post(
+    "/admin/vector-store/rollback",
+    status_code=status.HTTP_200_OK,
+    summary="Roll back vector store",
+    description="Switch back to the previous retained collection version (requires API key)"
+)
+async def rollback_vector_store(
+    _: str = Depends(verify_api_key)
+) -> dict:
+    """Roll the collection alias back one version"""
+    try:
+        active = await get_vector_store_manager().rollback()
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error rolling back vector store: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to roll back vector store"
+        )
+    
+    if active is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="No previous collection version to roll back to"
+        )
+    
+    logger.warning(f"Vector store rolled back to {active}")
+    return {
+        "status": "success",
+        "active_version": active
+    }
@@ -0,0 +1,187 @@
+"""
+Fast Response Serialization
+orjson encoding for chat responses and a cache of pre-serialized answers
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from uuid import UUID, uuid4
+
+import orjson
+from fastapi.responses import Response
+
+from src.config.settings import get_settings
+from src.models.schemas import ChatResponse, SourcesMode
+
+settings = get_settings()
+
+
+class RawJSONResponse(Response):
+    """Response for bodies that are already JSON-encoded bytes"""
+    media_type = "application/json"
+
+
+def _serialize_source(source, mode: SourcesMode) -> dict:
+    if mode == SourcesMode.IDS:
+        return {
+            "id": source.id,
+            "source": source.metadata.get("source"),
+            "relevance_score": source.relevance_score,
+        }
+
+    content = source.content
+    if mode == SourcesMode.SNIPPETS and len(content) > settings.source_snippet_chars:
+        content = content[:settings.source_snippet_chars]
+
+    return {
+        "id": source.id,
+        "content": content,
+        "metadata": source.metadata,
+        "relevance_score": source.relevance_score,
+    }
+
+
+def _serialize_body(response: ChatResponse, mode: SourcesMode) -> bytes:
+    """Encode the request-independent part of a response"""
+    return orjson.dumps({
+        "answer": response.answer,
+        "sources": [_serialize_source(s, mode) for s in response.sources],
+        "confidence": response.confidence,
+        "model_used": response.model_used,
+        "tokens_used": response.tokens_used,
+        "degraded": response.degraded,
+    })
+
+
+def _splice(
+    body: bytes,
+    message_id: UUID,
+    conversation_id: UUID,
+    timestamp: datetime
+) -> bytes:
+    """Prepend per-request fields to a pre-serialized body"""
+    envelope = orjson.dumps({
+        "message_id": message_id,
+        "conversation_id": conversation_id,
+        "timestamp": timestamp,
+    })
+    # '{...envelope}' + '{...body}' -> '{...envelope,...body}'
+    return envelope[:-1] + b"," + body[1:]
+
+
+def serialize_chat_response(
+    response: ChatResponse,
+    mode: SourcesMode = SourcesMode.FULL
+) -> bytes:
+    """Serialize a ChatResponse with orjson, shaping sources per ``mode``"""
+    return _splice(
+        _serialize_body(response, mode),
+        response.message_id,
+        response.conversation_id,
+        response.timestamp,
+    )
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of answers to stateless questions
+
+    Bodies are stored already serialized per sources mode, so a hit costs
+    one small envelope encode and a bytes concatenation.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # key -> (stored_at, response, {mode: serialized body})
+        self._entries: OrderedDict[str, tuple[float, ChatResponse, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(question: str, tenant_id: str = "") -> str:
+        return f"{tenant_id}:{' '.join(question.lower().split())}"
+
+    def get(
+        self,
+        question: str,
+        mode: SourcesMode,
+        tenant_id: str = ""
+    ) -> Optional[tuple[str, bytes]]:
+        """
+        Look up a cached answer
+
+        Returns:
+            (answer text, serialized body) or None
+        """
+        if not self.enabled:
+            return None
+
+        key = self.make_key(question, tenant_id)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        _, response, bodies = entry
+        body = bodies.get(mode)
+        if body is None:
+            body = bodies[mode] = _serialize_body(response, mode)
+        self.hits += 1
+        return response.answer, body
+
+    def put(
+        self,
+        question: str,
+        response: ChatResponse,
+        mode: SourcesMode,
+        tenant_id: str = ""
+    ) -> bytes:
+        """Cache a response and return its full serialized bytes"""
+        body = _serialize_body(response, mode)
+
+        if self.enabled and not response.degraded:
+            key = self.make_key(question, tenant_id)
+            self._entries[key] = (time.monotonic(), response, {mode: body})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return _splice(body, response.message_id, response.conversation_id, response.timestamp)
+
+    def render_hit(self, body: bytes, conversation_id: UUID) -> bytes:
+        """Build a full response from a cached body for a new request"""
+        return _splice(body, uuid4(), conversation_id, datetime.utcnow())
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Singleton instance
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get or create response cache singleton"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            max_size=settings.answer_cache_size,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+        )
+    return _response_cache
@@ -14,27 +14,157 @@ class Settings(BaseSettings):
     # Security - MUST be set in .env
     secret_key: str  # For JWT tokens
     api_key: str = None  # Optional API key for authentication
+    api_key_priorities: str = ""  # Extra API keys mapped to priority classes: "key=batch,..."
     
     # OpenAI
     openai_api_key: str  # Your OpenAI API key
     openai_model: str = "gpt-4-0125-preview"
+    llm_request_timeout: float = 20.0  # Per-call provider timeout (seconds)
+    llm_max_retries: int = 1
     embedding_model: str = "text-embedding-3-small"  # OpenAI embedding model
+
+    # Hedged requests (a second attempt when the first is slower than usual)
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = 95.0  # Hedge after this percentile of recent latency
+    llm_hedge_min_delay_ms: float = 250.0  # Never hedge sooner than this
+    llm_hedge_min_samples: int = 50  # Recent calls needed before the delay is trusted
+    llm_hedge_max_rate: float = 0.05  # Hedges per call, at most (extra provider spend)
+    llm_hedge_model: str = ""  # Model for the second attempt (empty = openai_model)
+    llm_hedge_base_url: str = ""  # Deployment for the second attempt (empty = the primary's)
+    
+    # Embedding backend: "openai" (remote) or "local" (CPU, sentence-transformers)
+    embedding_backend: str = "openai"
+    local_embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    local_embedding_threads: int = 2  # Inference thread pool size
     
     # Vector Store
     chroma_persist_directory: str = "/src/data/chroma"
+    chroma_collection_name: str = "ashish_knowledge"
+    knowledge_base_directory: str = "./data/knowledge_base"  # Markdown source files
+    collection_versions_retained: int = 2  # Active + previous, kept for rollback
+    knowledge_base_watch: bool = False  # Sync edits to the knowledge base while serving
+    knowledge_base_watch_interval: float = 1.0  # Seconds between directory polls
+    knowledge_base_watch_debounce: float = 2.0  # Quiet period before a batch is indexed
+    
+    # Chroma server (client/server mode); replicas share one index instead of embedding their own
+    chroma_server_url: str = ""  # e.g. http://chroma:8000; empty = embedded store in chroma_persist_directory
+    chroma_server_timeout: float = 5.0  # Per-request timeout (seconds)
+    chroma_server_max_connections: int = 20  # Pooled connections per worker
+    chroma_server_batch_window_ms: float = 2.0  # Concurrent queries collected into one request
+    chroma_server_max_batch: int = 32  # Most queries per request
+    chroma_server_retry_seconds: float = 10.0  # Serve the local snapshot this long after a failure
+    chroma_alias_refresh_seconds: float = 5.0  # How often switches by replicas or the ingest worker are picked up
+
+    # HNSW index (fixed per collection version; re-index to apply, tune with `python scripts/tune_hnsw.py`)
+    vector_distance: str = "l2"  # "l2", "cosine" or "ip"; relevance scores follow the active version's
+    hnsw_m: int = 16  # Links per node: higher = better recall, more memory and slower builds
+    hnsw_construction_ef: int = 100  # Candidates considered while building
+    hnsw_search_ef: int = 10  # Candidates considered per query: higher = better recall, slower
+
+    # Tenants (each in tenants_directory/<tenant_id>/ with knowledge_base/ and tenant.json)
+    default_tenant: str = "ashish"  # Served from the settings above when no X-Tenant-ID is sent
+    default_tenant_name: str = "Ashish"
+    tenants_directory: str = "./data/tenants"
+    tenant_memory_budget_mb: int = 512  # Resident tenant indexes before LRU eviction (0 = unlimited)
+    pinned_tenants: str = ""  # Comma-separated tenant IDs never evicted
+
+    # Index snapshots (built with `python scripts/index.py build`)
+    index_snapshot_directory: str = "./data/index"  # Baked into the image or mounted
+    index_snapshot_verify: bool = True  # Verify checksums before restoring
+
+    # Tokenizer and model assets (prefetched with `python scripts/prefetch_assets.py`)
+    asset_directory: str = "./data/assets"  # Versioned cache baked into the image
+    asset_verify: bool = True  # Verify checksums at startup
     
     allowed_origins: str = "*"  # CORS allowed origins
 
+    # Serving (python -m src.server); more than one worker serves a read-only index snapshot
+    workers: int = 1  # Pre-forked worker processes (0 = one per core)
+
     # RAG Settings
     chunk_size: int = 1000  # Size of text chunks
     chunk_overlap: int = 200  # Overlap between chunks
     retrieval_top_k: int = 4  # Number of documents to retrieve
+    retrieval_diversify: bool = True  # MMR over a wider candidate set, then merge adjacent chunks
+    retrieval_fetch_k: int = 20  # Candidates fetched for MMR
+    mmr_lambda: float = 0.7  # 1 = pure relevance, 0 = pure diversity
+    ingest_batch_size: int = 256  # Chunks embedded and written per batch during ingestion
+
+    # Ingestion jobs (queued by the API, run by `python scripts/ingest_worker.py`)
+    ingest_worker_enabled: bool = False  # Enqueue startup/admin re-indexes instead of running them in the API
+    ingest_job_store: str = "sqlite"  # "sqlite" (shared volume) or "redis"
+    ingest_job_sqlite_path: str = "./data/ingest_jobs.db"
+    ingest_worker_concurrency: int = 1  # Jobs run at once per worker
+    ingest_embed_concurrency: int = 2  # Batches of one job embedded at once
+    ingest_max_chunks_per_second: float = 0.0  # Embedding rate cap per job (0 = unlimited)
+    ingest_lease_seconds: float = 30.0  # A job whose worker stops renewing is resumed by another
+    ingest_poll_interval: float = 2.0  # Seconds between queue polls when idle
+    ingest_jobs_retained: int = 50  # Finished jobs kept for the progress API
+
+    # Query routing (restrict search to the likeliest partitions)
+    query_routing_enabled: bool = True
+    retrieval_partition_key: str = "source"  # Chunk metadata field that defines partitions
+    routing_max_partitions: int = 2  # Most partitions a routed search may cover
+    routing_margin: float = 0.05  # Centroid similarity lead required to route
+    routing_widen_distance: float = 1.0  # Retry unfiltered if the best routed hit is farther (L2; converted for other metrics)
+
+    # Conversation memory (older turns folded into a rolling summary in the background)
+    conversation_recent_messages: int = 6  # Newest messages sent to the LLM verbatim
+    conversation_summary_batch: int = 4  # Older messages collected before a summary update
+    conversation_max_messages: int = 40  # Unsummarized messages kept if the summarizer falls behind
+    conversation_summary_max_tokens: int = 300  # Length cap of the running summary
+    conversation_summary_model: str = ""  # Model for summaries (empty = openai_model)
+
+    # Request deadlines
+    request_timeout_seconds: float = 15.0  # Route budget; clients may ask for less
+
+    # Admission control
+    admission_max_concurrency: int = 16  # Concurrent RAG pipelines per worker
+    admission_priority_classes: str = "interactive:8:64,batch:1:256"  # name:weight:max_queue
+
+    # Precomputed answers (built with `python scripts/precompute_answers.py`)
+    answer_table_enabled: bool = True
+    answer_table_path: str = "./data/answers/answers.json"
+    answer_table_threshold: float = 0.95  # Min cosine similarity to serve a stored answer
+    answer_table_reload_interval: float = 10.0  # Seconds between checks for a table regenerated elsewhere
+
+    # Response shaping and caching
+    source_snippet_chars: int = 200  # Content length for ?sources=snippets
+    answer_cache_size: int = 1024  # Pre-serialized answers kept (0 disables)
+    answer_cache_ttl_seconds: int = 300
 
     redis_url: str   # Redis URL for rate limiting
     rate_limit_enabled: bool = False  # Enable rate limiting
     rate_limit_per_minute: int = 60  # Max requests per minute
+    rate_limit_sync_interval: float = 1.0  # Seconds between Redis reconciliations
+
+    # Token accounting (prompt + completion + embedding tokens per API key and conversation)
+    usage_store: str = "redis"  # Where totals are flushed: "redis", "sqlite" or "memory"
+    usage_sqlite_path: str = "./data/usage.db"  # Used with usage_store=sqlite
+    usage_flush_interval: float = 5.0  # Seconds between flushes
+    usage_budget_period_seconds: int = 86400  # Window of per-key budgets
+    usage_key_token_budget: int = 0  # Tokens per API key per period (0 = unlimited)
+    usage_key_budgets: str = ""  # Per-key overrides: "key=tokens,..."
+    usage_conversation_token_budget: int = 0  # Tokens per conversation (0 = unlimited)
+
+    # Health monitor (dependencies probed in the background; /health serves the cached result)
+    health_probe_interval: float = 15.0  # Seconds between probe rounds
+    health_probe_timeout: float = 5.0  # A probe slower than this counts as failed
+    health_window_size: int = 20  # Probes per dependency kept for latency and error rate
+    health_probe_providers: bool = True  # Probe the LLM/embedding provider (model lookups, no tokens)
+    health_slo_vector_store_ms: float = 250.0  # p95 probe latency above which the vector store degrades
+    health_slo_redis_ms: float = 50.0
+    health_slo_llm_ms: float = 2000.0
+    health_slo_embedding_ms: float = 1000.0
+    health_max_error_rate: float = 0.2  # Failed fraction of the window above which a dependency degrades
+    health_ready_when_degraded: bool = True  # Keep answering ready (200) while a local SLO is breached
+
+    enable_metrics: bool = True  # Expose /metrics
 
     log_level: str = "INFO"  # Logging level
+    log_format: str = "json"  # "json" or "text"
+    log_sample_rate: float = 1.0  # Fraction of request summaries logged
+    log_route_sample_rates: str = "/api/v1/health=0.01,/api/v1/metrics=0"  # "prefix=rate,..."
     debug: bool = False  # Debug mode
     
     class Config:
@@ -0,0 +1,190 @@
+"""
+Offline Assets
+Tokenizer encodings and local model files prefetched into a versioned cache
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import tiktoken
+
+from src.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Bump when the cache layout changes; old layouts are simply ignored
+ASSET_LAYOUT_VERSION = "v1"
+MANIFEST_FILE = "manifest.json"
+DEFAULT_ENCODING = "cl100k_base"
+
+
+class AssetError(Exception):
+    """A prefetched asset is missing or does not match its checksum"""
+
+
+def asset_root() -> Path:
+    return Path(settings.asset_directory) / ASSET_LAYOUT_VERSION
+
+
+def models_directory() -> Path:
+    return asset_root() / "models"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def configure_asset_cache() -> None:
+    """
+    Point tiktoken at the asset cache
+
+    An explicit TIKTOKEN_CACHE_DIR in the environment wins.
+    """
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(asset_root() / "tiktoken"))
+
+
+def encoding_name(model: str) -> str:
+    try:
+        return tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        return DEFAULT_ENCODING
+
+
+def load_encoding(model: str) -> tiktoken.Encoding:
+    """Tokenizer for a model, read from the asset cache when prefetched"""
+    configure_asset_cache()
+    return tiktoken.get_encoding(encoding_name(model))
+
+
+def required_encodings() -> list[str]:
+    return sorted({encoding_name(settings.embedding_model), encoding_name(settings.openai_model)})
+
+
+def read_manifest() -> Optional[dict]:
+    path = asset_root() / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def prefetch_assets() -> dict:
+    """
+    Download every asset the configuration needs and write the manifest
+
+    Meant for image build time; requires network access.
+    """
+    root = asset_root()
+    tiktoken_dir = root / "tiktoken"
+    shutil.rmtree(tiktoken_dir, ignore_errors=True)
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(tiktoken_dir)
+
+    assets = []
+    for name in required_encodings():
+        files_before = set(tiktoken_dir.glob("*"))
+        tiktoken.get_encoding(name)
+        # tiktoken names cache files by a hash of the download URL
+        new_files = set(tiktoken_dir.glob("*")) - files_before
+        if not new_files:
+            raise AssetError(f"Encoding {name} was already loaded from another cache")
+        assets.append({"name": f"tiktoken/{name}", "kind": "encoding", "files": sorted(new_files)})
+
+    if settings.embedding_backend == "local":
+        from src.core.rag.embedding_backends import LocalEmbeddings
+
+        model_dir = models_directory()
+        LocalEmbeddings(settings.local_embedding_model, cache_folder=str(model_dir))
+        assets.append({
+            "name": settings.local_embedding_model,
+            "kind": "model",
+            "files": sorted(p for p in model_dir.rglob("*") if p.is_file() and not p.is_symlink()),
+        })
+
+    manifest = {
+        "layout": ASSET_LAYOUT_VERSION,
+        "tiktoken_version": getattr(tiktoken, "__version__", None),
+        "created_at": time.time(),
+        "assets": [
+            {
+                "name": asset["name"],
+                "kind": asset["kind"],
+                "files": {
+                    str(path.relative_to(root)): _sha256(path) for path in asset["files"]
+                },
+                "bytes": sum(path.stat().st_size for path in asset["files"]),
+            }
+            for asset in assets
+        ],
+    }
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Prefetched {len(assets)} assets into {root}")
+    return manifest
+
+
+def load_assets(verify: bool = True) -> list[dict]:
+    """
+    Verify prefetched assets and load the tokenizers
+
+    Without a manifest (e.g. local development) nothing is verified and
+    tiktoken falls back to downloading on first use. When the configured
+    local model was prefetched, Hugging Face is switched to offline mode.
+
+    Returns:
+        Per-asset report: name, bytes, verify_ms, load_ms
+
+    Raises:
+        AssetError: If a listed file is missing or corrupted
+    """
+    configure_asset_cache()
+    manifest = read_manifest()
+    if manifest is None:
+        logger.warning(f"No asset manifest in {asset_root()}; tokenizers will download on first use")
+        return []
+
+    root = asset_root()
+    report = []
+    for asset in manifest["assets"]:
+        started = time.perf_counter()
+        if verify:
+            for relative_path, expected in asset["files"].items():
+                path = root / relative_path
+                if not path.exists():
+                    raise AssetError(f"Asset file missing: {path}")
+                if _sha256(path) != expected:
+                    raise AssetError(f"Checksum mismatch for asset file {path}")
+        verified = time.perf_counter()
+
+        load_ms = None
+        if asset["kind"] == "encoding":
+            tiktoken.get_encoding(asset["name"].split("/", 1)[1])
+            load_ms = round((time.perf_counter() - verified) * 1000, 1)
+        elif asset["name"] == settings.local_embedding_model:
+            # Loaded by the embedding backend; never reach for the network
+            os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+        report.append({
+            "name": asset["name"],
+            "bytes": asset["bytes"],
+            "verify_ms": round((verified - started) * 1000, 1) if verify else None,
+            "load_ms": load_ms,
+        })
+
+    for entry in report:
+        logger.info(
+            f"Asset {entry['name']}: {entry['bytes'] / 1024 / 1024:.1f}MB, "
+            f"verify {entry['verify_ms']}ms, load {entry['load_ms']}ms"
+        )
+    return report
@@ -0,0 +1,91 @@
+"""
+Request Deadlines
+A time budget that is propagated through every stage of a request
+"""
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import Request
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+deadlines_exceeded = get_metrics().counter(
+    "deadline_exceeded_total", "Stages cancelled because the request deadline passed"
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage cannot finish within the request's budget"""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """Absolute point in time by which a request must finish"""
+
+    def __init__(self, budget_seconds: float) -> None:
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+async def run_with_deadline(
+    awaitable: Awaitable[T],
+    deadline: Optional[Deadline],
+    stage: str
+) -> T:
+    """
+    Await ``awaitable`` within the remaining budget
+
+    On timeout the underlying task is cancelled (not left running) and
+    DeadlineExceeded is raised.
+    """
+    if deadline is None:
+        return await awaitable
+
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        deadlines_exceeded.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        deadlines_exceeded.inc(stage=stage)
+        raise DeadlineExceeded(stage) from None
+
+
+def request_deadline(request: Request) -> Deadline:
+    """
+    Dependency that builds the request's deadline
+
+    Clients may ask for a tighter budget with the X-Request-Timeout-Ms header;
+    it is capped at the route budget from settings.
+    """
+    budget = settings.request_timeout_seconds
+    header = request.headers.get(DEADLINE_HEADER)
+    if header:
+        try:
+            budget = min(budget, max(0.0, float(header) / 1000))
+        except ValueError:
+            pass
+    return Deadline(budget)
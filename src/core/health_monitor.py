@@ -0,0 +1,334 @@
+"""
+Health Monitor
+Dependency probes in the background; health endpoints read the cached result
+
+Every ``health_probe_interval`` one cheap round trip is timed against each
+dependency (Chroma, Redis, the LLM and embedding provider) and the last
+``health_window_size`` results are kept. A dependency is degraded when its
+p95 latency exceeds its SLO or too many recent probes failed, and down
+when the latest probe failed. The status is computed once per round, so
+orchestrator probes cost a dict lookup instead of a store query.
+
+Shared dependencies (Redis, the hosted provider) are the same for every
+replica, so they show up in the health status but never fail readiness:
+taking the whole fleet out of rotation cannot fix them.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+OK = "ok"
+DEGRADED = "degraded"
+DOWN = "down"
+UNKNOWN = "unknown"
+
+metrics = get_metrics()
+probe_duration = metrics.histogram("dependency_probe_ms", "Duration of dependency health probes")
+probe_failures = metrics.counter(
+    "dependency_probe_failures_total", "Failed or timed-out dependency probes"
+)
+
+
+@dataclass
+class Dependency:
+    """Rolling probe results of one dependency"""
+
+    name: str
+    probe: Callable[[], Awaitable[None]]
+    slo_ms: float
+    critical: bool  # Unhealthy (not merely degraded) while down
+    window: int = 20
+    shared: bool = False  # Common to all replicas; never fails readiness
+    samples: deque = field(init=False)
+    last_error: Optional[str] = None
+    last_probe_at: Optional[datetime] = None
+
+    def __post_init__(self) -> None:
+        self.samples = deque(maxlen=self.window)
+
+    def record(self, latency_ms: float, error: Optional[str]) -> None:
+        self.samples.append((latency_ms, error is None))
+        self.last_probe_at = datetime.utcnow()
+        if error is not None:
+            self.last_error = error
+
+    @property
+    def up(self) -> bool:
+        return bool(self.samples) and self.samples[-1][1]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def latency(self, pct: float) -> Optional[float]:
+        """Percentile of successful probes in the window"""
+        ordered = sorted(latency for latency, ok in self.samples if ok)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def status(self, max_error_rate: float) -> str:
+        if not self.samples:
+            return UNKNOWN
+        if not self.up:
+            return DOWN
+        p95 = self.latency(95)
+        if self.error_rate > max_error_rate or (p95 is not None and p95 > self.slo_ms):
+            return DEGRADED
+        return OK
+
+    def as_dict(self, max_error_rate: float) -> dict:
+        p50, p95 = self.latency(50), self.latency(95)
+        return {
+            "status": self.status(max_error_rate),
+            "critical": self.critical,
+            "shared": self.shared,
+            "slo_ms": self.slo_ms,
+            "p50_ms": round(p50, 2) if p50 is not None else None,
+            "p95_ms": round(p95, 2) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "probes": len(self.samples),
+            "last_error": self.last_error,
+            "last_probe_at": self.last_probe_at.isoformat() if self.last_probe_at else None,
+        }
+
+
+class HealthMonitor:
+    """
+    Probes registered dependencies on an interval and caches the verdict
+
+    ``status`` is "starting" until the first round completes, then
+    "healthy", "degraded" (some dependency is slow, failing or down) or
+    "unhealthy" (a critical dependency is down). ``ready`` only looks at
+    the replica's own dependencies.
+    """
+
+    def __init__(
+        self,
+        interval: float = 15.0,
+        timeout: float = 5.0,
+        window: int = 20,
+        max_error_rate: float = 0.2,
+        ready_when_degraded: bool = True
+    ) -> None:
+        self.interval = interval
+        self.timeout = timeout
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.ready_when_degraded = ready_when_degraded
+        self.dependencies: dict[str, Dependency] = {}
+        self.status = "starting"
+        self.ready = False
+        self.checks: dict[str, bool] = {}
+        self.checked_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closers: list[Callable[[], Awaitable[None]]] = []
+
+    def add_dependency(
+        self,
+        name: str,
+        probe: Callable[[], Awaitable[None]],
+        slo_ms: float,
+        critical: bool = False,
+        close: Optional[Callable[[], Awaitable[None]]] = None,
+        shared: bool = False
+    ) -> None:
+        """
+        Probe ``name`` by awaiting ``probe()``, which raises on failure
+
+        ``close`` releases the probe's own connection on shutdown.
+        """
+        self.dependencies[name] = Dependency(
+            name, probe, slo_ms, critical, self.window, shared=shared
+        )
+        if close is not None and close not in self._closers:
+            self._closers.append(close)
+
+    async def start(self) -> None:
+        """Start the background probe task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe_loop())
+            logger.info(
+                f"Health monitor probing {', '.join(self.dependencies)} every {self.interval}s"
+            )
+
+    async def stop(self) -> None:
+        """Stop probing and close the probes' connections"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for close in self._closers:
+            try:
+                await close()
+            except Exception:
+                pass
+        self._closers = []
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    async def probe_all(self) -> None:
+        """One round of probes, run concurrently, then refresh the cached status"""
+        await asyncio.gather(*(self._probe(dep) for dep in self.dependencies.values()))
+        self._refresh()
+
+    async def _probe(self, dep: Dependency) -> None:
+        was_up = dep.up or not dep.samples
+        start = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(dep.probe(), self.timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        dep.record(latency_ms, error)
+        probe_duration.observe(latency_ms, dependency=dep.name)
+        if error is not None:
+            probe_failures.inc(dependency=dep.name)
+            if was_up:
+                logger.warning(f"Health probe of {dep.name} failed: {error}")
+        elif not was_up:
+            logger.info(f"Health probe of {dep.name} recovered ({latency_ms:.0f}ms)")
+
+    def _refresh(self) -> None:
+        statuses = {
+            name: dep.status(self.max_error_rate) for name, dep in self.dependencies.items()
+        }
+        if any(s == DOWN and self.dependencies[n].critical for n, s in statuses.items()):
+            status = "unhealthy"
+        elif all(s == OK for s in statuses.values()):
+            status = "healthy"
+        else:
+            status = "degraded"
+
+        local = {n: s for n, s in statuses.items() if not self.dependencies[n].shared}
+        if any(s == DOWN and self.dependencies[n].critical for n, s in local.items()):
+            ready = False
+        elif all(s == OK for s in local.values()):
+            ready = True
+        else:
+            ready = self.ready_when_degraded
+
+        self.checks = {name: s == OK for name, s in statuses.items()}
+        self.status = status
+        self.ready = ready
+        self.checked_at = datetime.utcnow()
+
+    def get_stats(self) -> dict:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+            "interval_seconds": self.interval,
+            "dependencies": {
+                name: dep.as_dict(self.max_error_rate)
+                for name, dep in self.dependencies.items()
+            },
+        }
+
+
+def _register_dependencies(monitor: HealthMonitor) -> None:
+    """Chroma always; Redis when something uses it; the provider unless disabled"""
+    from src.core.rag.embeddings import get_embeddings_manager
+    from src.core.rag.vector_store import get_vector_store_manager
+
+    vector_store = get_vector_store_manager()
+    monitor.add_dependency(
+        "vector_store",
+        vector_store.probe,
+        settings.health_slo_vector_store_ms,
+        # With a local snapshot to fall back on, answers continue without the server
+        critical=vector_store.fallback_index is None,
+    )
+
+    if settings.rate_limit_enabled or settings.usage_store == "redis":
+        import redis.asyncio as aioredis
+
+        redis = aioredis.from_url(
+            settings.redis_url,
+            socket_timeout=settings.health_probe_timeout,
+            socket_connect_timeout=settings.health_probe_timeout,
+        )
+        monitor.add_dependency(
+            "redis", redis.ping, settings.health_slo_redis_ms, close=redis.close, shared=True
+        )
+
+    if not settings.health_probe_providers:
+        return
+
+    from openai import AsyncOpenAI
+
+    # Model lookups measure the provider round trip without spending tokens
+    provider = AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        timeout=settings.health_probe_timeout,
+        max_retries=0,
+    )
+
+    async def probe_llm() -> None:
+        await provider.models.retrieve(settings.openai_model)
+
+    embeddings = get_embeddings_manager()
+
+    async def probe_embedding() -> None:
+        if embeddings.identity["embedding_backend"] == "openai":
+            await provider.models.retrieve(settings.embedding_model)
+        else:
+            await embeddings.embeddings.aembed_query("health check")
+
+    monitor.add_dependency(
+        "llm",
+        probe_llm,
+        settings.health_slo_llm_ms,
+        critical=True,
+        close=provider.close,
+        shared=True,
+    )
+    monitor.add_dependency(
+        "embedding",
+        probe_embedding,
+        settings.health_slo_embedding_ms,
+        close=provider.close,
+        # A local embedding model is this replica's own problem
+        shared=embeddings.identity["embedding_backend"] == "openai",
+    )
+
+
+# Singleton instance
+_health_monitor: Optional[HealthMonitor] = None
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Get or create health monitor singleton"""
+    global _health_monitor
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor(
+            interval=settings.health_probe_interval,
+            timeout=settings.health_probe_timeout,
+            window=settings.health_window_size,
+            max_error_rate=settings.health_max_error_rate,
+            ready_when_degraded=settings.health_ready_when_degraded,
+        )
+        _register_dependencies(_health_monitor)
+    return _health_monitor
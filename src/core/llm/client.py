@@ -2,12 +2,16 @@
 app/core/llm/client.py
 """
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
 
 from src.config.settings import get_settings
+from src.core.assets import load_encoding
+from src.core.deadline import Deadline, run_with_deadline
+from src.core.llm.hedging import HedgePolicy
+from src.core.usage import record_usage
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -17,8 +21,8 @@ class LLMClient:
     """
     Client for interacting with OpenAI's language models
     """
-    # This is the instruction for the AI
-    SYSTEM_PROMPT = """You are an AI assistant that answers questions about Ashish.
+    # This is the instruction for the AI ({name} is the tenant's display name)
+    SYSTEM_PROMPT_TEMPLATE = """You are an AI assistant that answers questions about {name}.
             Your rules:
             1. Answer ONLY using the provided context
             2. If the context doesn't have the answer, say "I don't have that information"
@@ -27,6 +31,13 @@ class LLMClient:
             5. Cite which part of the context you're using
 
             Remember: Be helpful, accurate, and honest."""
+    SYSTEM_PROMPT = SYSTEM_PROMPT_TEMPLATE.format(name=settings.default_tenant_name)
+    
+    SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user
+            and an assistant. Merge the new messages into the current summary.
+            Keep what the user asked about, the facts given in answers, and any
+            preferences or follow-up intent the user stated. Drop small talk.
+            Write at most {words} words and reply with the summary only."""
     
     def __init__(self):
         """Initialize the LLM client"""
@@ -34,7 +45,46 @@ class LLMClient:
             model=settings.openai_model,
             temperature=0.7,  # 0 = deterministic, 1 = creative
             openai_api_key=settings.openai_api_key,
+            request_timeout=settings.llm_request_timeout,
+            max_retries=settings.llm_max_retries,
         )
+        # Estimates usage where the provider reports none (streaming)
+        self.encoding = load_encoding(settings.openai_model)
+        
+        # Second attempts for calls slower than usual, on their own connection pool
+        self.hedge_llm: Optional[ChatOpenAI] = None
+        self.hedging: Optional[HedgePolicy] = None
+        if settings.llm_hedge_enabled:
+            deployment = {}
+            if settings.llm_hedge_base_url:
+                deployment["openai_api_base"] = settings.llm_hedge_base_url
+            self.hedge_llm = ChatOpenAI(
+                model=settings.llm_hedge_model or settings.openai_model,
+                temperature=0.7,
+                openai_api_key=settings.openai_api_key,
+                request_timeout=settings.llm_request_timeout,
+                max_retries=0,
+                **deployment,
+            )
+            self.hedging = HedgePolicy(
+                percentile=settings.llm_hedge_percentile,
+                min_delay_ms=settings.llm_hedge_min_delay_ms,
+                min_samples=settings.llm_hedge_min_samples,
+                max_rate=settings.llm_hedge_max_rate,
+            )
+        
+        # Rolling conversation summaries; short and deterministic
+        self.summary_llm = ChatOpenAI(
+            model=settings.conversation_summary_model or settings.openai_model,
+            temperature=0,
+            max_tokens=settings.conversation_summary_max_tokens,
+            openai_api_key=settings.openai_api_key,
+            request_timeout=settings.llm_request_timeout,
+            max_retries=settings.llm_max_retries,
+        )
+    
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text))
     
     def _format_context(
         self,
@@ -55,14 +105,17 @@ class LLMClient:
         
         return "\n".join(context_parts)
     
-    async def generate_answer(
+    def _build_messages(
         self,
         question: str,
         context_sources: list[tuple[str, dict, float]],
-        conversation_history: Optional[list[dict]] = None
-    ) -> tuple[str, dict]:
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[list[dict]] = None,
+        conversation_summary: Optional[str] = None
+    ) -> list:
         """
-        Generate an answer using the RAG approach
+        Build the chat messages for a question and its context, after the
+        summary of earlier turns and the recent turns themselves
         """
         # Step 1: Format the context
         context = self._format_context(context_sources)
@@ -77,27 +130,150 @@ class LLMClient:
         If the context doesn't contain the answer, say so clearly."""
         
         # Step 3: Create messages for the chat
-        messages = [
-            SystemMessage(content=self.SYSTEM_PROMPT),
-            HumanMessage(content=full_question)
-        ]
+        messages = [SystemMessage(content=system_prompt or self.SYSTEM_PROMPT)]
+        if conversation_summary:
+            messages.append(SystemMessage(
+                content=f"Summary of the conversation so far:\n{conversation_summary}"
+            ))
+        for message in conversation_history or []:
+            message_class = HumanMessage if message["role"] == "user" else AIMessage
+            messages.append(message_class(content=message["content"]))
+        messages.append(HumanMessage(content=full_question))
+        return messages
+    
+    async def generate_answer(
+        self,
+        question: str,
+        context_sources: list[tuple[str, dict, float]],
+        conversation_history: Optional[list[dict]] = None,
+        deadline: Optional[Deadline] = None,
+        system_prompt: Optional[str] = None,
+        conversation_summary: Optional[str] = None
+    ) -> tuple[str, dict]:
+        """
+        Generate an answer using the RAG approach
+        
+        Raises:
+            DeadlineExceeded: If the deadline passes first (the call is cancelled)
+        """
+        messages = self._build_messages(
+            question, context_sources, system_prompt, conversation_history, conversation_summary
+        )
         
         # Step 4: Generate response
-        logger.info(f"Generating answer for: {question[:100]}")
-        response = await self.llm.agenerate([messages])
+        logger.debug("Generating answer for: %.100s", question)
+        hedged = False
+        if self.hedging is None:
+            generation = self.llm.agenerate([messages])
+        else:
+            generation = self.hedging.race(
+                lambda: self.llm.agenerate([messages]),
+                lambda: self.hedge_llm.agenerate([messages]),
+                "generate",
+                prompt_tokens=lambda: sum(self.count_tokens(m.content) for m in messages),
+            )
+        response = await run_with_deadline(generation, deadline, "generation")
+        if self.hedging is not None:
+            response, hedged = response
         
         # Extract the answer
         answer = response.generations[0][0].text
         
         # Extract metadata
+        token_usage = response.llm_output.get("token_usage", {})
         metadata = {
-            "model": settings.openai_model,
-            "tokens_used": response.llm_output.get("token_usage", {}).get("total_tokens"),
+            "model": self.hedge_llm.model_name if hedged else settings.openai_model,
+            "tokens_used": token_usage.get("total_tokens"),
             "sources_used": len(context_sources),
+            "hedged": hedged,
         }
+        record_usage("prompt", token_usage.get("prompt_tokens"))
+        record_usage("completion", token_usage.get("completion_tokens"))
         
-        logger.info(f"Generated answer with {metadata['tokens_used']} tokens")
+        logger.debug("Generated answer with %s tokens", metadata["tokens_used"])
         return answer, metadata
+    
+    async def generate_answer_stream(
+        self,
+        question: str,
+        context_sources: list[tuple[str, dict, float]],
+        conversation_history: Optional[list[dict]] = None,
+        deadline: Optional[Deadline] = None,
+        system_prompt: Optional[str] = None,
+        conversation_summary: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream an answer token by token
+        
+        Each chunk must arrive within the remaining budget; when the deadline
+        passes the provider stream is closed and DeadlineExceeded is raised.
+        """
+        messages = self._build_messages(
+            question, context_sources, system_prompt, conversation_history, conversation_summary
+        )
+        
+        logger.debug("Streaming answer for: %.100s", question)
+        prompt_tokens = sum(self.count_tokens(m.content) for m in messages)
+        record_usage("prompt", prompt_tokens)
+        completion = []
+        first = None
+        if self.hedging is None:
+            stream = self.llm.astream(messages).__aiter__()
+        else:
+            # Hedged on time to first token; the loser is closed before this returns
+            stream, first, _ = await run_with_deadline(
+                self.hedging.race_stream(
+                    lambda: self.llm.astream(messages),
+                    lambda: self.hedge_llm.astream(messages),
+                    prompt_tokens=lambda: prompt_tokens,
+                ),
+                deadline,
+                "generation"
+            )
+        try:
+            if first is not None:
+                completion.append(first.content)
+                yield first.content
+            while True:
+                try:
+                    chunk = await run_with_deadline(stream.__anext__(), deadline, "generation")
+                except StopAsyncIteration:
+                    break
+                if chunk.content:
+                    completion.append(chunk.content)
+                    yield chunk.content
+        finally:
+            # Also charged when the client disconnects or the deadline passes
+            record_usage("completion", self.count_tokens("".join(completion)))
+            await stream.aclose()
+    
+    async def summarize_conversation(
+        self,
+        messages: list[dict],
+        previous_summary: str = ""
+    ) -> str:
+        """
+        Fold ``messages`` into ``previous_summary``
+        
+        Returns:
+            The updated summary
+        """
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = [
+            SystemMessage(content=self.SUMMARY_PROMPT.format(
+                words=int(settings.conversation_summary_max_tokens * 0.75)
+            )),
+            HumanMessage(content=(
+                f"Current summary:\n{previous_summary or '(none yet)'}\n\n"
+                f"New messages:\n{transcript}"
+            )),
+        ]
+        response = await self.summary_llm.agenerate([prompt])
+        
+        token_usage = response.llm_output.get("token_usage", {})
+        record_usage("prompt", token_usage.get("prompt_tokens"))
+        record_usage("completion", token_usage.get("completion_tokens"))
+        return response.generations[0][0].text.strip()
 
 
 # Singleton pattern
@@ -0,0 +1,202 @@
+"""
+Hedged Requests
+A second LLM attempt when the first is slower than usual; the first to finish wins
+
+The hedge delay is a percentile of recent latency (whole answers, or the
+first token when streaming), read from a live histogram. A budget refilled
+by every call caps hedges at ``max_rate`` of traffic, so a provider-wide
+slowdown cannot double the load on it. Each hedge sends the prompt twice;
+that extra spend is counted as ``llm_hedge_prompt_tokens_total``.
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from src.core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BUDGET_BURST = 10.0  # Hedges that may be spent at once after a quiet period
+
+metrics = get_metrics()
+llm_latency = metrics.histogram(
+    "llm_latency_ms", "LLM answer latency, and time to first token when streaming"
+)
+hedges_sent = metrics.counter("llm_hedges_total", "Second attempts sent, by kind")
+hedges_won = metrics.counter("llm_hedge_wins_total", "Hedged calls by kind and winning attempt")
+hedges_skipped = metrics.counter(
+    "llm_hedges_skipped_total", "Hedges not sent because the budget was spent"
+)
+hedge_tokens = metrics.counter(
+    "llm_hedge_prompt_tokens_total", "Prompt tokens sent again by hedges (estimated)"
+)
+
+
+class HedgePolicy:
+    """
+    When to hedge, and whether the budget allows it
+
+    Until ``min_samples`` calls of a kind have been observed no hedges are
+    sent for it; the delay would be a guess.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay_ms: float = 250.0,
+        min_samples: int = 50,
+        max_rate: float = 0.05
+    ) -> None:
+        self.percentile = percentile
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self._budget = 0.0
+
+    def delay(self, kind: str) -> Optional[float]:
+        """Seconds to wait for the first attempt, or None to not hedge"""
+        if llm_latency.count(kind=kind) < self.min_samples:
+            return None
+        return max(self.min_delay_ms, llm_latency.percentile(self.percentile, kind=kind)) / 1000
+
+    def _deposit(self) -> None:
+        self._budget = min(BUDGET_BURST, self._budget + self.max_rate)
+
+    def _withdraw(self) -> bool:
+        if self._budget < 1.0:
+            return False
+        self._budget -= 1.0
+        return True
+
+    async def race(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        secondary: Callable[[], Awaitable[T]],
+        kind: str,
+        prompt_tokens: Optional[Callable[[], int]] = None
+    ) -> tuple[T, bool]:
+        """
+        Await ``primary()``, starting ``secondary()`` if it is too slow
+
+        Returns the first successful result and whether it came from the
+        hedge. The other attempt is cancelled; if one fails, the other is
+        still awaited. ``prompt_tokens`` is only called when a hedge is sent.
+        """
+        self._deposit()
+        start = time.perf_counter()
+        first = asyncio.ensure_future(primary())
+        tasks = [first]
+        try:
+            delay = self.delay(kind)
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+            if first.done() or delay is None or not self._begin_hedge(kind, prompt_tokens):
+                result = await first
+                llm_latency.observe((time.perf_counter() - start) * 1000, kind=kind)
+                return result, False
+
+            tasks.append(asyncio.ensure_future(secondary()))
+            result, index = await self._first_success(tasks)
+            hedges_won.inc(kind=kind, winner="hedge" if index else "primary")
+            llm_latency.observe((time.perf_counter() - start) * 1000, kind=kind)
+            return result, index == 1
+        finally:
+            # Wait for the loser to unwind so its connection or stream is free
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.wait(losers)
+
+    def _begin_hedge(self, kind: str, prompt_tokens: Optional[Callable[[], int]]) -> bool:
+        if not self._withdraw():
+            hedges_skipped.inc(kind=kind)
+            return False
+        hedges_sent.inc(kind=kind)
+        if prompt_tokens is not None:
+            hedge_tokens.inc(prompt_tokens(), kind=kind)
+        return True
+
+    @staticmethod
+    async def _first_success(tasks: list[asyncio.Future]) -> tuple[object, int]:
+        """Result and index of the first task to succeed, else the primary's error"""
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=tasks.index):
+                if task.exception() is None:
+                    return task.result(), tasks.index(task)
+                if task is tasks[0] or error is None:
+                    error = task.exception()
+        raise error
+
+    def get_stats(self) -> dict:
+        kinds = ("generate", "first_token")
+        return {
+            "percentile": self.percentile,
+            "max_rate": self.max_rate,
+            "budget": round(self._budget, 2),
+            "kinds": {
+                kind: {
+                    "calls": llm_latency.count(kind=kind),
+                    "delay_ms": (
+                        round(self.delay(kind) * 1000, 1) if self.delay(kind) is not None else None
+                    ),
+                    "hedges_sent": int(hedges_sent.value(kind=kind)),
+                    "hedges_skipped": int(hedges_skipped.value(kind=kind)),
+                    "won_by_hedge": int(hedges_won.value(kind=kind, winner="hedge")),
+                    "won_by_primary": int(hedges_won.value(kind=kind, winner="primary")),
+                    "extra_prompt_tokens": int(hedge_tokens.value(kind=kind)),
+                }
+                for kind in kinds
+            },
+        }
+
+    async def race_stream(
+        self,
+        primary: Callable[[], AsyncIterator],
+        secondary: Callable[[], AsyncIterator],
+        prompt_tokens: Optional[Callable[[], int]] = None
+    ) -> tuple[AsyncIterator, Optional[object], bool]:
+        """
+        Open ``primary()``, opening ``secondary()`` if its first token is late
+
+        Returns the winning stream, its first chunk with content (None if
+        it ended without any) and whether it is the hedge. The losing
+        stream is closed.
+        """
+        streams = [primary().__aiter__()]
+        winner = None
+
+        async def first_content(stream):
+            async for chunk in stream:
+                if chunk.content:
+                    return chunk
+            return None
+
+        async def open_primary():
+            return await first_content(streams[0])
+
+        async def open_secondary():
+            streams.append(secondary().__aiter__())
+            return await first_content(streams[1])
+
+        try:
+            chunk, hedged = await self.race(open_primary, open_secondary, "first_token", prompt_tokens)
+            winner = streams[1] if hedged else streams[0]
+            return winner, chunk, hedged
+        finally:
+            for stream in streams:
+                if stream is not winner:
+                    await _close_quietly(stream)
+
+
+async def _close_quietly(stream) -> None:
+    try:
+        await stream.aclose()
+    except Exception as e:
+        logger.debug(f"Closing losing LLM stream failed: {e}")
@@ -0,0 +1,69 @@
+"""
+Process Memory
+Resident vs. shared memory, to show what pre-forked workers really cost
+"""
+import resource
+from typing import Union
+
+from src.core.metrics import get_metrics
+
+_SMAPS_FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_bytes",
+    "Shared_Dirty": "shared_bytes",
+    "Private_Clean": "private_bytes",
+    "Private_Dirty": "private_bytes",
+}
+
+
+def memory_usage(pid: Union[int, str] = "self") -> dict:
+    """
+    Memory of one process in bytes
+
+    ``shared_bytes`` are resident pages also mapped by other processes
+    (copy-on-write pages from the parent, the page cache behind mmapped
+    snapshots). ``pss_bytes`` charges each shared page to its sharers in
+    equal parts, so summing it over workers gives their true total.
+    ``pss_bytes`` is None where /proc/<pid>/smaps_rollup is unavailable.
+    """
+    usage = {"rss_bytes": 0, "pss_bytes": 0, "shared_bytes": 0, "private_bytes": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in _SMAPS_FIELDS:
+                    usage[_SMAPS_FIELDS[name]] += int(rest.split()[0]) * 1024
+        return usage
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            fields = f.read().split()
+        page_size = resource.getpagesize()
+        usage["rss_bytes"] = int(fields[1]) * page_size
+        usage["shared_bytes"] = int(fields[2]) * page_size
+    except OSError:
+        # No /proc: peak RSS of this process is the best available
+        usage["rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    usage["private_bytes"] = usage["rss_bytes"] - usage["shared_bytes"]
+    usage["pss_bytes"] = None
+    return usage
+
+
+def register_memory_metrics() -> None:
+    """Export this process's memory as gauges, read on every scrape"""
+    metrics = get_metrics()
+    metrics.gauge(
+        "process_resident_bytes", "Resident set size",
+        callback=lambda: memory_usage()["rss_bytes"],
+    )
+    metrics.gauge(
+        "process_shared_bytes", "Resident pages shared with other processes",
+        callback=lambda: memory_usage()["shared_bytes"],
+    )
+    metrics.gauge(
+        "process_proportional_bytes", "Proportional set size (shared pages split between sharers)",
+        callback=lambda: memory_usage()["pss_bytes"] or 0,
+    )
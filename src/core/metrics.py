@@ -0,0 +1,225 @@
+"""
+In-process Metrics
+Lightweight counters, gauges and histograms with a Prometheus text export
+"""
+import bisect
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+# Latency buckets in milliseconds
+DEFAULT_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Counter:
+    """Monotonically increasing value"""
+
+    def __init__(self, name: str, description: str = "") -> None:
+        self.name = name
+        self.description = description
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def snapshot(self) -> dict:
+        return {_format_labels(dict(k)) or "_": v for k, v in self._values.items()}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(dict(key))} {value}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time value, either set directly or read from a callback"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        callback: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[tuple(sorted(labels.items()))] = value
+
+    def value(self, **labels: str) -> float:
+        if self.callback is not None and not labels:
+            return self.callback()
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def _items(self) -> list[tuple[tuple, float]]:
+        if self.callback is not None:
+            return [((), self.callback())]
+        return list(self._values.items())
+
+    def snapshot(self) -> dict:
+        return {_format_labels(dict(k)) or "_": v for k, v in self._items()}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        for key, value in self._items():
+            lines.append(f"{self.name}{_format_labels(dict(key))} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Bucketed distribution plus a rolling window of recent samples for
+    percentile estimates
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        buckets: tuple = DEFAULT_BUCKETS_MS,
+        window: int = 1024,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self._series: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, key: tuple) -> dict:
+        series = self._series.get(key)
+        if series is None:
+            series = {
+                "counts": [0] * (len(self.buckets) + 1),
+                "sum": 0.0,
+                "count": 0,
+                "recent": deque(maxlen=self.window),
+            }
+            self._series[key] = series
+        return series
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._get_series(key)
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["recent"].append(value)
+
+    def percentile(self, pct: float, **labels: str) -> Optional[float]:
+        """Percentile over the recent window, or None without samples"""
+        series = self._series.get(tuple(sorted(labels.items())))
+        if not series or not series["recent"]:
+            return None
+        ordered = sorted(series["recent"])
+        index = min(len(ordered) - 1, int(pct / 100 * len(ordered)))
+        return ordered[index]
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series["count"] if series else 0
+
+    def snapshot(self) -> dict:
+        result = {}
+        for key in list(self._series):
+            labels = dict(key)
+            series = self._series[key]
+            result[_format_labels(labels) or "_"] = {
+                "count": series["count"],
+                "mean": series["sum"] / series["count"] if series["count"] else None,
+                "p50": self.percentile(50, **labels),
+                "p95": self.percentile(95, **labels),
+                "p99": self.percentile(99, **labels),
+            }
+        return result
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key in list(self._series):
+            labels = dict(key)
+            series = self._series[key]
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels({**labels, 'le': str(bound)})} {cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series['count']}"
+            )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all metrics for this process"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._register(Counter(name, description))
+
+    def gauge(
+        self,
+        name: str,
+        description: str = "",
+        callback: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        return self._register(Gauge(name, description, callback))
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: tuple = DEFAULT_BUCKETS_MS,
+    ) -> Histogram:
+        return self._register(Histogram(name, description, buckets))
+
+    def snapshot(self) -> dict:
+        """All metrics as a JSON-friendly dict"""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render_prometheus(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create the metrics registry singleton"""
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
@@ -0,0 +1,222 @@
+"""
+Profiling
+CPU samples, heap snapshots and event-loop checks of a live worker
+
+Nothing here runs until an admin endpoint asks for it: the CPU sampler
+is a thread that exists only for the requested duration, and tracemalloc
+is off until explicitly started.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+MAX_PROFILE_SECONDS = 60.0
+
+# Leaf frames of threads waiting for work; hidden unless asked for
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+}
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    """A CPU profile is already running in this worker"""
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAVES
+
+
+def _folded_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_cpu(
+    seconds: float,
+    interval: float = 0.005,
+    include_idle: bool = False
+) -> dict:
+    """
+    Sample the stacks of every thread for ``seconds``
+
+    Blocking; run it in a worker thread. Stacks are keyed in the folded
+    format ("thread;outer;...;inner"), one count per sample that saw them.
+
+    Raises:
+        ProfilerBusyError: If another profile is running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A CPU profile is already running in this worker")
+    try:
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        sampler = threading.get_ident()
+        thread_names: dict[int, str] = {}
+        stacks: Counter = Counter()
+        samples = 0
+
+        started = time.monotonic()
+        while time.monotonic() - started < seconds:
+            for ident, frame in sys._current_frames().items():
+                if ident == sampler or (not include_idle and _is_idle(frame)):
+                    continue
+                if ident not in thread_names:
+                    thread_names = {t.ident: t.name for t in threading.enumerate()}
+                name = thread_names.get(ident, str(ident))
+                stacks[f"{name};{_folded_stack(frame)}"] += 1
+            samples += 1
+            time.sleep(interval)
+
+        return {
+            "seconds": round(time.monotonic() - started, 3),
+            "samples": samples,
+            "stacks": stacks,
+        }
+    finally:
+        _profile_lock.release()
+
+
+def folded(stacks: Counter) -> str:
+    """Folded stacks for flamegraph.pl, speedscope or inferno"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class HeapTracker:
+    """
+    tracemalloc snapshots, each compared with the one before
+
+    Tracing slows every allocation down, so it only runs between
+    ``start`` and ``stop``.
+    """
+
+    def __init__(self) -> None:
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> None:
+        if not self.tracing:
+            tracemalloc.start(frames)
+            self._previous = None
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot(self, group_by: str = "lineno", limit: int = 25) -> dict:
+        """
+        Largest allocation sites, and their growth since the last snapshot
+
+        Raises:
+            RuntimeError: If tracing was not started
+        """
+        if not self.tracing:
+            raise RuntimeError("tracemalloc is not running; start it first")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        report = {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {
+                    "site": self._site(stat.traceback, group_by),
+                    "size_bytes": stat.size,
+                    "count": stat.count,
+                }
+                for stat in snapshot.statistics(group_by)[:limit]
+            ],
+            "growth": None,
+        }
+        if self._previous is not None:
+            report["growth"] = [
+                {
+                    "site": self._site(stat.traceback, group_by),
+                    "size_diff_bytes": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size_bytes": stat.size,
+                }
+                for stat in snapshot.compare_to(self._previous, group_by)[:limit]
+            ]
+        self._previous = snapshot
+        return report
+
+    @staticmethod
+    def _site(traceback: tracemalloc.Traceback, group_by: str):
+        if group_by == "traceback":
+            return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+        frame = traceback[0]
+        return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+
+# Singleton instance
+_heap_tracker: Optional[HeapTracker] = None
+
+
+def get_heap_tracker() -> HeapTracker:
+    """Get or create heap tracker singleton"""
+    global _heap_tracker
+    if _heap_tracker is None:
+        _heap_tracker = HeapTracker()
+    return _heap_tracker
+
+
+async def measure_loop_lag(seconds: float = 1.0, interval: float = 0.01) -> dict:
+    """
+    How late timer callbacks run, sampled for ``seconds``
+
+    Lag is the time a ready callback waits behind others, i.e. how long
+    code blocks the loop between awaits.
+    """
+    loop = asyncio.get_running_loop()
+    lags = []
+    started = loop.time()
+    while loop.time() - started < seconds:
+        scheduled = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - scheduled - interval) * 1000)
+
+    lags.sort()
+    return {
+        "samples": len(lags),
+        "mean_ms": round(sum(lags) / len(lags), 3),
+        "p50_ms": round(lags[len(lags) // 2], 3),
+        "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 3),
+        "max_ms": round(lags[-1], 3),
+    }
+
+
+def pending_tasks(limit: int = 20) -> dict:
+    """Unfinished asyncio tasks of the running loop, grouped by coroutine"""
+    tasks = asyncio.all_tasks()
+    by_coroutine = Counter(
+        getattr(task.get_coro(), "__qualname__", repr(task.get_coro())) for task in tasks
+    )
+    return {
+        "pending": len(tasks),
+        "by_coroutine": dict(by_coroutine.most_common(limit)),
+        "threads": threading.active_count(),
+    }
@@ -0,0 +1,200 @@
+"""
+Collection Versions
+Alias → versioned Chroma collection mapping for blue/green re-indexing
+"""
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionAliases:
+    """
+    Persistent pointer from a logical collection name to its live version
+
+    Chroma has no native aliases, so the mapping lives in a small JSON file
+    next to the Chroma data and is replaced atomically on every switch.
+    Changes are made under a file lock on a freshly read copy, so the API
+    and the ingest worker never overwrite each other's switches.
+    Versions are listed most recently activated first (a freshly built,
+    not yet active version sits in front until it is switched to).
+    """
+
+    def __init__(self, path: Path, alias: str) -> None:
+        self.path = Path(path)
+        self.alias = alias
+        self.active: Optional[str] = None
+        self.versions: list[dict] = []
+        self._mtime_ns: Optional[int] = None
+        self.load()
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> None:
+        """Read the mapping (a missing file means no versions yet)"""
+        self._mtime_ns = self._stat()
+        if self._mtime_ns is None:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f).get(self.alias, {})
+        self.active = data.get("active")
+        self.versions = data.get("versions", [])
+
+    def changed_on_disk(self) -> bool:
+        """Whether another process has saved the mapping since it was read"""
+        return self._stat() != self._mtime_ns
+
+    def save(self) -> None:
+        """Write the mapping atomically, keeping other aliases in the file"""
+        data = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        data[self.alias] = {"active": self.active, "versions": self.versions}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime_ns = self._stat()
+
+    @contextmanager
+    def _updating(self) -> Iterator[None]:
+        """Read, modify and write the mapping while holding its file lock"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                outside = self.changed_on_disk()
+                self.load()
+                yield
+                self.save()
+                if outside:
+                    self._mtime_ns = None  # Followers still see the other process's changes
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def new_version_name(self) -> str:
+        """Unique, sortable Chroma collection name for a new version"""
+        return f"{self.alias}_v{int(time.time() * 1000)}"
+
+    def record(self, name: str, index_version: Optional[str], count: int) -> None:
+        """Register a freshly built (not yet active) version"""
+        with self._updating():
+            self.versions.insert(0, {
+                "name": name,
+                "index_version": index_version,
+                "count": count,
+                "created_at": time.time(),
+            })
+
+    def amend(self, name: str, index_version: Optional[str], count: int) -> None:
+        """Update a version changed in place"""
+        with self._updating():
+            entry = self.get(name)
+            if entry is not None:
+                entry.update(index_version=index_version, count=count)
+
+    def switch(self, name: str) -> Optional[str]:
+        """
+        Point the alias at ``name``
+
+        Returns:
+            The previously active version
+        """
+        with self._updating():
+            previous, self.active = self.active, name
+            entry = self.get(name)
+            if entry is not None:
+                self.versions.remove(entry)
+                self.versions.insert(0, entry)
+        logger.info(f"Alias '{self.alias}' switched {previous} → {name}")
+        return previous
+
+    def get(self, name: str) -> Optional[dict]:
+        return next((v for v in self.versions if v["name"] == name), None)
+
+    def rollback_target(self) -> Optional[str]:
+        """Version that was active before the current one"""
+        names = [v["name"] for v in self.versions]
+        if self.active not in names:
+            return None
+        older = names[names.index(self.active) + 1:]
+        return older[0] if older else None
+
+    def expired(self, keep: int) -> list[str]:
+        """
+        Versions beyond the newest ``keep`` that can be dropped
+
+        The active version is never returned, even after a rollback.
+        """
+        return [
+            v["name"] for v in self.versions[keep:]
+            if v["name"] != self.active
+        ]
+
+    def forget(self, name: str) -> None:
+        with self._updating():
+            self.versions = [v for v in self.versions if v["name"] != name]
+
+
+class RemoteCollectionAliases(CollectionAliases):
+    """
+    Alias mapping kept on a Chroma server, shared by every replica
+
+    Replicas have no common disk, so the mapping is stored as JSON in the
+    metadata of a marker collection next to the versions. Replicas pick up
+    switches through ``apply``. The server offers no lock, so changes are
+    made on a copy re-read just before the write, and writes still assume
+    one writer at a time (the ingestion job or a single admin call).
+    """
+
+    def __init__(self, client_factory: Callable, alias: str) -> None:
+        self._client_factory = client_factory
+        self.alias = alias
+        self.collection_name = f"{alias}_alias"
+        self.active: Optional[str] = None
+        self.versions: list[dict] = []
+        try:
+            self.load()
+        except OSError as e:
+            # Served from a fallback until the server is back (see apply)
+            logger.warning(f"Alias '{alias}' not loaded: {e}")
+
+    def load(self) -> None:
+        """Read the mapping (a missing marker collection means no versions yet)"""
+        try:
+            collection = self._client_factory().get_collection(self.collection_name)
+        except ValueError:
+            return
+        self.apply(collection.metadata)
+
+    def apply(self, metadata: Optional[dict]) -> None:
+        """Take the mapping from the marker collection's metadata"""
+        data = json.loads((metadata or {}).get("aliases", "{}"))
+        self.active = data.get("active")
+        self.versions = data.get("versions", [])
+
+    @contextmanager
+    def _updating(self) -> Iterator[None]:
+        self.load()
+        yield
+        self.save()
+
+    def save(self) -> None:
+        """Replace the mapping in one metadata update"""
+        collection = self._client_factory().get_or_create_collection(self.collection_name)
+        collection.modify(metadata={
+            "aliases": json.dumps({"active": self.active, "versions": self.versions}),
+        })
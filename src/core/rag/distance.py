@@ -0,0 +1,101 @@
+"""
+Distance Metrics
+HNSW parameters of new collection versions, and what their scores mean
+
+Chroma reports a distance, lower is better, in the collection's space:
+- l2: squared Euclidean distance
+- cosine: 1 - cosine similarity
+- ip: 1 - inner product
+
+For unit-length embeddings (OpenAI's and the local models') all three
+convert to the same cosine similarity, which is what relevance and
+confidence are reported in.
+"""
+from typing import Optional
+
+import numpy as np
+
+from src.config.settings import get_settings
+
+settings = get_settings()
+
+DISTANCE_SPACES = ("l2", "cosine", "ip")
+DEFAULT_SPACE = "l2"  # Chroma's default; collections without hnsw:space use it
+CHROMA_DEFAULTS = {
+    "hnsw:space": DEFAULT_SPACE,
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+    "hnsw:search_ef": 10,
+}
+
+
+def hnsw_metadata() -> dict:
+    """Collection metadata fixing the index parameters of a new version"""
+    if settings.vector_distance not in DISTANCE_SPACES:
+        raise ValueError(
+            f"Unknown vector_distance '{settings.vector_distance}' "
+            f"(expected one of {', '.join(DISTANCE_SPACES)})"
+        )
+    return {
+        "hnsw:space": settings.vector_distance,
+        "hnsw:M": settings.hnsw_m,
+        "hnsw:construction_ef": settings.hnsw_construction_ef,
+        "hnsw:search_ef": settings.hnsw_search_ef,
+    }
+
+
+def hnsw_matches(metadata: Optional[dict]) -> bool:
+    """Whether a collection was built with the configured index parameters"""
+    metadata = metadata or {}
+    return all(
+        metadata.get(key, CHROMA_DEFAULTS[key]) == value
+        for key, value in hnsw_metadata().items()
+    )
+
+
+def collection_space(metadata: Optional[dict]) -> str:
+    """Distance space recorded on a collection"""
+    return (metadata or {}).get("hnsw:space", DEFAULT_SPACE)
+
+
+def to_similarity(distance: float, space: str) -> float:
+    """Convert a distance in ``space`` to cosine similarity (1 = identical)"""
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    raise ValueError(f"Unknown distance space '{space}'")
+
+
+def from_similarity(similarity: float, space: str) -> float:
+    """Distance in ``space`` corresponding to a cosine similarity"""
+    if space == "l2":
+        return 2.0 * (1.0 - similarity)
+    if space in ("cosine", "ip"):
+        return 1.0 - similarity
+    raise ValueError(f"Unknown distance space '{space}'")
+
+
+def distances(
+    vectors: np.ndarray,
+    query: np.ndarray,
+    space: str,
+    norms: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Exact distances from ``query`` to every row of ``vectors``, as Chroma computes them
+
+    Args:
+        norms: Precomputed squared row norms (saves a pass over ``vectors``)
+    """
+    if norms is None:
+        norms = np.einsum("ij,ij->i", vectors, vectors)
+    dots = vectors @ query
+    if space == "l2":
+        return norms - 2 * dots + float(query @ query)
+    if space == "ip":
+        return 1.0 - dots
+    if space == "cosine":
+        scale = np.sqrt(norms) * float(np.sqrt(query @ query))
+        return 1.0 - dots / np.maximum(scale, 1e-12)
+    raise ValueError(f"Unknown distance space '{space}'")
@@ -0,0 +1,108 @@
+"""
+Result Diversification
+Maximal marginal relevance and merging of adjacent chunks
+"""
+from typing import Optional
+
+import numpy as np
+
+
+def mmr_select(
+    query_embedding: list[float],
+    embeddings: list[list[float]],
+    k: int,
+    lambda_mult: float
+) -> list[int]:
+    """
+    Indices of ``k`` candidates chosen by maximal marginal relevance
+
+    Each step picks the candidate maximising
+    ``lambda * sim(query, c) - (1 - lambda) * max sim(c, selected)``
+    with cosine similarity. The candidate×candidate similarities are one
+    matrix product; a running maximum keeps each step O(n).
+    """
+    if not embeddings or k <= 0:
+        return []
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query /= max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(vectors), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, len(vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+
+    return selected
+
+
+def _join(first: str, second: str, max_overlap: int) -> str:
+    """Concatenate two consecutive chunks, dropping the text they share"""
+    for size in range(min(len(first), len(second), max_overlap), 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+
+def _document_key(metadata: dict) -> Optional[tuple]:
+    if "chunk_index" not in metadata:
+        return None
+    return metadata.get("path") or metadata.get("source"), metadata.get("section")
+
+
+def merge_adjacent(
+    results: list[tuple[str, dict, float]],
+    max_overlap: int
+) -> list[tuple[str, dict, float]]:
+    """
+    Join consecutive chunks of the same document into one span
+
+    A merged span keeps the first chunk's metadata (with ``chunk_count``),
+    the best score of its parts and the position of its highest-ranked part.
+    Chunks without a ``chunk_index`` are passed through unchanged.
+    """
+    groups: dict[tuple, list[int]] = {}
+    for position, (_, metadata, _) in enumerate(results):
+        key = _document_key(metadata)
+        if key is not None:
+            groups.setdefault(key, []).append(position)
+
+    merged: dict[int, tuple[str, dict, float]] = {}
+    absorbed: set[int] = set()
+    for positions in groups.values():
+        positions.sort(key=lambda p: results[p][1]["chunk_index"])
+        run = [positions[0]]
+        for position in positions[1:] + [None]:
+            if (
+                position is not None
+                and results[position][1]["chunk_index"] == results[run[-1]][1]["chunk_index"] + 1
+            ):
+                run.append(position)
+                continue
+            if len(run) > 1:
+                content = results[run[0]][0]
+                for part in run[1:]:
+                    content = _join(content, results[part][0], max_overlap)
+                metadata = {**results[run[0]][1], "chunk_count": len(run)}
+                score = min(results[p][2] for p in run)
+                merged[min(run)] = (content, metadata, score)
+                absorbed.update(run)
+            run = [position]
+
+    return [
+        merged.get(position, result)
+        for position, result in enumerate(results)
+        if position in merged or position not in absorbed
+    ]
@@ -0,0 +1,121 @@
+"""
+Embedding Backends
+Pluggable embedding providers behind EmbeddingsManager
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from src.config.settings import get_settings
+from src.core.assets import models_directory
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU embeddings using a sentence-transformers model
+
+    The model is loaded once and inference runs on a dedicated thread pool,
+    so async callers never block the event loop.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        num_threads: int = 2,
+        batch_size: int = 32,
+        cache_folder: Optional[str] = None,
+    ) -> None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=local requires sentence-transformers "
+                "(pip install sentence-transformers)"
+            ) from e
+
+        import torch
+
+        # One intra-op thread per pool worker avoids oversubscribing the cores
+        torch.set_num_threads(1)
+
+        logger.info(f"Loading local embedding model: {model_name}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu", cache_folder=cache_folder)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_threads,
+            thread_name_prefix="local-embed",
+        )
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._encode([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._encode, texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def get_embedding_identity() -> dict:
+    """
+    Backend and model that produce the vectors
+
+    Stored on collections and snapshots so documents and queries are always
+    embedded the same way.
+    """
+    if settings.embedding_backend == "local":
+        model = settings.local_embedding_model
+    else:
+        model = settings.embedding_model
+    return {
+        "embedding_backend": settings.embedding_backend,
+        "embedding_model": model,
+    }
+
+
+def create_embedding_backend(backend: Optional[str] = None) -> Embeddings:
+    """
+    Create the configured embedding backend
+
+    Args:
+        backend: "openai" or "local" (defaults to settings.embedding_backend)
+    """
+    backend = backend or settings.embedding_backend
+
+    if backend == "openai":
+        return OpenAIEmbeddings(
+            model=settings.embedding_model,
+            openai_api_key=settings.openai_api_key,
+            chunk_size=1000,  # Batch size for API calls
+        )
+    if backend == "local":
+        return LocalEmbeddings(
+            model_name=settings.local_embedding_model,
+            num_threads=settings.local_embedding_threads,
+            cache_folder=str(models_directory()),
+        )
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
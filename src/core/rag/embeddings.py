@@ -2,8 +2,7 @@ import hashlib
 import logging
 from typing import Optional
 
-import tiktoken
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -12,6 +11,9 @@ from tenacity import (
 )
 
 from src.config.settings import get_settings
+from src.core.assets import load_encoding
+from src.core.rag.embedding_backends import create_embedding_backend, get_embedding_identity
+from src.core.usage import record_usage
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -19,14 +21,19 @@ settings = get_settings()
 class EmbeddingsManager:
     """Manages embeddings generation with caching and retries"""
     
-    def __init__(self) -> None:
-        """Initialize embeddings manager"""
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.embedding_model,
-            openai_api_key=settings.openai_api_key,
-            chunk_size=1000,  # Batch size for API calls
-        )
-        self.encoding = tiktoken.encoding_for_model(settings.embedding_model)
+    def __init__(self, backend: Optional[Embeddings] = None) -> None:
+        """
+        Initialize embeddings manager
+        
+        Args:
+            backend: Embedding backend (defaults to settings.embedding_backend)
+        """
+        self.embeddings = backend or create_embedding_backend()
+        self.identity = get_embedding_identity()
+        self.dimension: Optional[int] = getattr(self.embeddings, "dimension", None)
+        self.encoding = load_encoding(settings.embedding_model)
+        # Local models cost no provider tokens
+        self.metered = self.identity["embedding_backend"] != "local"
         self._cache: dict[str, list[float]] = {}
         
     def _get_cache_key(self, text: str) -> str:
@@ -60,9 +67,11 @@ class EmbeddingsManager:
             # Generate embedding
             logger.debug(f"Generating embedding for text: {text[:50]}...")
             embedding = await self.embeddings.aembed_query(text)
+            if self.metered:
+                record_usage("embedding", self.count_tokens(text))
             
             # Validate embedding
-            if not embedding or len(embedding) != settings.embedding_dimension:
+            if not embedding or (self.dimension and len(embedding) != self.dimension):
                 raise ValueError(
                     f"Invalid embedding dimension: {len(embedding) if embedding else 0}"
                 )
@@ -120,6 +129,8 @@ class EmbeddingsManager:
             try:
                 logger.info(f"Generating embeddings for {len(uncached_texts)} documents")
                 new_embeddings = await self.embeddings.aembed_documents(uncached_texts)
+                if self.metered:
+                    record_usage("embedding", sum(map(self.count_tokens, uncached_texts)))
                 
                 # Update cache and results
                 for idx, embedding in zip(uncached_indices, new_embeddings):
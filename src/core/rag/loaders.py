@@ -0,0 +1,203 @@
+"""
+Document Loaders
+Lazy, per-format readers that turn knowledge base files into documents
+"""
+import json
+import logging
+import os
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Large files are yielded in sections of about this many characters so
+# no loader ever holds a whole multi-GB file in memory
+SECTION_CHARS = 1 << 20
+READ_BLOCK_CHARS = 1 << 16
+
+# A loader yields (text, extra_metadata) for each document in a file
+Loader = Callable[[Path], Iterator[tuple[str, dict]]]
+
+_LOADERS: dict[str, tuple[str, Loader]] = {}
+
+
+def register_loader(doc_type: str, *suffixes: str) -> Callable[[Loader], Loader]:
+    """Register a loader for file suffixes (e.g. ``".md"``)"""
+    def decorator(loader: Loader) -> Loader:
+        for suffix in suffixes:
+            _LOADERS[suffix.lower()] = (doc_type, loader)
+        return loader
+    return decorator
+
+
+def supported_suffixes() -> set[str]:
+    return set(_LOADERS)
+
+
+def _sections(blocks: Iterator[str]) -> Iterator[tuple[str, dict]]:
+    """
+    Regroup text blocks into sections, cut at paragraph breaks
+
+    A file that fits in one section is yielded without a ``section`` key,
+    so chunk IDs of ordinary files do not depend on this mechanism.
+    """
+    buffer = ""
+    section = 0
+    for block in blocks:
+        buffer += block
+        while len(buffer) >= SECTION_CHARS:
+            cut = buffer.rfind("\n\n", 0, SECTION_CHARS)
+            cut = cut + 2 if cut > 0 else SECTION_CHARS
+            yield buffer[:cut], {"section": section}
+            buffer = buffer[cut:]
+            section += 1
+    if buffer.strip():
+        yield buffer, ({"section": section} if section else {})
+
+
+def _read_blocks(path: Path) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(READ_BLOCK_CHARS), ""):
+            yield block
+
+
+@register_loader("markdown", ".md", ".markdown")
+def load_markdown(path: Path) -> Iterator[tuple[str, dict]]:
+    yield from _sections(_read_blocks(path))
+
+
+@register_loader("text", ".txt")
+def load_text(path: Path) -> Iterator[tuple[str, dict]]:
+    """Plain text, including text already extracted from PDFs"""
+    yield from _sections(_read_blocks(path))
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collects visible text, fed incrementally"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "section", "article", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def drain(self) -> str:
+        text, self.parts = "".join(self.parts), []
+        return text
+
+
+@register_loader("html", ".html", ".htm")
+def load_html(path: Path) -> Iterator[tuple[str, dict]]:
+    parser = _HTMLTextExtractor()
+
+    def blocks() -> Iterator[str]:
+        for block in _read_blocks(path):
+            parser.feed(block)
+            yield parser.drain()
+        parser.close()
+        yield parser.drain()
+
+    yield from _sections(blocks())
+
+
+@register_loader("pdf", ".pdf")
+def load_pdf(path: Path) -> Iterator[tuple[str, dict]]:
+    """One document per page (pages are parsed lazily by pypdf)"""
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ImportError("Loading .pdf files requires pypdf (pip install pypdf)") from e
+
+    reader = PdfReader(str(path))
+    for page_index, page in enumerate(reader.pages):
+        text = page.extract_text() or ""
+        if text.strip():
+            yield text, {"section": page_index, "page": page_index + 1}
+
+
+@register_loader("jsonl", ".jsonl")
+def load_jsonl(path: Path) -> Iterator[tuple[str, dict]]:
+    """
+    One document per line of an export
+
+    Text is taken from ``text`` or ``content``; scalar ``title`` and ``url``
+    fields are kept as metadata.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping invalid JSON on line {line_no + 1} of {path}")
+                continue
+            text = record.get("text") or record.get("content")
+            if not text:
+                continue
+            extra = {"section": line_no}
+            for key in ("title", "url"):
+                if isinstance(record.get(key), (str, int, float, bool)):
+                    extra[key] = record[key]
+            yield text, extra
+
+
+def iter_source_files(directory: Path) -> Iterator[Path]:
+    """Files with a registered loader, in a stable order, without listing everything up front"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if Path(name).suffix.lower() in _LOADERS:
+                yield Path(root) / name
+
+
+def load_file(file_path: Path, directory: Path) -> Iterator[tuple[str, dict]]:
+    """
+    Documents in one file with their metadata
+
+    Yields:
+        (content, metadata) tuples
+    """
+    doc_type, loader = _LOADERS[file_path.suffix.lower()]
+    base_metadata = {
+        "source": file_path.name,
+        "path": str(file_path.relative_to(directory)),
+        "type": doc_type,
+    }
+    for text, extra in loader(file_path):
+        yield text, {**base_metadata, **extra}
+
+
+def iter_documents(directory: Path) -> Iterator[tuple[str, dict]]:
+    """
+    Lazily load every supported file under ``directory``
+
+    Files that fail to load are logged and skipped.
+    """
+    if not directory.exists():
+        logger.error(f"Directory not found: {directory}")
+        return
+
+    for file_path in iter_source_files(directory):
+        try:
+            yield from load_file(file_path, directory)
+            logger.info(f"✅ Loaded: {file_path.name}")
+        except Exception as e:
+            logger.error(f"❌ Failed to load {file_path}: {e}")
@@ -0,0 +1,230 @@
+"""
+Remote Vector Store
+Batched queries to a standalone Chroma server over a pooled HTTP client
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+from src.core.usage import spawn_background
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+API_PREFIX = "/api/v1"
+
+metrics = get_metrics()
+remote_queries = metrics.counter(
+    "remote_store_queries_total", "Queries to the Chroma server by outcome"
+)
+remote_batch_size = metrics.histogram(
+    "remote_store_batch_size", "Queries sent per request to the Chroma server",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+
+class RemoteStoreUnavailable(ConnectionError):
+    """The Chroma server could not be reached or failed to answer"""
+
+
+def _missing_collection(response: httpx.Response) -> bool:
+    # The server reports a missing collection as an error body, not a 404
+    return "does not exist" in response.text
+
+
+class RemoteVectorSearch:
+    """
+    Query path to a Chroma server shared by every API replica
+
+    Concurrent queries with the same collection, filter and result size
+    are collected for ``batch_window_ms`` and sent as one request with
+    several query embeddings. Connections are pooled per worker.
+
+    After a failure the server is considered down for ``retry_seconds``,
+    so callers with a local fallback stop paying the timeout on every
+    request.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 5.0,
+        max_connections: int = 20,
+        batch_window_ms: float = 2.0,
+        max_batch: int = 32,
+        retry_seconds: float = 10.0
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.retry_seconds = retry_seconds
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url + API_PREFIX,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self._collection_ids: dict[str, str] = {}
+        self._pending: dict[tuple, tuple[list, asyncio.TimerHandle]] = {}
+        self._inflight: set[asyncio.Task] = set()
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        """False while backing off after a failure"""
+        return time.monotonic() >= self._down_until
+
+    def _unavailable(self, error: Exception) -> RemoteStoreUnavailable:
+        if self.available:
+            logger.warning(f"Chroma server {self.base_url} unavailable: {error}")
+        self._down_until = time.monotonic() + self.retry_seconds
+        return RemoteStoreUnavailable(f"Chroma server {self.base_url}: {error}")
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        try:
+            response = await self._client.request(method, path, **kwargs)
+        except httpx.TransportError as e:
+            raise self._unavailable(e) from e
+        if response.status_code >= 500 and not _missing_collection(response):
+            raise self._unavailable(RuntimeError(f"HTTP {response.status_code}"))
+        return response
+
+    async def get_collection(self, name: str) -> Optional[dict]:
+        """Collection record (id, name, metadata), or None if it does not exist"""
+        response = await self._request("GET", f"/collections/{name}")
+        if response.is_error:
+            if _missing_collection(response):
+                return None
+            raise ValueError(f"Chroma server: {response.text}")
+        collection = response.json()
+        self._collection_ids[name] = collection["id"]
+        return collection
+
+    async def _collection_id(self, name: str) -> str:
+        if name not in self._collection_ids:
+            if await self.get_collection(name) is None:
+                raise ValueError(f"Collection {name} does not exist.")
+        return self._collection_ids[name]
+
+    async def query(
+        self,
+        collection_name: str,
+        query_embedding: list[float],
+        n_results: int,
+        where: Optional[dict] = None,
+        include: tuple[str, ...] = ("documents", "metadatas", "distances")
+    ) -> dict:
+        """
+        Nearest neighbours of one embedding, in Chroma's result layout
+
+        Raises:
+            RemoteStoreUnavailable: If the server cannot be reached
+            ValueError: If the collection does not exist or the request is invalid
+        """
+        key = (collection_name, n_results, json.dumps(where, sort_keys=True), tuple(include))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        if key not in self._pending:
+            timer = loop.call_later(self.batch_window, self._dispatch, key)
+            self._pending[key] = ([], timer)
+        batch, _ = self._pending[key]
+        batch.append((query_embedding, future))
+        if len(batch) >= self.max_batch:
+            self._dispatch(key)
+
+        return await future
+
+    def _dispatch(self, key: tuple) -> None:
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return
+        batch, timer = entry
+        timer.cancel()
+        task = spawn_background(self._send(key, batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, key: tuple, batch: list[tuple[list[float], asyncio.Future]]) -> None:
+        collection_name, n_results, where, include = key
+        remote_batch_size.observe(len(batch))
+        try:
+            collection_id = await self._collection_id(collection_name)
+            response = await self._request(
+                "POST",
+                f"/collections/{collection_id}/query",
+                json={
+                    "query_embeddings": [embedding for embedding, _ in batch],
+                    "n_results": n_results,
+                    "where": json.loads(where) or {},
+                    "where_document": {},
+                    "include": list(include),
+                },
+            )
+            if response.is_error:
+                raise ValueError(f"Chroma server: {response.text}")
+            results = response.json()
+        except Exception as e:
+            # A collection dropped by a version switch is looked up again next time
+            self._collection_ids.pop(collection_name, None)
+            remote_queries.inc(len(batch), outcome="error")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        remote_queries.inc(len(batch), outcome="ok")
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result({
+                    field: [results[field][i]] for field in ("ids", *include)
+                })
+
+    async def heartbeat(self) -> None:
+        """
+        Ping the server, ending any back-off once it answers
+
+        Raises:
+            RemoteStoreUnavailable: If the server cannot be reached
+        """
+        response = await self._request("GET", "/heartbeat")
+        if response.is_error:
+            raise self._unavailable(RuntimeError(f"HTTP {response.status_code}"))
+        self._down_until = 0.0
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+# Singleton instance (one connection pool per worker)
+_remote_search: Optional[RemoteVectorSearch] = None
+
+
+def get_remote_search() -> RemoteVectorSearch:
+    """Get or create the pooled client for settings.chroma_server_url"""
+    global _remote_search
+    if _remote_search is None:
+        _remote_search = RemoteVectorSearch(
+            settings.chroma_server_url,
+            timeout=settings.chroma_server_timeout,
+            max_connections=settings.chroma_server_max_connections,
+            batch_window_ms=settings.chroma_server_batch_window_ms,
+            max_batch=settings.chroma_server_max_batch,
+            retry_seconds=settings.chroma_server_retry_seconds,
+        )
+    return _remote_search
+
+
+async def close_remote_search() -> None:
+    global _remote_search
+    if _remote_search is not None:
+        await _remote_search.close()
+        _remote_search = None
@@ -0,0 +1,188 @@
+"""
+Query Router
+Narrows a search to the knowledge base partitions a question is about
+"""
+import logging
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.core.metrics import get_metrics
+from src.core.rag.snapshot import tokenize
+
+logger = logging.getLogger(__name__)
+
+routing_decisions = get_metrics().counter(
+    "retrieval_routing_total", "Retrieval routing decisions by outcome"
+)
+
+
+def build_where(filters: Optional[dict]) -> Optional[dict]:
+    """
+    Chroma ``where`` clause from a {field: value | [values]} mapping
+
+    Lists match any of their values; several fields must all match.
+    """
+    if not filters:
+        return None
+    clauses = [
+        {field: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else value}
+        for field, value in filters.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def matches_where(metadata: dict, where: Optional[dict]) -> bool:
+    """
+    Evaluate a Chroma ``where`` clause against one metadata dict
+
+    Supports the operators build_where emits plus $eq, $ne, $nin and $or,
+    for searches that do not go through Chroma.
+    """
+    if not where:
+        return True
+    for field, condition in where.items():
+        if field == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif field == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            value = metadata.get(field)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator not in ("$eq", "$ne", "$in", "$nin"):
+                    raise ValueError(f"Unsupported where operator: {operator}")
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+    return True
+
+
+def _keywords(partition: str) -> set[str]:
+    """Words in a partition name ("work-experience.md" → {"work", "experience"})"""
+    words = set(tokenize(Path(partition).stem))
+    return words | {w[:-1] for w in words if w.endswith("s") and len(w) > 3}
+
+
+class QueryRouter:
+    """
+    Picks the partitions (values of one metadata field, e.g. ``source``)
+    most likely to hold the answer
+
+    A keyword match on a partition's name wins outright; otherwise the
+    query embedding is compared with each partition's centroid. When the
+    best partitions are not clearly ahead, no filter is returned and the
+    full index is searched.
+    """
+
+    def __init__(self, partition_key: str, max_partitions: int, margin: float) -> None:
+        self.partition_key = partition_key
+        self.max_partitions = max_partitions
+        self.margin = margin
+        self.partitions: list[str] = []
+        self._keywords: dict[str, set[str]] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._sums: dict[str, np.ndarray] = {}
+        self._counts: dict[str, int] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._centroids is not None
+
+    def fit(self, batches: Iterable[tuple[list, list[dict]]]) -> None:
+        """
+        Compute normalized centroids per partition from the indexed chunks
+
+        Takes (embeddings, metadatas) batches and keeps only running sums,
+        so fitting a large collection does not load it all at once.
+        """
+        self._sums, self._counts = {}, {}
+        for embeddings, metadatas in batches:
+            self._accumulate(embeddings, metadatas, 1)
+        self._set_centroids()
+        logger.info(f"Query router fitted on {len(self.partitions)} partitions")
+
+    def update(
+        self,
+        added: tuple[list, list[dict]],
+        removed: tuple[list, list[dict]]
+    ) -> "QueryRouter":
+        """Router with the chunks ``added`` and ``removed`` (embeddings, metadatas) applied"""
+        router = QueryRouter(self.partition_key, self.max_partitions, self.margin)
+        router._sums = {key: total.copy() for key, total in self._sums.items()}
+        router._counts = dict(self._counts)
+        router._accumulate(*removed, -1)
+        router._accumulate(*added, 1)
+        router._set_centroids()
+        return router
+
+    def _accumulate(self, embeddings: list, metadatas: list[dict], sign: int) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        for vector, metadata in zip(vectors, metadatas):
+            value = (metadata or {}).get(self.partition_key)
+            if value is None:
+                continue
+            key = str(value)
+            if key in self._sums:
+                self._sums[key] += sign * vector
+            else:
+                self._sums[key] = sign * vector
+            self._counts[key] = self._counts.get(key, 0) + sign
+            if self._counts[key] <= 0:
+                del self._sums[key], self._counts[key]
+
+    def _set_centroids(self) -> None:
+        sums = self._sums
+        self.partitions = sorted(sums)
+        self._keywords = {p: _keywords(p) for p in self.partitions}
+        if not self.partitions:
+            self._centroids = np.zeros((0, 0), dtype=np.float32)
+            return
+
+        # Direction of the mean equals direction of the sum
+        centroids = np.stack([sums[p] for p in self.partitions])
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self._centroids = centroids / np.where(norms == 0, 1, norms)
+
+    def route(self, query: str, query_embedding: list[float]) -> Optional[list[str]]:
+        """
+        Partitions to search, or None for the full index
+        """
+        if len(self.partitions) <= 1:
+            return None
+
+        query_words = set(tokenize(query))
+        matched = [p for p in self.partitions if self._keywords[p] & query_words]
+        if 0 < len(matched) <= self.max_partitions:
+            routing_decisions.inc(outcome="keyword")
+            return matched
+
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm == 0 or self._centroids is None or not len(self._centroids):
+            routing_decisions.inc(outcome="full")
+            return None
+
+        scores = self._centroids @ (query_vector / norm)
+        order = np.argsort(-scores)
+        best = scores[order[0]]
+        selected = [
+            int(i) for i in order[:self.max_partitions] if scores[i] >= best - self.margin
+        ]
+
+        # Ambiguous if the first partition left out is as close as the ones kept
+        if len(order) <= len(selected) or scores[order[len(selected)]] >= best - self.margin:
+            routing_decisions.inc(outcome="full")
+            return None
+
+        routing_decisions.inc(outcome="centroid")
+        return [self.partitions[i] for i in selected]
@@ -0,0 +1,128 @@
+"""
+Shared Index
+Read-only search over a memory-mapped snapshot, shared by forked workers
+"""
+import json
+import logging
+import mmap
+from typing import Iterator, Optional
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.core.rag.distance import distances as compute_distances
+from src.core.rag.router import matches_where
+from src.core.rag.snapshot import CHUNKS_FILE, IndexSnapshot
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class SharedIndex:
+    """
+    Exact nearest-neighbour search straight from snapshot files
+
+    Vectors and chunk records stay in memory-mapped files and per-chunk
+    state lives in NumPy arrays, never in per-chunk Python objects. Built
+    before the server forks, every worker reads the same physical pages
+    instead of holding its own copy of the index.
+
+    Distances are computed in ``space`` exactly as Chroma would (the
+    configured metric by default), and ``query`` returns Chroma's result
+    layout so callers can use either.
+    """
+
+    def __init__(self, snapshot: IndexSnapshot, space: Optional[str] = None) -> None:
+        self.space = space or settings.vector_distance
+        self.version = snapshot.version
+        self.count = snapshot.count
+        self.vectors = snapshot.vectors
+        self._norms = np.einsum("ij,ij->i", self.vectors, self.vectors) if self.count else np.zeros(0)
+
+        with open(snapshot.path / CHUNKS_FILE, "rb") as f:
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+
+        # Byte offset of each JSONL record, plus one past the end
+        offsets = [0]
+        position = self._records.find(b"\n") if self.count else -1
+        while position != -1:
+            offsets.append(position + 1)
+            position = self._records.find(b"\n", position + 1)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+
+        if len(self._offsets) - 1 != self.count:
+            raise ValueError(
+                f"Snapshot {self.version} has {len(self._offsets) - 1} chunk records "
+                f"for {self.count} vectors"
+            )
+
+    def record(self, index: int) -> dict:
+        """Chunk record (id, text, metadata) at a row of the vector matrix"""
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return json.loads(self._records[start:end])
+
+    def query(
+        self,
+        query_embedding: list[float],
+        n_results: int,
+        where: Optional[dict] = None,
+        include_embeddings: bool = False
+    ) -> dict:
+        """
+        The ``n_results`` nearest chunks matching ``where``
+
+        Candidates are taken in widening windows of nearest rows until
+        enough of them pass the filter.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        distances = compute_distances(self.vectors, query, self.space, self._norms)
+
+        hits: list[tuple[int, dict]] = []
+        window = n_results if where is None else n_results * 4
+        while self.count:
+            window = min(window, self.count)
+            nearest = np.argpartition(distances, window - 1)[:window]
+            nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+            hits = []
+            for index in nearest:
+                record = self.record(int(index))
+                if matches_where(record["metadata"], where):
+                    hits.append((int(index), record))
+                    if len(hits) == n_results:
+                        break
+            if len(hits) == n_results or window == self.count:
+                break
+            window *= 4
+
+        result = {
+            "ids": [[record["id"] for _, record in hits]],
+            "documents": [[record["text"] for _, record in hits]],
+            "metadatas": [[record["metadata"] for _, record in hits]],
+            "distances": [[float(distances[index]) for index, _ in hits]],
+        }
+        if include_embeddings:
+            result["embeddings"] = [[self.vectors[index].tolist() for index, _ in hits]]
+        return result
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[tuple[np.ndarray, list[dict]]]:
+        """(embeddings, metadatas) batches, e.g. for fitting the query router"""
+        for start in range(0, self.count, batch_size):
+            stop = min(start + batch_size, self.count)
+            yield self.vectors[start:stop], [self.record(i)["metadata"] for i in range(start, stop)]
+
+
+# Set in the serving parent before workers fork
+_shared_index: Optional[SharedIndex] = None
+
+
+def load_shared_index(snapshot: IndexSnapshot) -> SharedIndex:
+    """Open a snapshot for sharing with workers forked afterwards"""
+    global _shared_index
+    _shared_index = SharedIndex(snapshot)
+    logger.info(f"Shared index {_shared_index.version} loaded ({_shared_index.count} chunks)")
+    return _shared_index
+
+
+def get_shared_index() -> Optional[SharedIndex]:
+    """The index loaded before fork, if the process is a pre-forked worker"""
+    return _shared_index
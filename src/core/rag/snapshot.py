@@ -0,0 +1,235 @@
+"""
+Index Snapshots
+Versioned, checksummed on-disk copies of the vector index so new replicas
+can start serving without re-embedding the knowledge base
+"""
+import hashlib
+import json
+import logging
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.core.rag.embedding_backends import get_embedding_identity
+from src.core.rag.loaders import iter_source_files
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.jsonl"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokenizer (query routing matches words against file names)"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _file_sha256(path: Path) -> str:
+    """Hash a file in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_corpus_hash(data_dir: Path) -> str:
+    """
+    Hash the knowledge base so a snapshot can be matched to the files it was built from
+    """
+    digest = hashlib.sha256()
+    for file_path in iter_source_files(data_dir):
+        digest.update(str(file_path.relative_to(data_dir)).encode())
+        digest.update(_file_sha256(file_path).encode())
+    return digest.hexdigest()
+
+
+def get_index_config() -> dict:
+    """Settings that change the contents of the index"""
+    return {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        **get_embedding_identity(),
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+    }
+
+
+def compute_index_version(corpus_hash: str, config: dict) -> str:
+    """Derive a stable version id from the corpus and index settings"""
+    payload = json.dumps({"corpus": corpus_hash, "config": config}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class IndexSnapshot:
+    """
+    A loaded index snapshot
+
+    Vectors are memory-mapped read-only, so loading is O(1) in the size of
+    the index and the pages are shared between processes.
+    """
+
+    def __init__(self, path: Path, manifest: dict) -> None:
+        self.path = path
+        self.manifest = manifest
+        self._vectors: Optional[np.ndarray] = None
+        self._chunks: Optional[list[dict]] = None
+
+    @property
+    def version(self) -> str:
+        return self.manifest["index_version"]
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Chunk embeddings as a read-only (count, dim) float32 matrix"""
+        if self._vectors is None:
+            self._vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+        return self._vectors
+
+    @property
+    def chunks(self) -> list[dict]:
+        """Chunk records with id, text and metadata"""
+        if self._chunks is None:
+            with open(self.path / CHUNKS_FILE, "r", encoding="utf-8") as f:
+                self._chunks = [json.loads(line) for line in f]
+        return self._chunks
+
+    def verify(self) -> bool:
+        """Check every file against the checksums in the manifest"""
+        for name, expected in self.manifest["checksums"].items():
+            file_path = self.path / name
+            if not file_path.exists() or _file_sha256(file_path) != expected:
+                logger.error(f"Snapshot checksum mismatch for {file_path}")
+                return False
+        return True
+
+    def matches(self, corpus_hash: Optional[str] = None) -> bool:
+        """Whether the snapshot was built with the current settings (and corpus)"""
+        if self.manifest.get("config") != get_index_config():
+            return False
+        if corpus_hash is not None and self.manifest.get("corpus_hash") != corpus_hash:
+            return False
+        return True
+
+
+def write_snapshot(
+    output_dir: Path,
+    ids: list[str],
+    chunks: list[str],
+    metadatas: list[dict],
+    embeddings: list[list[float]],
+    corpus_hash: str,
+) -> IndexSnapshot:
+    """
+    Write a snapshot atomically
+
+    Files are written to a temporary sibling directory which is renamed into
+    place once complete, so readers never see a partial snapshot.
+    """
+    if not (len(ids) == len(chunks) == len(metadatas) == len(embeddings)):
+        raise ValueError("ids, chunks, metadatas and embeddings must have the same length")
+
+    config = get_index_config()
+    index_version = compute_index_version(corpus_hash, config)
+
+    output_dir = Path(output_dir)
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = output_dir.with_name(f".{output_dir.name}.{index_version}.tmp")
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    np.save(tmp_dir / VECTORS_FILE, vectors)
+
+    with open(tmp_dir / CHUNKS_FILE, "w", encoding="utf-8") as f:
+        for chunk_id, text, metadata in zip(ids, chunks, metadatas):
+            f.write(json.dumps({"id": chunk_id, "text": text, "metadata": metadata}) + "\n")
+
+    manifest = {
+        "index_version": index_version,
+        "created_at": time.time(),
+        "corpus_hash": corpus_hash,
+        "config": config,
+        "count": len(ids),
+        "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "checksums": {
+            name: _file_sha256(tmp_dir / name)
+            for name in (VECTORS_FILE, CHUNKS_FILE)
+        },
+    }
+    with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished snapshot into place
+    if output_dir.exists():
+        old_dir = output_dir.with_name(f".{output_dir.name}.old")
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        output_dir.rename(old_dir)
+        tmp_dir.rename(output_dir)
+        shutil.rmtree(old_dir)
+    else:
+        tmp_dir.rename(output_dir)
+
+    logger.info(f"Wrote index snapshot {index_version} ({len(ids)} chunks) to {output_dir}")
+    return IndexSnapshot(output_dir, manifest)
+
+
+def load_snapshot(path: Path, verify: bool = True) -> Optional[IndexSnapshot]:
+    """
+    Load a snapshot from disk
+
+    Returns None if there is no snapshot or it fails verification.
+    """
+    path = Path(path)
+    manifest_path = path / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Failed to read snapshot manifest {manifest_path}: {e}")
+        return None
+
+    snapshot = IndexSnapshot(path, manifest)
+    if verify and not snapshot.verify():
+        return None
+    return snapshot
+
+
+def find_matching_snapshot(
+    path: Path,
+    data_dir: Optional[Path] = None,
+    verify: bool = True,
+) -> Optional[IndexSnapshot]:
+    """
+    Return the snapshot at ``path`` if it matches the current settings and,
+    when ``data_dir`` is given, the current knowledge base
+    """
+    snapshot = load_snapshot(path, verify=verify)
+    if snapshot is None:
+        return None
+
+    corpus_hash = None
+    if data_dir is not None and Path(data_dir).exists():
+        corpus_hash = compute_corpus_hash(Path(data_dir))
+
+    if not snapshot.matches(corpus_hash):
+        logger.info(f"Snapshot {snapshot.version} does not match current index settings")
+        return None
+    return snapshot
@@ -1,42 +1,179 @@
+import asyncio
+import hashlib
 import logging
+import os
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from urllib.parse import urlsplit
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional
 
 import chromadb
-from chromadb.config import Settings as ChromaSettings
+import numpy as np
+from chromadb.api import ServerAPI
+from chromadb.config import Settings as ChromaSettings, System
 from langchain_community.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 
 from src.config.settings import get_settings
+from src.core.deadline import Deadline, run_with_deadline
+from src.core.rag.collection_versions import CollectionAliases, RemoteCollectionAliases
+from src.core.rag.distance import CHROMA_DEFAULTS, collection_space, from_similarity, hnsw_matches, hnsw_metadata, to_similarity
+from src.core.rag.diversify import merge_adjacent, mmr_select
+from src.core.rag.embeddings import get_embeddings_manager
+from src.core.rag import remote_store
+from src.core.rag.remote_store import (
+    RemoteStoreUnavailable,
+    RemoteVectorSearch,
+    get_remote_search,
+    remote_queries,
+)
+from src.core.rag.router import QueryRouter, build_where, routing_decisions
+from src.core.rag.shared_index import SharedIndex
+from src.core.rag.snapshot import IndexSnapshot
+from src.core.structured_logging import stage_timer
+from src.core.usage import spawn_background
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Bytes per vector held by HNSW beyond the raw floats: 2*M 4-byte links per layer-0 node
+HNSW_LINK_BYTES_PER_M = 2 * 4
+
+_chroma_client = None
+
+
+class _ServerClient:
+    """
+    chromadb.HttpClient raising the embedded client's errors
+    
+    The server's "collection does not exist" ValueError reaches the HTTP
+    client as a bare Exception; callers here expect ValueError.
+    """
+    
+    def __init__(self, client) -> None:
+        self._client = client
+    
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+    
+    def get_collection(self, name: str, *args, **kwargs):
+        try:
+            return self._client.get_collection(name, *args, **kwargs)
+        except ValueError:
+            raise
+        except Exception as e:
+            if "does not exist" in str(e):
+                raise ValueError(str(e)) from e
+            raise
+    
+    def delete_collection(self, name: str) -> None:
+        try:
+            self._client.delete_collection(name)
+        except ValueError:
+            raise
+        except Exception as e:
+            if "does not exist" in str(e):
+                raise ValueError(str(e)) from e
+            raise
+
+
+def get_chroma_client():
+    """
+    ChromaDB client shared by every collection (and tenant) in the process
+    
+    Embedded (PersistentClient on a local volume) unless
+    settings.chroma_server_url points at a Chroma server.
+    
+    Raises:
+        RemoteStoreUnavailable: If the server cannot be reached
+    """
+    global _chroma_client
+    if _chroma_client is None:
+        chroma_settings = ChromaSettings(anonymized_telemetry=False)
+        if settings.chroma_server_url:
+            url = urlsplit(settings.chroma_server_url)
+            try:
+                client = chromadb.HttpClient(
+                    host=url.hostname,
+                    port=str(url.port or (443 if url.scheme == "https" else 80)),
+                    ssl=url.scheme == "https",
+                    settings=chroma_settings
+                )
+            except ValueError as e:
+                # Failed pre-flight check; distinct from a missing collection
+                raise RemoteStoreUnavailable(str(e)) from e
+            _chroma_client = _ServerClient(client)
+        else:
+            persist_directory = Path(settings.chroma_persist_directory)
+            persist_directory.mkdir(parents=True, exist_ok=True)
+            
+            _chroma_client = chromadb.PersistentClient(
+                path=str(persist_directory),
+                settings=chroma_settings
+            )
+    return _chroma_client
+
+
+def open_local_client(persist_directory: Path):
+    """
+    Embedded Chroma with its own System, for a store that can be closed
+    
+    PersistentClient shares one System per path for the life of the
+    process; a System started here is released by ``System.stop()`` and
+    dropping the returned references.
+    
+    Returns:
+        (client, system)
+    """
+    persist_directory.mkdir(parents=True, exist_ok=True)
+    system = System(ChromaSettings(
+        is_persistent=True,
+        persist_directory=str(persist_directory),
+        anonymized_telemetry=False,
+    ))
+    client = system.instance(ServerAPI)
+    system.start()
+    return client, system
+
+
+class ReadOnlyIndexError(RuntimeError):
+    """The index is a shared snapshot and cannot be modified in place"""
+
 
 class VectorStoreManager:
     """
     Manages our vector database (ChromaDB)
     """
     
-    def __init__(self):
-        """Initialize the vector store"""
-        # Create directory if it doesn't exist
-        self.persist_directory = Path(settings.chroma_persist_directory)
-        self.persist_directory.mkdir(parents=True, exist_ok=True)
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        data_dir: Optional[Path] = None,
+        persist_directory: Optional[Path] = None
+    ):
+        """
+        Initialize the vector store
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=str(self.persist_directory),
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
+        Args:
+            collection_name: Logical collection (defaults to settings; one per tenant)
+            data_dir: Knowledge base directory the collection is built from
+            persist_directory: Own embedded store, opened on first use and
+                released by ``close()`` (default: the shared client)
+        """
+        self.persist_directory = Path(persist_directory or settings.chroma_persist_directory)
+        # Only embedded stores can be closed; a Chroma server keeps its own memory
+        self._owns_client = persist_directory is not None and not settings.chroma_server_url
+        self._client = None
+        self._system = None
+        self._client_lock = threading.Lock()
+        self.data_dir = Path(data_dir or settings.knowledge_base_directory)
         
-        # Initialize OpenAI embeddings
+        # Embedding backend shared with EmbeddingsManager
         # This converts text → vectors
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=settings.openai_api_key
-        )
+        self.embeddings_manager = get_embeddings_manager()
+        self.embeddings = self.embeddings_manager.embeddings
+        self.embedding_identity = self.embeddings_manager.identity
         
         # Text splitter
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -44,20 +181,229 @@ class VectorStoreManager:
             chunk_overlap=settings.chunk_overlap,
         )
         
+        # Logical name; queries go to whichever version the alias points at
+        self.collection_name = collection_name or settings.chroma_collection_name
+        self.remote: Optional[RemoteVectorSearch] = None
+        if settings.chroma_server_url:
+            # Shared by all replicas; queries skip the sync client
+            self.remote = get_remote_search()
+            self.aliases = RemoteCollectionAliases(get_chroma_client, alias=self.collection_name)
+        else:
+            self.aliases = CollectionAliases(
+                self.persist_directory / "aliases.json",
+                alias=self.collection_name,
+            )
+        self._aliases_checked = 0.0
+        self._remote_version: Optional[str] = None  # Version queried over HTTP so far
+        self._local_version = self.aliases.active  # Version this process serves locally
         self._vector_store = None
+        self._index_version: Optional[str] = None
+        self._distance_space: Optional[str] = None
+        self._reindex_lock = asyncio.Lock()
+        self.router = self._new_router()
+        self.shared_index: Optional[SharedIndex] = None
+        self.fallback_index: Optional[SharedIndex] = None
+        self.snapshot_index: Optional[SharedIndex] = None  # Serving while a restore builds
+        self._restore_task: Optional[asyncio.Task] = None
+        self._switch_listeners: list[Callable[[], None]] = []
+    
+    @property
+    def client(self):
+        """Chroma client, connected on first use"""
+        if not self._owns_client:
+            return get_chroma_client()
+        with self._client_lock:
+            if self._client is None:
+                self._client, self._system = open_local_client(self.persist_directory)
+            return self._client
+    
+    @staticmethod
+    def _new_router() -> QueryRouter:
+        return QueryRouter(
+            partition_key=settings.retrieval_partition_key,
+            max_partitions=settings.routing_max_partitions,
+            margin=settings.routing_margin,
+        )
+    
+    def _fit_router(self, collection_name: str, page_size: int = 1000) -> QueryRouter:
+        """Router for a collection, fitted page by page"""
+        router = self._new_router()
+        try:
+            collection = self.client.get_collection(collection_name)
+        except ValueError:
+            router.fit([])
+            return router
+        except OSError:
+            if self.fallback_index is None:
+                raise
+            # Same documents, so the same partitions
+            router.fit(self.fallback_index.iter_batches())
+            return router
+        
+        def pages():
+            offset = 0
+            while True:
+                page = collection.get(
+                    include=["embeddings", "metadatas"], limit=page_size, offset=offset
+                )
+                if not page["ids"]:
+                    return
+                yield page["embeddings"], page["metadatas"]
+                offset += page_size
+        
+        router.fit(pages())
+        return router
+    
+    def attach_shared_index(self, shared_index: SharedIndex) -> None:
+        """
+        Serve queries from a snapshot shared with other workers
+        
+        The index becomes read-only: changes mean building a new snapshot
+        and restarting the workers.
+        """
+        router = self._new_router()
+        router.fit(shared_index.iter_batches())
+        self.shared_index = shared_index
+        self.router = router
+        self._index_version = shared_index.version
+    
+    def set_fallback_index(self, fallback_index: SharedIndex) -> None:
+        """
+        Serve queries from a local snapshot while the Chroma server is down
+        
+        Writes still go to the server and fail until it is back.
+        """
+        self.fallback_index = fallback_index
+    
+    def check_writable(self) -> None:
+        if self.shared_index is not None:
+            raise ReadOnlyIndexError(
+                f"Index {self.shared_index.version} is a shared snapshot; "
+                "rebuild the snapshot and restart the workers instead"
+            )
+    
+    @property
+    def active_collection_name(self) -> str:
+        """Chroma collection currently serving queries"""
+        # Stores created before versioning keep using the plain name
+        return self.aliases.active or self.collection_name
+    
+    @property
+    def distance_space(self) -> str:
+        """Distance space of the index serving queries, i.e. what its scores mean"""
+        if self.shared_index is not None:
+            return self.shared_index.space
+        if self.snapshot_index is not None:
+            return self.snapshot_index.space
+        if self._distance_space is None:
+            if self.remote is not None:
+                # Read from the server's metadata when the alias is refreshed
+                return settings.vector_distance
+            try:
+                metadata = self.client.get_collection(self.active_collection_name).metadata
+            except ValueError:
+                return settings.vector_distance  # Created on first use with the current settings
+            self._distance_space = collection_space(metadata)
+        return self._distance_space
     
     def _get_vector_store(self) -> Chroma:
         """
         Get or create the vector store (lazy loading)
         """
         if self._vector_store is None:
-            self._vector_store = Chroma(
-                client=self.client,
-                collection_name="ashish_knowledge",
-                embedding_function=self.embeddings,
-            )
+            self._vector_store = self._bind(self.active_collection_name)
         return self._vector_store
     
+    def _bind(self, collection_name: str) -> Chroma:
+        """LangChain wrapper around one concrete collection"""
+        try:
+            metadata = self.client.get_collection(collection_name).metadata or {}
+        except ValueError:
+            metadata = None  # Created on first use with the current identity
+        if metadata is not None:
+            self._check_embedding_identity(collection_name, metadata)
+        return Chroma(
+            client=self.client,
+            collection_name=collection_name,
+            embedding_function=self.embeddings,
+            # Metadata given for an existing collection replaces its own (index_version)
+            collection_metadata=(
+                {**self.embedding_identity, **hnsw_metadata()} if metadata is None else None
+            ),
+        )
+    
+    def _check_embedding_identity(
+        self,
+        collection_name: str,
+        metadata: Optional[dict] = None
+    ) -> None:
+        """
+        Refuse to mix vectors from different embedding backends
+        
+        Collections record the backend and model they were built with;
+        querying one with another backend would return meaningless scores.
+        """
+        if metadata is None:
+            try:
+                metadata = self.client.get_collection(collection_name).metadata
+            except ValueError:
+                return  # Created on first use with the current identity
+        
+        metadata = metadata or {}
+        for key, expected in self.embedding_identity.items():
+            recorded = metadata.get(key)
+            if recorded is not None and recorded != expected:
+                raise ValueError(
+                    f"Collection '{collection_name}' was built with "
+                    f"{key}={recorded}, but the current setting is {expected}. "
+                    "Rebuild the index or change EMBEDDING_BACKEND back."
+                )
+    
+    def iter_chunks(
+        self,
+        documents: Iterable[tuple[str, dict]]
+    ) -> Iterator[tuple[str, dict]]:
+        """
+        Split documents into chunks lazily
+        
+        Yields:
+            (chunk, metadata) with chunk_index, total_chunks and chunk_id added
+        """
+        for doc, base_metadata in documents:
+            chunks = self.text_splitter.split_text(doc)
+            for chunk_idx, chunk in enumerate(chunks):
+                chunk_metadata = {
+                    **base_metadata,
+                    "chunk_index": chunk_idx,
+                    "total_chunks": len(chunks),
+                }
+                chunk_metadata["chunk_id"] = self.make_chunk_id(chunk, chunk_metadata)
+                yield chunk, chunk_metadata
+    
+    def split_documents(
+        self,
+        documents: list[str],
+        metadatas: Optional[list[dict]] = None
+    ) -> tuple[list[str], list[dict]]:
+        """
+        Split documents into chunks with per-chunk metadata
+        
+        Returns:
+            (chunks, metadatas) lists of equal length
+        """
+        pairs = list(self.iter_chunks(zip(documents, metadatas or [{}] * len(documents))))
+        return [chunk for chunk, _ in pairs], [metadata for _, metadata in pairs]
+    
+    @staticmethod
+    def make_chunk_id(chunk: str, metadata: dict) -> str:
+        """Deterministic chunk ID so rebuilt indexes keep stable IDs"""
+        path = metadata.get("path", "")
+        if "section" in metadata:
+            # Files loaded as several documents (pages, records, sections)
+            path = f"{path}#{metadata['section']}"
+        key = f"{path}:{metadata.get('chunk_index', '')}:{chunk}"
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+    
     async def add_documents(
         self,
         documents: list[str],
@@ -69,22 +415,7 @@ class VectorStoreManager:
             List of document IDs
         """
         # Step 1: Split documents into chunks
-        all_chunks = []
-        all_metadatas = []
-        
-        for idx, doc in enumerate(documents):
-            chunks = self.text_splitter.split_text(doc)
-            all_chunks.extend(chunks)
-            
-            # Add metadata to each chunk
-            base_metadata = metadatas[idx] if metadatas else {}
-            for chunk_idx in range(len(chunks)):
-                chunk_metadata = {
-                    **base_metadata,
-                    "chunk_index": chunk_idx,
-                    "total_chunks": len(chunks),
-                }
-                all_metadatas.append(chunk_metadata)
+        all_chunks, all_metadatas = self.split_documents(documents, metadatas)
         
         logger.info(f"Adding {len(all_chunks)} chunks to vector store")
         
@@ -93,7 +424,8 @@ class VectorStoreManager:
         vector_store = self._get_vector_store()
         doc_ids = vector_store.add_texts(
             texts=all_chunks,
-            metadatas=all_metadatas
+            metadatas=all_metadatas,
+            ids=[metadata["chunk_id"] for metadata in all_metadatas]
         )
         
         logger.info(f"Successfully added {len(doc_ids)} chunks")
@@ -102,51 +434,778 @@ class VectorStoreManager:
     async def similarity_search(
         self,
         query: str,
-        k: int = 4
+        k: int = 4,
+        deadline: Optional[Deadline] = None,
+        where: Optional[dict] = None,
+        route: Optional[bool] = None,
+        diversify: Optional[bool] = None
     ) -> list[tuple[str, dict, float]]:
         """
         Search for similar documents
         
+        Without an explicit ``where``, the query router may restrict the
+        search to the likeliest partitions; a routed search that comes back
+        short or weak is retried against the full index.
+        
+        With diversification, ``retrieval_fetch_k`` candidates are narrowed
+        to ``k`` by maximal marginal relevance and consecutive chunks of the
+        same document are merged, so fewer results than ``k`` may come back.
+        
         Args:
             query: The search query
             k: Number of results to return
+            deadline: Optional request deadline; each stage gets what is left
+            where: Chroma metadata filter (see router.build_where)
+            route: Override settings.query_routing_enabled
+            diversify: Override settings.retrieval_diversify
             
         Returns:
             List of (content, metadata, score) tuples
         """
-        vector_store = self._get_vector_store()
+        shared_index = self.shared_index or self.snapshot_index
+        local = shared_index is None and self.remote is None
+        if local:
+            await self._follow_local_aliases()
+        vector_store = self._get_vector_store() if local else None
+        router = self.router
         
-        # Perform similarity search
-        # ChromaDB converts the query to vector and finds nearest neighbors
-        results = vector_store.similarity_search_with_score(
-            query=query,
-            k=k
-        )
+        # Step 1: Embed the query (cached, async, cancellable)
+        with stage_timer("embedding"):
+            query_embedding = await run_with_deadline(
+                self.embeddings_manager.embed_text(query),
+                deadline,
+                "embedding"
+            )
+        
+        # Step 2: Pick partitions (fitted at activation; lazily for legacy stores)
+        routed = False
+        if where is None and (settings.query_routing_enabled if route is None else route):
+            if not router.ready:
+                router = self.router = await asyncio.to_thread(
+                    self._fit_router, self.active_collection_name
+                )
+            partitions = router.route(query, query_embedding)
+            if partitions:
+                where = build_where({router.partition_key: partitions})
+                routed = True
+        
+        # Step 3: Find nearest neighbors off the event loop
+        diversify = settings.retrieval_diversify if diversify is None else diversify
+        n_results = max(k, settings.retrieval_fetch_k) if diversify else k
+        include = ["documents", "metadatas", "distances"]
+        if diversify:
+            include.append("embeddings")
+        
+        def search(filter_: Optional[dict]):
+            if shared_index is not None:
+                query = asyncio.to_thread(
+                    shared_index.query,
+                    query_embedding,
+                    n_results,
+                    where=filter_,
+                    include_embeddings=diversify
+                )
+            elif self.remote is not None:
+                query = self._query_remote(query_embedding, n_results, filter_, include)
+            else:
+                query = asyncio.to_thread(
+                    vector_store._collection.query,
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=filter_,
+                    include=include
+                )
+            return run_with_deadline(query, deadline, "search")
+        
+        with stage_timer("search"):
+            results = await search(where)
+            distances = results["distances"][0]
+            if routed and (
+                len(distances) < k or distances[0] > self._widen_distance()
+            ):
+                routing_decisions.inc(outcome="widened")
+                results = await search(None)
         
         # Format results
-        formatted = [
-            (doc.page_content, doc.metadata, score)
-            for doc, score in results
-        ]
+        formatted = list(zip(
+            results["documents"][0],
+            [metadata or {} for metadata in results["metadatas"][0]],
+            results["distances"][0]
+        ))
+        
+        # Step 4: Drop near-duplicates and join neighbouring chunks
+        if diversify and len(formatted) > k:
+            chosen = mmr_select(
+                query_embedding, results["embeddings"][0], k, settings.mmr_lambda
+            )
+            formatted = [formatted[i] for i in chosen]
+        else:
+            formatted = formatted[:k]
+        if diversify:
+            formatted = merge_adjacent(formatted, settings.chunk_overlap)
         
-        logger.info(f"Found {len(formatted)} results for query: {query[:50]}")
+        logger.debug("Found %d results for query: %.50s", len(formatted), query)
         return formatted
     
+    def _widen_distance(self) -> float:
+        """routing_widen_distance (L2) in the distance space being searched"""
+        similarity = to_similarity(settings.routing_widen_distance, "l2")
+        return from_similarity(similarity, self.distance_space)
+    
+    async def _query_remote(
+        self,
+        query_embedding: list[float],
+        n_results: int,
+        where: Optional[dict],
+        include: list[str]
+    ) -> dict:
+        """Query the Chroma server, or the fallback snapshot while it is down"""
+        fallback = self.fallback_index
+        if fallback is None or self.remote.available:
+            try:
+                await self._refresh_aliases()
+                return await self.remote.query(
+                    self.active_collection_name, query_embedding, n_results, where, include
+                )
+            except RemoteStoreUnavailable:
+                if fallback is None:
+                    raise
+            except ValueError:
+                # Version dropped under us: re-read the alias on the next query
+                self._aliases_checked = 0.0
+                raise
+        
+        remote_queries.inc(outcome="fallback")
+        return await asyncio.to_thread(
+            fallback.query,
+            query_embedding,
+            n_results,
+            where=where,
+            include_embeddings="embeddings" in include
+        )
+    
+    async def _refresh_aliases(self) -> None:
+        """Follow version switches made by another replica or the ingestion job"""
+        if time.monotonic() - self._aliases_checked < settings.chroma_alias_refresh_seconds:
+            return
+        marker = await self.remote.get_collection(self.aliases.collection_name)
+        self._aliases_checked = time.monotonic()
+        if marker is not None:
+            self.aliases.apply(marker.get("metadata"))
+        
+        active = self.active_collection_name
+        if active == self._remote_version:
+            return
+        collection = await self.remote.get_collection(active)
+        if collection is not None:
+            self._check_embedding_identity(active, collection.get("metadata"))
+            self._distance_space = collection_space(collection.get("metadata"))
+        
+        if self._remote_version is not None:
+            logger.info(f"Collection '{self.collection_name}' switched to {active} remotely")
+            self.router = await asyncio.to_thread(self._fit_router, active)
+            self._vector_store = None
+            self._index_version = (self.aliases.get(active) or {}).get("index_version")
+            self._notify_switch()
+        self._remote_version = active
+    
+    async def _follow_local_aliases(self) -> None:
+        """Follow version switches saved by another process, e.g. the ingest worker"""
+        if time.monotonic() - self._aliases_checked < settings.chroma_alias_refresh_seconds:
+            return
+        self._aliases_checked = time.monotonic()
+        if not self.aliases.changed_on_disk():
+            return
+        
+        self.aliases.load()
+        active = self.active_collection_name
+        if active != (self._local_version or self.collection_name):
+            logger.info(f"Collection '{self.collection_name}' switched to {active} by another process")
+            self._local_version = active
+            self.router = await asyncio.to_thread(self._fit_router, active)
+            self._vector_store = None
+            self._index_version = (self.aliases.get(active) or {}).get("index_version")
+            self._distance_space = None
+            self._notify_switch()
+    
+    async def probe(self) -> None:
+        """
+        Cheapest round trip to the store, for the health monitor
+        
+        Raises:
+            Exception: If the store cannot answer
+        """
+        if self.shared_index is not None:
+            return
+        if self.remote is not None:
+            await self.remote.heartbeat()
+            return
+        await asyncio.to_thread(
+            lambda: self.client.get_collection(self.active_collection_name).count()
+        )
+    
     async def get_collection_stats(self) -> dict:
-        """Get statistics about the collection"""
-        try:
-            collection = self.client.get_collection("ashish_knowledge")
+        """
+        Get statistics about the collection
+        
+        Raises:
+            Exception: If the store cannot be reached
+        """
+        if self.shared_index is not None:
+            return {
+                "name": self.collection_name,
+                "active_version": None,
+                "shared_snapshot": True,
+                "count": self.shared_index.count,
+                "index_version": self.shared_index.version,
+                **self.embedding_identity,
+            }
+        if self.snapshot_index is not None:
+            return {
+                "name": self.collection_name,
+                "active_version": None,
+                "restoring_snapshot": True,
+                "count": self.snapshot_index.count,
+                "index_version": self.snapshot_index.version,
+                **self.embedding_identity,
+            }
+        if self.remote is not None and self.fallback_index is not None and not self.remote.available:
+            return {
+                "name": self.collection_name,
+                "active_version": None,
+                "fallback_snapshot": True,
+                "count": self.fallback_index.count,
+                "index_version": self.fallback_index.version,
+                **self.embedding_identity,
+            }
+        
+        def read() -> dict:
+            collection = self.client.get_collection(self.active_collection_name)
             return {
-                "name": collection.name,
+                "name": self.collection_name,
+                "active_version": collection.name,
                 "count": collection.count(),
+                "index_version": (collection.metadata or {}).get("index_version"),
+                "embedding_backend": (collection.metadata or {}).get("embedding_backend"),
+                "embedding_model": (collection.metadata or {}).get("embedding_model"),
+                "distance": collection_space(collection.metadata),
+                "hnsw_matches_settings": hnsw_matches(collection.metadata),
+                "versions": self.aliases.versions,
+            }
+        
+        # Connection errors propagate: an unreachable store is not an empty one
+        try:
+            return await asyncio.to_thread(read)
+        except ValueError:
+            return {
+                "name": self.collection_name,
+                "active_version": None,
+                "count": 0,
+                "versions": self.aliases.versions,
             }
+    
+    def get_index_version(self) -> Optional[str]:
+        """Version of the data currently in the collection (cached)"""
+        if self._index_version is None and self.shared_index is None:
+            try:
+                collection = self.client.get_collection(self.active_collection_name)
+                self._index_version = (collection.metadata or {}).get("index_version")
+            except ValueError:
+                return None
+        return self._index_version
+    
+    def set_index_version(self, version: str) -> None:
+        """Record the version of the data now in the collection"""
+        collection = self.client.get_or_create_collection(self.active_collection_name)
+        metadata = {
+            key: value
+            for key, value in (collection.metadata or {}).items()
+            if not key.startswith("hnsw:")  # Fixed at creation; cannot be modified
+        }
+        metadata.update(self.embedding_identity)
+        metadata["index_version"] = version
+        collection.modify(metadata=metadata)
+        self._index_version = version
+    
+    def add_switch_listener(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` after the alias moves to another version"""
+        self._switch_listeners.append(callback)
+    
+    async def _build_from_batches(
+        self,
+        batches: AsyncIterator[tuple[list[str], list[str], list[dict], list]],
+        index_version: Optional[str] = None
+    ) -> str:
+        """
+        Write (ids, chunks, metadatas, embeddings) batches into a new version
+        
+        Chroma writes run in a worker thread, one batch at a time, so live
+        queries against the active version are not held up.
+        
+        Returns:
+            Name of the new (inactive) collection
+        """
+        name = self.create_version(index_version)
+        count = 0
+        try:
+            async for ids, chunks, metadatas, embeddings in batches:
+                await self.write_version_batch(name, ids, chunks, metadatas, embeddings)
+                count += len(ids)
+        except BaseException:
+            self.discard_version(name)
+            raise
+        
+        self.record_version(name, index_version, count)
+        return name
+    
+    def create_version(self, index_version: Optional[str] = None) -> str:
+        """Create an empty, inactive collection version and return its name"""
+        name = self.aliases.new_version_name()
+        metadata = {**self.embedding_identity, **hnsw_metadata()}
+        if index_version:
+            metadata["index_version"] = index_version
+        self.client.create_collection(name, metadata=metadata)
+        return name
+    
+    def has_version(self, name: str) -> bool:
+        try:
+            self.client.get_collection(name)
+        except ValueError:
+            return False
+        return True
+    
+    async def write_version_batch(
+        self,
+        name: str,
+        ids: list[str],
+        chunks: list[str],
+        metadatas: list[dict],
+        embeddings: list
+    ) -> None:
+        """
+        Write one batch into a version being built
+        
+        Runs in a worker thread, so live queries against the active version
+        are not held up. Upserts, so a batch repeated after a crash is harmless.
+        """
+        collection = self.client.get_collection(name)
+        await asyncio.to_thread(
+            collection.upsert,
+            ids=ids,
+            embeddings=embeddings,
+            documents=chunks,
+            metadatas=metadatas,
+        )
+    
+    def record_version(self, name: str, index_version: Optional[str], count: int) -> None:
+        """Register a completely written version so it can be activated"""
+        self.aliases.record(name, index_version, count)
+        logger.info(f"Built collection version {name} ({count} chunks)")
+    
+    def discard_version(self, name: str) -> None:
+        """Drop a version that will not be completed"""
+        try:
+            self.client.delete_collection(name)
+        except ValueError:
+            pass
+    
+    async def build_version(
+        self,
+        ids: list[str],
+        chunks: list[str],
+        metadatas: list[dict],
+        embeddings=None,
+        index_version: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> str:
+        """
+        Build a new collection version next to the live one
+        
+        Args:
+            embeddings: Precomputed vectors (e.g. from a snapshot); embedded
+                in batches when omitted
+        
+        Returns:
+            Name of the new (inactive) collection
+        """
+        async def batches():
+            for start in range(0, len(chunks), batch_size):
+                batch_chunks = chunks[start:start + batch_size]
+                if embeddings is not None:
+                    batch_embeddings = embeddings[start:start + batch_size].tolist()
+                else:
+                    batch_embeddings = await self.embeddings_manager.embed_documents(batch_chunks)
+                yield (
+                    ids[start:start + batch_size],
+                    batch_chunks,
+                    metadatas[start:start + batch_size],
+                    batch_embeddings,
+                )
+        
+        return await self._build_from_batches(batches(), index_version)
+    
+    async def build_version_from_documents(
+        self,
+        documents: Iterable[tuple[str, dict]],
+        index_version: Optional[str] = None,
+        batch_size: Optional[int] = None
+    ) -> str:
+        """
+        Stream documents into a new collection version
+        
+        Chunks are embedded and written in bounded batches as they are
+        produced, so memory does not grow with the size of the corpus.
+        Bulk embeddings bypass the query cache for the same reason.
+        
+        Returns:
+            Name of the new (inactive) collection
+        """
+        batch_size = batch_size or settings.ingest_batch_size
+        
+        async def batches():
+            batch: list[tuple[str, dict]] = []
+            seen = set()
+            for chunk, metadata in self.iter_chunks(documents):
+                if metadata["chunk_id"] in seen:
+                    continue  # Identical chunk at the same position; Chroma rejects duplicates
+                seen.add(metadata["chunk_id"])
+                batch.append((chunk, metadata))
+                if len(batch) >= batch_size:
+                    yield await self._embed_batch(batch)
+                    batch = []
+                    seen.clear()
+            if batch:
+                yield await self._embed_batch(batch)
+        
+        return await self._build_from_batches(batches(), index_version)
+    
+    async def _embed_batch(
+        self,
+        batch: list[tuple[str, dict]]
+    ) -> tuple[list[str], list[str], list[dict], list]:
+        chunks = [chunk for chunk, _ in batch]
+        metadatas = [metadata for _, metadata in batch]
+        embeddings = await self.embeddings_manager.embed_documents(chunks, use_cache=False)
+        return [m["chunk_id"] for m in metadatas], chunks, metadatas, embeddings
+    
+    def _warm(self, collection_name: str) -> None:
+        """Load the version's HNSW index before it takes traffic"""
+        collection = self.client.get_collection(collection_name)
+        sample = collection.peek(1)
+        if sample["embeddings"]:
+            collection.query(query_embeddings=sample["embeddings"], n_results=1)
+    
+    def warm(self) -> None:
+        """Load the active version's index (no-op before first ingestion or on a shared snapshot)"""
+        if self.shared_index is not None or self.snapshot_index is not None:
+            return  # Memory-mapped; never open Chroma in a pre-forked worker
+        try:
+            self._warm(self.active_collection_name)
+        except ValueError:
+            pass
+    
+    def estimate_memory_bytes(self) -> int:
+        """Approximate resident size of the active version's vectors and HNSW graph"""
+        served = self.shared_index or self.snapshot_index
+        if served is not None:
+            return int(served.vectors.nbytes)
+        try:
+            collection = self.client.get_collection(self.active_collection_name)
+        except ValueError:
+            return 0
+        sample = collection.peek(1)["embeddings"]
+        dimension = len(sample[0]) if sample else (self.embeddings_manager.dimension or 0)
+        m = (collection.metadata or {}).get("hnsw:M", CHROMA_DEFAULTS["hnsw:M"])
+        return collection.count() * (dimension * 4 + m * HNSW_LINK_BYTES_PER_M)
+    
+    def close(self) -> None:
+        """
+        Stop this store's own Chroma system, unloading every version's segments
+        
+        Blocking; callers must make sure no query is still running against
+        it. The store reopens from disk on next use. A no-op for stores on
+        the shared client.
+        """
+        with self._client_lock:
+            if self._system is not None:
+                self._system.stop()
+            self._client = None
+            self._system = None
+            self._vector_store = None
+    
+    async def activate_version(self, collection_name: str) -> None:
+        """
+        Warm a built version and atomically point the alias at it
+        
+        Requests already holding the previous wrapper finish against the
+        old version, which stays on disk for rollback.
+        """
+        self.check_writable()
+        await asyncio.to_thread(self._warm, collection_name)
+        router = await asyncio.to_thread(self._fit_router, collection_name)
+        vector_store = self._bind(collection_name)
+        index_version = (self.aliases.get(collection_name) or {}).get("index_version")
+        space = await asyncio.to_thread(
+            lambda: collection_space(self.client.get_collection(collection_name).metadata)
+        )
+        
+        self.aliases.switch(collection_name)
+        self._local_version = collection_name
+        self._vector_store = vector_store
+        self.snapshot_index = None
+        self._remote_version = collection_name if self.remote is not None else None
+        self.router = router
+        self._index_version = index_version
+        self._distance_space = space
+        self._notify_switch()
+        self.collect_garbage()
+    
+    def _notify_switch(self) -> None:
+        for callback in self._switch_listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Collection switch listener failed: {e}")
+    
+    def collect_garbage(self) -> list[str]:
+        """
+        Drop versions beyond the retention count
+        
+        Returns:
+            Names of the deleted collections
+        """
+        dropped = []
+        for name in self.aliases.expired(settings.collection_versions_retained):
+            try:
+                self.client.delete_collection(name)
+            except ValueError:
+                pass  # Already gone
+            self.aliases.forget(name)
+            dropped.append(name)
+            logger.info(f"Dropped collection version {name}")
+        return dropped
+    
+    async def reindex(
+        self,
+        documents: Iterable[tuple[str, dict]],
+        index_version: Optional[str] = None
+    ) -> str:
+        """
+        Blue/green re-index: build a new version, then switch to it
+        
+        Args:
+            documents: (content, metadata) pairs, consumed lazily
+        
+        Live queries keep hitting the current version with full results
+        until the switch.
+        
+        Returns:
+            Name of the newly active collection
+        """
+        self.check_writable()
+        async with self._reindex_lock:
+            name = await self.build_version_from_documents(documents, index_version)
+            await self.activate_version(name)
+            return name
+    
+    async def update_files(
+        self,
+        changes: dict[str, Optional[list[tuple[str, dict]]]],
+        index_version: Optional[str] = None
+    ) -> dict:
+        """
+        Apply per-file edits to the active version in place
+        
+        Only the changed files' chunks are read and written, so the cost
+        follows the size of the edit rather than of the corpus. Unchanged
+        chunks of edited files keep their stored vectors; only chunk IDs
+        not seen before are embedded.
+
+        The edit is not atomic: Chroma has no multi-operation transaction,
+        so new chunks are upserted batch by batch and stale ones deleted
+        afterwards. Until that finishes, queries can see an edited file's
+        old and new chunks side by side, or only part of its new chunks.
+        A file never drops out of results mid-update. Changes that must
+        appear all at once go through ``reindex`` (a new version switched to
+        when complete) instead.
+
+        Args:
+            changes: path → [(content, metadata), ...] for added/modified
+                files, or None for deleted files
+            index_version: Version of the corpus with the edits applied
+                (None keeps the recorded one)
+        
+        Returns:
+            Counts of embedded, reused and removed chunks
+        """
+        self.check_writable()
+        async with self._reindex_lock:
+            collection = await asyncio.to_thread(lambda: self._get_vector_store()._collection)
+            existing = await asyncio.to_thread(
+                collection.get,
+                where={"path": {"$in": list(changes)}},
+                include=["embeddings", "metadatas"],
+            )
+            stored = dict(zip(existing["ids"], existing["embeddings"]))
+            
+            new_chunks: dict[str, tuple[str, dict]] = {}
+            for file_documents in changes.values():
+                for chunk, metadata in self.iter_chunks(file_documents or []):
+                    # Identical chunk at the same position; Chroma rejects duplicates
+                    new_chunks.setdefault(metadata["chunk_id"], (chunk, metadata))
+            
+            to_embed = [chunk for chunk_id, (chunk, _) in new_chunks.items() if chunk_id not in stored]
+            embedded = dict(zip(
+                to_embed, await self.embeddings_manager.embed_documents(to_embed)
+            ))
+            vectors = [
+                stored[chunk_id] if chunk_id in stored else embedded[chunk]
+                for chunk_id, (chunk, _) in new_chunks.items()
+            ]
+            
+            ids = list(new_chunks)
+            chunks = [chunk for chunk, _ in new_chunks.values()]
+            metadatas = [metadata for _, metadata in new_chunks.values()]
+            batch_size = settings.ingest_batch_size
+            for start in range(0, len(ids), batch_size):
+                await self.write_version_batch(
+                    collection.name,
+                    ids[start:start + batch_size],
+                    chunks[start:start + batch_size],
+                    metadatas[start:start + batch_size],
+                    vectors[start:start + batch_size],
+                )
+            stale = [chunk_id for chunk_id in stored if chunk_id not in new_chunks]
+            if stale:
+                await asyncio.to_thread(collection.delete, ids=stale)
+            
+            if self.router.ready:
+                self.router = self.router.update(
+                    added=(vectors, metadatas),
+                    removed=(existing["embeddings"], existing["metadatas"]),
+                )
+            if index_version is not None:
+                await asyncio.to_thread(self.set_index_version, index_version)
+                count = await asyncio.to_thread(collection.count)
+                self.aliases.amend(collection.name, index_version, count)
+            self._notify_switch()
+        
+        return {
+            "embedded": len(to_embed),
+            "reused": len(new_chunks) - len(to_embed),
+            "removed": len(stale),
+        }
+    
+    async def rollback(self) -> Optional[str]:
+        """
+        Point the alias back at the previous retained version
+        
+        Returns:
+            Name of the now active collection, or None if there is nothing
+            to roll back to
+        """
+        self.check_writable()
+        async with self._reindex_lock:
+            target = self.aliases.rollback_target()
+            if target is None:
+                return None
+            await self.activate_version(target)
+            return target
+    
+    async def reset_collection(self) -> str:
+        """
+        Switch the alias to a new, empty version
+        
+        The previous data is retained for rollback until garbage-collected.
+        """
+        self.check_writable()
+        async with self._reindex_lock:
+            name = await self.build_version(ids=[], chunks=[], metadatas=[])
+            await self.activate_version(name)
+            return name
+    
+    async def restore_snapshot(self, snapshot: IndexSnapshot) -> bool:
+        """
+        Serve a prebuilt index snapshot and load it as a new collection version
+        
+        Queries are answered from the memory-mapped snapshot straight away.
+        The Chroma version is built from its stored vectors (no embedding
+        calls) in the background and takes over once activated. Skips the
+        restore if the active version already holds this snapshot and was
+        built with the configured HNSW parameters.
+        
+        Returns:
+            True if the snapshot is being restored
+        """
+        self.check_writable()
+        try:
+            existing = self.client.get_collection(self.active_collection_name)
+            if (
+                (existing.metadata or {}).get("index_version") == snapshot.version
+                and existing.count() == snapshot.count
+                and hnsw_matches(existing.metadata)
+            ):
+                logger.info(f"Collection already at snapshot version {snapshot.version}")
+                return False
+        except ValueError:
+            # Collection does not exist yet
+            pass
+        
+        snapshot_index = SharedIndex(snapshot)
+        router = self._new_router()
+        await asyncio.to_thread(router.fit, snapshot_index.iter_batches())
+        self.snapshot_index = snapshot_index
+        self.router = router
+        self._index_version = snapshot.version
+        self._notify_switch()
+        
+        self._restore_task = spawn_background(self._restore_collection(snapshot_index))
+        logger.info(f"Serving snapshot {snapshot.version} ({snapshot.count} chunks) while Chroma loads it")
+        return True
+    
+    async def _restore_collection(self, snapshot_index: SharedIndex, batch_size: int = 1000) -> None:
+        """Copy a served snapshot into a new collection version and switch to it"""
+        async def batches():
+            for start in range(0, snapshot_index.count, batch_size):
+                stop = min(start + batch_size, snapshot_index.count)
+                records = [snapshot_index.record(i) for i in range(start, stop)]
+                yield (
+                    [record["id"] for record in records],
+                    [record["text"] for record in records],
+                    [record["metadata"] for record in records],
+                    snapshot_index.vectors[start:stop].tolist(),
+                )
+        
+        try:
+            async with self._reindex_lock:
+                if self.snapshot_index is not snapshot_index:
+                    return  # Superseded by a version activated meanwhile
+                name = await self._build_from_batches(batches(), snapshot_index.version)
+                await self.activate_version(name)
         except Exception as e:
-            return {"error": str(e)}
+            logger.error(
+                f"Loading snapshot {snapshot_index.version} into Chroma failed: {e}; "
+                "still serving it from memory",
+                exc_info=True
+            )
+            return
+        logger.info(f"Restored snapshot {snapshot_index.version} into {name}")
 
 
 # Singleton pattern - only create one instance
 _vector_store_manager = None
 
+
+def _reset_after_fork() -> None:
+    """Chroma and HTTP clients must not cross a fork; each worker opens its own"""
+    global _chroma_client, _vector_store_manager
+    _chroma_client = None
+    _vector_store_manager = None
+    remote_store._remote_search = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 def get_vector_store_manager() -> VectorStoreManager:
     """Get or create the vector store manager"""
     global _vector_store_manager
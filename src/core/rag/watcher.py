@@ -0,0 +1,193 @@
+"""
+Knowledge Base Watcher
+Keeps the vector store in sync with the knowledge base directory
+"""
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+from src.core.rag.loaders import iter_source_files, load_file
+from src.core.rag.snapshot import compute_corpus_hash, compute_index_version, get_index_config
+from src.core.rag.vector_store import VectorStoreManager, get_vector_store_manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+metrics = get_metrics()
+sync_lag = metrics.histogram(
+    "index_sync_lag_ms", "Time from a file change to the index serving it"
+)
+pending_lag = metrics.gauge(
+    "index_pending_lag_seconds", "Age of the oldest change not yet indexed"
+)
+chunks_synced = metrics.counter(
+    "index_sync_chunks_total", "Chunks handled by incremental syncs by outcome"
+)
+
+
+class KnowledgeBaseWatcher:
+    """
+    Polls the knowledge base and applies edits incrementally
+
+    Polling compares (mtime, size) per file, which costs one stat per file
+    per interval and works on bind mounts where inotify events do not
+    arrive. Bursts of edits are debounced into a single batch.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStoreManager,
+        data_dir: Path,
+        interval: float = 1.0,
+        debounce: float = 2.0
+    ) -> None:
+        self.vector_store = vector_store
+        self.data_dir = Path(data_dir)
+        self.interval = interval
+        self.debounce = debounce
+        self._files: dict[str, tuple[int, int]] = {}
+        self._pending: dict[str, float] = {}  # path → time the change happened
+        self._last_change = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        files = {}
+        for file_path in iter_source_files(self.data_dir):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue  # Removed mid-scan
+            files[str(file_path.relative_to(self.data_dir))] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _detect_changes(self, current: dict[str, tuple[int, int]]) -> None:
+        now = time.time()
+        for path, state in current.items():
+            if self._files.get(path) != state:
+                self._pending.setdefault(path, min(now, state[0] / 1e9))
+        for path in self._files.keys() - current.keys():
+            self._pending.setdefault(path, now)
+        if self._files != current:
+            self._last_change = now
+        self._files = current
+
+    async def sync(self) -> Optional[dict]:
+        """
+        Index the pending changes in one batch
+
+        Returns:
+            Chunk counts from the vector store, or None if nothing could be synced
+        """
+        if not self._pending:
+            return None
+
+        pending, self._pending = self._pending, {}
+        changes = {}
+        failed = {}
+        for path, changed_at in pending.items():
+            file_path = self.data_dir / path
+            if not file_path.exists():
+                changes[path] = None
+                continue
+            try:
+                changes[path] = list(load_file(file_path, self.data_dir))
+            except Exception as e:
+                # Retried on the next sync; the old chunks keep serving meanwhile
+                logger.error(f"Failed to load {file_path}: {e}")
+                failed[path] = changed_at
+        for path in failed:
+            del pending[path]
+            self._pending.setdefault(path, failed[path])
+            self._last_change = time.time()  # Next attempt after another debounce
+        if not changes:
+            return None
+
+        # The corpus version would claim edits that are not indexed yet
+        index_version = None
+        if not failed:
+            index_version = compute_index_version(
+                await asyncio.to_thread(compute_corpus_hash, self.data_dir),
+                get_index_config(),
+            )
+        try:
+            result = await self.vector_store.update_files(changes, index_version=index_version)
+        except Exception:
+            # Retry on the next tick; newer edits keep their own timestamps
+            for path, changed_at in pending.items():
+                self._pending.setdefault(path, changed_at)
+            raise
+
+        now = time.time()
+        for changed_at in pending.values():
+            sync_lag.observe((now - changed_at) * 1000)
+        for outcome, count in result.items():
+            chunks_synced.inc(count, outcome=outcome)
+
+        logger.info(
+            f"Synced {len(changes)} changed files: {result['embedded']} chunks embedded, "
+            f"{result['reused']} reused, {result['removed']} removed"
+        )
+        return result
+
+    async def run(self) -> None:
+        """Poll until cancelled"""
+        self._files = await asyncio.to_thread(self._scan)
+        logger.info(f"Watching {self.data_dir} ({len(self._files)} files)")
+
+        # Catch edits made while nothing was watching; unchanged chunks
+        # keep their vectors, so resyncing every file is cheap
+        index_version = compute_index_version(
+            await asyncio.to_thread(compute_corpus_hash, self.data_dir),
+            get_index_config(),
+        )
+        if index_version != self.vector_store.get_index_version():
+            now = time.time()
+            self._pending = {path: now for path in self._files}
+
+        while True:
+            await asyncio.sleep(self.interval)
+            self._detect_changes(await asyncio.to_thread(self._scan))
+
+            if self._pending:
+                pending_lag.set(time.time() - min(self._pending.values()))
+                if time.time() - self._last_change >= self.debounce:
+                    try:
+                        await self.sync()
+                    except Exception as e:
+                        logger.error(f"Knowledge base sync failed: {e}", exc_info=True)
+            if not self._pending:
+                pending_lag.set(0)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+_watcher: Optional[KnowledgeBaseWatcher] = None
+
+
+def get_knowledge_base_watcher() -> KnowledgeBaseWatcher:
+    """Get or create knowledge base watcher singleton"""
+    global _watcher
+    if _watcher is None:
+        _watcher = KnowledgeBaseWatcher(
+            vector_store=get_vector_store_manager(),
+            data_dir=Path(settings.knowledge_base_directory),
+            interval=settings.knowledge_base_watch_interval,
+            debounce=settings.knowledge_base_watch_debounce,
+        )
+    return _watcher
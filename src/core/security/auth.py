@@ -5,13 +5,11 @@ Handles authentication, rate limiting, and security headers
 import logging
 from typing import Optional
 
-from fastapi import HTTPException, Security, status
+from fastapi import HTTPException, Request, Security, status
 from fastapi.security import APIKeyHeader
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 
 from src.config.settings import get_settings
+from src.core.security.rate_limiter import HybridRateLimiter
 settings = get_settings()
 
 logger = logging.getLogger(__name__)
@@ -20,6 +18,15 @@ logger = logging.getLogger(__name__)
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
+def _priority_api_keys() -> set[str]:
+    """Additional keys configured with a priority class"""
+    return {
+        part.split("=", 1)[0].strip()
+        for part in settings.api_key_priorities.split(",")
+        if "=" in part
+    }
+
+
 async def verify_api_key(api_key: Optional[str] = Security(api_key_header)) -> str:
     """
     Verify API key if configured
@@ -36,7 +43,7 @@ async def verify_api_key(api_key: Optional[str] = Security(api_key_header)) -> s
             headers={"WWW-Authenticate": "ApiKey"},
         )
     
-    if api_key != settings.api_key:
+    if api_key != settings.api_key and api_key not in _priority_api_keys():
         logger.warning("Invalid API key attempted")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,18 +55,46 @@ async def verify_api_key(api_key: Optional[str] = Security(api_key_header)) -> s
 
 
 # Rate Limiter
-limiter = Limiter(
-    key_func=get_remote_address,
-    storage_uri=settings.redis_url if settings.rate_limit_enabled else None,
-    enabled=settings.rate_limit_enabled,
+# Decisions are local; counts are reconciled with Redis in the background
+limiter = HybridRateLimiter(
+    limit=settings.rate_limit_per_minute,
+    period_seconds=60,
+    redis_url=settings.redis_url if settings.rate_limit_enabled else None,
+    sync_interval=settings.rate_limit_sync_interval,
 )
 
 
+def get_remote_address(request: Request) -> str:
+    """Client address used as the rate-limit key"""
+    if request.client is None:
+        return "127.0.0.1"
+    return request.client.host
+
+
 def get_rate_limit_string() -> str:
-    """Get rate limit string for decorator"""
+    """Human-readable rate limit"""
     return f"{settings.rate_limit_per_minute}/minute"
 
 
+async def enforce_rate_limit(request: Request) -> None:
+    """
+    Rate limit dependency
+    
+    Raises 429 when the client is over its limit. Never touches Redis.
+    """
+    if not settings.rate_limit_enabled:
+        return
+    
+    key = get_remote_address(request)
+    if not limiter.hit(key):
+        logger.warning(f"Rate limit exceeded for {key}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {get_rate_limit_string()}",
+            headers={"Retry-After": str(limiter.retry_after(key))}
+        )
+
+
 # Security Headers
 def get_security_headers() -> dict[str, str]:
     """Get security headers"""
@@ -70,13 +105,3 @@ def get_security_headers() -> dict[str, str]:
         "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
         "Content-Security-Policy": "default-src 'self'",
     }
-
-
-def rate_limit_exceeded_handler(request, exc: RateLimitExceeded):
-    """Custom handler for rate limit exceeded"""
-    logger.warning(f"Rate limit exceeded for {get_remote_address(request)}")
-    raise HTTPException(
-        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-        detail=f"Rate limit exceeded: {exc.detail}",
-        headers={"Retry-After": "60"}
-    )
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+Hybrid Rate Limiter
+Local token buckets with periodic, batched reconciliation through Redis
+
+Every decision is made from memory. A background task pushes each worker's
+hit counts to Redis in one pipeline per sync interval and pulls back the
+cluster-wide counts, which feed a sliding-window estimate:
+
+    estimate = prev_window * (1 - elapsed_fraction) + current_window
+
+If Redis is unavailable the limiter keeps enforcing the local buckets only.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Optional
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+metrics = get_metrics()
+decision_latency = metrics.histogram(
+    "rate_limit_decision_ms", "Time to make a rate-limit decision"
+)
+decisions = metrics.counter("rate_limit_decisions_total", "Rate-limit decisions by outcome")
+sync_duration = metrics.histogram("rate_limit_sync_ms", "Duration of a Redis sync batch")
+
+
+class _ClientState:
+    """Per-key limiter state"""
+
+    __slots__ = ("tokens", "updated_at", "pending", "global_current", "global_previous", "window")
+
+    def __init__(self, capacity: float, window: int) -> None:
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.pending = 0  # Local hits not yet pushed to Redis
+        self.global_current = 0  # Cluster-wide count for `window`, as of last sync
+        self.global_previous = 0  # Cluster-wide count for `window - 1`
+        self.window = window
+
+
+class HybridRateLimiter:
+    """
+    Rate limiter that never waits on Redis in the request path
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        period_seconds: int = 60,
+        redis_url: Optional[str] = None,
+        sync_interval: float = 1.0,
+        key_prefix: str = "ratelimit",
+    ) -> None:
+        self.limit = limit
+        self.period = period_seconds
+        self.redis_url = redis_url
+        self.sync_interval = sync_interval
+        self.key_prefix = key_prefix
+        self.refill_rate = limit / period_seconds  # Tokens per second
+
+        self._clients: dict[str, _ClientState] = {}
+        self._redis = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self.redis_available = False
+        self.last_sync_at: Optional[float] = None
+
+        metrics.gauge(
+            "rate_limit_sync_lag_seconds",
+            "Seconds since the last successful Redis sync",
+            callback=self.sync_lag,
+        )
+        metrics.gauge(
+            "rate_limit_tracked_keys",
+            "Client keys tracked by this worker",
+            callback=lambda: len(self._clients),
+        )
+
+    def _current_window(self, now: float) -> int:
+        return int(now // self.period)
+
+    def _get_state(self, key: str, window: int) -> _ClientState:
+        state = self._clients.get(key)
+        if state is None:
+            state = _ClientState(self.limit, window)
+            self._clients[key] = state
+        elif state.window != window:
+            # Roll the window forward; counts older than one window are irrelevant
+            state.global_previous = state.global_current if state.window == window - 1 else 0
+            state.global_current = 0
+            state.window = window
+        return state
+
+    def _refill(self, state: _ClientState, now: float) -> None:
+        elapsed = now - state.updated_at
+        state.tokens = min(self.limit, state.tokens + elapsed * self.refill_rate)
+        state.updated_at = now
+
+    def _estimate(self, state: _ClientState, wall_now: float) -> float:
+        """Sliding-window estimate of cluster-wide hits in the last period"""
+        elapsed_fraction = (wall_now % self.period) / self.period
+        return (
+            state.global_previous * (1 - elapsed_fraction)
+            + state.global_current
+            + state.pending
+        )
+
+    def hit(self, key: str) -> bool:
+        """
+        Record a request for ``key``
+
+        Returns:
+            True if the request is allowed
+        """
+        start = time.perf_counter()
+        now = time.monotonic()
+        wall_now = time.time()
+
+        state = self._get_state(key, self._current_window(wall_now))
+        self._refill(state, now)
+
+        allowed = state.tokens >= 1
+        if allowed and self.redis_available:
+            allowed = self._estimate(state, wall_now) < self.limit
+
+        if allowed:
+            state.tokens -= 1
+            state.pending += 1
+
+        decision_latency.observe((time.perf_counter() - start) * 1000)
+        decisions.inc(outcome="allowed" if allowed else "rejected")
+        return allowed
+
+    def retry_after(self, key: str) -> int:
+        """Seconds until ``key`` is likely to be allowed again"""
+        state = self._clients.get(key)
+        if state is None or self.refill_rate <= 0:
+            return self.period
+        missing = max(0.0, 1 - state.tokens)
+        return max(1, math.ceil(missing / self.refill_rate))
+
+    def sync_lag(self) -> float:
+        """Seconds since the last successful Redis sync (-1 if never synced)"""
+        if self.last_sync_at is None:
+            return -1.0
+        return time.monotonic() - self.last_sync_at
+
+    def prune_idle(self) -> None:
+        """Forget clients with no unsynced hits whose buckets have refilled"""
+        now = time.monotonic()
+        window = self._current_window(time.time())
+        for key, state in list(self._clients.items()):
+            if state.pending or (state.window >= window - 1 and (state.global_current or state.global_previous)):
+                continue
+            self._refill(state, now)
+            if state.tokens >= self.limit:
+                del self._clients[key]
+
+    async def start(self) -> None:
+        """Connect to Redis (if configured) and start the background sync task"""
+        if self._sync_task is not None:
+            return
+        if self.redis_url:
+            import redis.asyncio as aioredis
+
+            self._redis = aioredis.from_url(
+                self.redis_url,
+                socket_timeout=1.0,
+                socket_connect_timeout=1.0,
+            )
+            logger.info(f"Rate limiter syncing with Redis every {self.sync_interval}s")
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        """Stop syncing and flush pending counts"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self._redis is not None:
+            try:
+                await self.sync()
+            except Exception:
+                pass
+            await self._redis.close()
+            self._redis = None
+
+    async def _sync_loop(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.redis_available:
+                    logger.warning(f"Rate limiter Redis sync failed, enforcing locally: {e}")
+                self.redis_available = False
+            self.prune_idle()
+            await asyncio.sleep(self.sync_interval)
+
+    async def sync(self) -> None:
+        """
+        Push pending hits and pull cluster-wide counts in one pipeline
+        """
+        if self._redis is None:
+            return
+
+        start = time.perf_counter()
+        window = self._current_window(time.time())
+        expire = self.period * 2
+
+        # Snapshot and reset pending counts before awaiting
+        batch = []
+        for key, state in list(self._clients.items()):
+            if state.window != window:
+                self._get_state(key, window)
+            batch.append((key, state, state.pending))
+            state.pending = 0
+
+        if not batch:
+            self.redis_available = True
+            self.last_sync_at = time.monotonic()
+            return
+
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for key, _, pending in batch:
+                current_key = f"{self.key_prefix}:{key}:{window}"
+                if pending:
+                    pipe.incrby(current_key, pending)
+                    pipe.expire(current_key, expire)
+                else:
+                    pipe.get(current_key)
+                pipe.get(f"{self.key_prefix}:{key}:{window - 1}")
+            results = await pipe.execute()
+        except Exception:
+            # Put the hits back so they are pushed on the next successful sync
+            for _, state, pending in batch:
+                state.pending += pending
+            raise
+
+        index = 0
+        for _, state, pending in batch:
+            current = results[index]
+            index += 2 if pending else 1
+            previous = results[index]
+            index += 1
+            if state.window == window:
+                state.global_current = int(current or 0)
+                state.global_previous = int(previous or 0)
+
+        self.redis_available = True
+        self.last_sync_at = time.monotonic()
+        sync_duration.observe((time.perf_counter() - start) * 1000)
+
+    def get_stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "period_seconds": self.period,
+            "tracked_keys": len(self._clients),
+            "redis_available": self.redis_available,
+            "sync_lag_seconds": self.sync_lag(),
+            "decision_p99_ms": decision_latency.percentile(99),
+        }
@@ -0,0 +1,60 @@
+"""
+Startup Report
+Wall-clock time of each startup phase and of every loaded asset
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from src.core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+startup_phase_ms = get_metrics().gauge("startup_phase_ms", "Duration of each startup phase")
+
+
+class StartupReport:
+    """Collects phase timings during the lifespan startup"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.assets: list[dict] = []
+        self.total_ms: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = round((time.perf_counter() - start) * 1000, 1)
+            self.phases[name] = elapsed
+            startup_phase_ms.set(elapsed, phase=name)
+
+    def finish(self) -> None:
+        """Record the total and log one summary line"""
+        self.total_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        startup_phase_ms.set(self.total_ms, phase="total")
+        phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.phases.items())
+        logger.info(f"Startup took {self.total_ms:.0f}ms ({phases})")
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": self.total_ms,
+            "phases_ms": self.phases,
+            "assets": self.assets,
+        }
+
+
+# Singleton instance
+_startup_report: Optional[StartupReport] = None
+
+
+def get_startup_report() -> StartupReport:
+    """Get or create startup report singleton"""
+    global _startup_report
+    if _startup_report is None:
+        _startup_report = StartupReport()
+    return _startup_report
@@ -0,0 +1,187 @@
+"""
+Structured Logging
+JSON log records written by a background thread, plus a request-scoped
+context that collects stage timings and token counts for one summary line
+per request
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Iterator, Optional
+
+# Standard LogRecord attributes that are not copied into the JSON output
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+
+        return json.dumps(payload, default=str)
+
+
+class RequestContext:
+    """Per-request data accumulated across the pipeline"""
+
+    __slots__ = ("method", "path", "started_at", "fields", "timings_ms", "tokens")
+
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.started_at = time.perf_counter()
+        self.fields: dict[str, Any] = {}
+        self.timings_ms: dict[str, float] = {}
+        self.tokens: dict[str, int] = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def summary(self, status_code: int) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "duration_ms": round(self.elapsed_ms(), 2),
+            **self.fields,
+            "timings_ms": {k: round(v, 2) for k, v in self.timings_ms.items()},
+            "tokens": self.tokens,
+        }
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def start_request_context(method: str, path: str) -> RequestContext:
+    """Create and activate a context for the current request"""
+    context = RequestContext(method, path)
+    _request_context.set(context)
+    return context
+
+
+def get_request_context() -> Optional[RequestContext]:
+    return _request_context.get()
+
+
+def set_context_field(key: str, value: Any) -> None:
+    """Attach a field (e.g. conversation_id) to the request summary"""
+    context = _request_context.get()
+    if context is not None:
+        context.fields[key] = value
+
+
+def record_timing(stage: str, duration_ms: float) -> None:
+    context = _request_context.get()
+    if context is not None:
+        context.timings_ms[stage] = context.timings_ms.get(stage, 0.0) + duration_ms
+
+
+def record_tokens(kind: str, count: Optional[int]) -> None:
+    context = _request_context.get()
+    if context is not None and count:
+        context.tokens[kind] = context.tokens.get(kind, 0) + count
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time a pipeline stage into the request context"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(stage, (time.perf_counter() - start) * 1000)
+
+
+class RequestSampler:
+    """
+    Decide which request summaries to log
+
+    Rates are matched by longest path prefix; errors are always logged.
+    """
+
+    def __init__(self, default_rate: float, route_rates: dict[str, float]) -> None:
+        self.default_rate = default_rate
+        self.route_rates = sorted(route_rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    @classmethod
+    def from_string(cls, default_rate: float, spec: str) -> "RequestSampler":
+        """Parse "path=rate,path=rate" """
+        route_rates = {}
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            path, _, rate = part.partition("=")
+            route_rates[path.strip()] = float(rate)
+        return cls(default_rate, route_rates)
+
+    def rate_for(self, path: str) -> float:
+        for prefix, rate in self.route_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def should_log(self, path: str, status_code: int) -> bool:
+        if status_code >= 500:
+            return True
+        rate = self.rate_for(path)
+        return rate >= 1.0 or random.random() < rate
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", log_format: str = "json") -> None:
+    """
+    Route all logging through a queue drained by a background thread
+
+    Callers only pay for enqueueing the record; formatting and the write to
+    stdout happen off the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,488 @@
+"""
+Token Usage
+Prompt, completion and embedding tokens per API key and conversation, with budgets
+
+Tokens are counted in memory where they are spent, without any I/O. A
+background task flushes the deltas to Redis (or SQLite) in one batch per
+interval and pulls back the totals of all workers, which the budget
+checks add to what is not flushed yet. A budget check on a key or
+conversation this worker holds no counts for reads its totals from the
+store first. If the store is unavailable the deltas are kept and budgets
+are enforced from local counts.
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import sqlite3
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Coroutine, Optional
+
+from fastapi import Request
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+from src.core.structured_logging import record_tokens
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TOKEN_KINDS = ("prompt", "completion", "embedding")
+ANONYMOUS = "anonymous"  # Requests without an API key
+UNATTRIBUTED = "-"  # Work outside a request, e.g. ingestion
+SYSTEM = "system"  # Background work a request only triggered, e.g. answer table refreshes
+CONVERSATION_TTL_SECONDS = 7 * 86400
+IDLE_SECONDS = 3600.0  # Buckets without activity this long are dropped after flushing
+
+metrics = get_metrics()
+tokens_used = metrics.counter("tokens_used_total", "Provider tokens by kind")
+budget_rejections = metrics.counter(
+    "token_budget_rejections_total", "Requests refused by a token budget, by scope"
+)
+flush_duration = metrics.histogram("usage_flush_ms", "Duration of a usage flush")
+
+
+class TokenBudgetExceeded(Exception):
+    """The API key or conversation has used up its token budget"""
+
+    def __init__(self, scope: str, used: int, budget: int) -> None:
+        self.scope = scope
+        self.used = used
+        self.budget = budget
+        super().__init__(f"Token budget for this {scope} is used up ({used}/{budget} tokens)")
+
+
+@dataclass
+class UsageScope:
+    """Who the tokens spent in the current request are charged to"""
+
+    key_id: str = UNATTRIBUTED
+    conversation_id: Optional[str] = None
+
+
+_usage_scope: ContextVar[Optional[UsageScope]] = ContextVar("usage_scope", default=None)
+
+
+def key_id(api_key: str) -> str:
+    """Stable, non-secret identifier for an API key"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+def _parse_key_budgets(spec: str) -> dict[str, int]:
+    """"key=tokens,..." → {key_id: tokens}"""
+    budgets = {}
+    for part in spec.split(","):
+        if "=" in part:
+            key, tokens = part.split("=", 1)
+            budgets[key_id(key.strip())] = int(tokens)
+    return budgets
+
+
+class _Bucket:
+    """Token counts of one key window or conversation"""
+
+    __slots__ = ("name", "ttl", "pending", "totals", "touched_at")
+
+    def __init__(self, name: str, ttl: int) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.pending = dict.fromkeys(TOKEN_KINDS, 0)  # Not yet flushed
+        self.totals = dict.fromkeys(TOKEN_KINDS, 0)  # All workers, as of last flush
+        self.touched_at = time.monotonic()
+
+    def used(self) -> int:
+        return sum(self.totals.values()) + sum(self.pending.values())
+
+    def usage(self) -> dict:
+        usage = {kind: self.totals[kind] + self.pending[kind] for kind in TOKEN_KINDS}
+        usage["total"] = sum(usage.values())
+        return usage
+
+
+class RedisUsageStore:
+    """Totals as Redis hashes (usage:<bucket>), shared by all replicas"""
+
+    name = "redis"
+
+    def __init__(self, redis_url: str) -> None:
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(
+            redis_url,
+            socket_timeout=1.0,
+            socket_connect_timeout=1.0,
+        )
+
+    async def add(self, batch: list[tuple[str, dict[str, int], int]]) -> list[dict[str, int]]:
+        """Add (bucket, deltas, ttl) and return each bucket's new totals"""
+        pipe = self._redis.pipeline(transaction=False)
+        positions = []
+        position = 0
+        for name, deltas, ttl in batch:
+            key = f"usage:{name}"
+            for kind, count in deltas.items():
+                pipe.hincrby(key, kind, count)
+                position += 1
+            if deltas:
+                pipe.expire(key, ttl)
+                position += 1
+            pipe.hgetall(key)
+            positions.append(position)
+            position += 1
+        results = await pipe.execute()
+        return [
+            {kind.decode(): int(count) for kind, count in results[i].items()}
+            for i in positions
+        ]
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+class SQLiteUsageStore:
+    """Totals in a local SQLite file, for single-host deployments without Redis"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Only used from one flush at a time, in a worker thread
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            " bucket TEXT NOT NULL, kind TEXT NOT NULL, tokens INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, PRIMARY KEY (bucket, kind))"
+        )
+
+    def _add(self, batch: list[tuple[str, dict[str, int], int]]) -> list[dict[str, int]]:
+        now = time.time()
+        with self._conn:
+            self._conn.execute("DELETE FROM usage WHERE expires_at < ?", (now,))
+            self._conn.executemany(
+                "INSERT INTO usage VALUES (?, ?, ?, ?) ON CONFLICT (bucket, kind) DO UPDATE"
+                " SET tokens = tokens + excluded.tokens, expires_at = excluded.expires_at",
+                [
+                    (name, kind, count, now + ttl)
+                    for name, deltas, ttl in batch
+                    for kind, count in deltas.items()
+                ],
+            )
+            return [
+                dict(self._conn.execute(
+                    "SELECT kind, tokens FROM usage WHERE bucket = ?", (name,)
+                ).fetchall())
+                for name, _, _ in batch
+            ]
+
+    async def add(self, batch: list[tuple[str, dict[str, int], int]]) -> list[dict[str, int]]:
+        return await asyncio.to_thread(self._add, batch)
+
+    async def close(self) -> None:
+        self._conn.close()
+
+
+class UsageAccountant:
+    """
+    Token counts per API key (per budget period) and per conversation
+
+    Key buckets are named by period window, so a new period starts from
+    zero while the previous one's last deltas still flush to its own
+    bucket.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        flush_interval: float = 5.0,
+        period_seconds: int = 86400,
+        key_budget: int = 0,
+        key_budgets: Optional[dict[str, int]] = None,
+        conversation_budget: int = 0,
+    ) -> None:
+        self.store = store
+        self.flush_interval = flush_interval
+        self.period = period_seconds
+        self.key_budget = key_budget
+        self.key_budgets = key_budgets or {}
+        self.conversation_budget = conversation_budget
+
+        self._buckets: dict[str, _Bucket] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.store_available = store is None
+        self.last_flush_at: Optional[float] = None
+
+    def _window(self) -> int:
+        return int(time.time() // self.period)
+
+    def _key_bucket_name(self, key: str) -> str:
+        return f"key:{key}:{self._window()}"
+
+    def _bucket(self, name: str, ttl: int) -> _Bucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = _Bucket(name, ttl)
+        bucket.touched_at = time.monotonic()
+        return bucket
+
+    def record(self, kind: str, count: int, scope: Optional[UsageScope] = None) -> None:
+        """Charge ``count`` tokens to the scope's API key and conversation"""
+        scope = scope or UsageScope()
+        self._bucket(self._key_bucket_name(scope.key_id), self.period * 2).pending[kind] += count
+        if scope.conversation_id:
+            self._bucket(
+                f"conversation:{scope.conversation_id}", CONVERSATION_TTL_SECONDS
+            ).pending[kind] += count
+
+    def budget_for_key(self, key: str) -> int:
+        if key == SYSTEM:
+            return 0  # Counted, never refused
+        return self.key_budgets.get(key, self.key_budget)
+
+    async def check_budget(self, scope: Optional[UsageScope] = None) -> None:
+        """
+        Refuse work for a key or conversation that is out of tokens
+
+        Raises:
+            TokenBudgetExceeded: If a budget is used up
+        """
+        scope = scope or _usage_scope.get()
+        if scope is None:
+            return
+        checks = [(
+            "API key",
+            self._key_bucket_name(scope.key_id),
+            self.period * 2,
+            self.budget_for_key(scope.key_id),
+        )]
+        if scope.conversation_id:
+            checks.append((
+                "conversation",
+                f"conversation:{scope.conversation_id}",
+                CONVERSATION_TTL_SECONDS,
+                self.conversation_budget,
+            ))
+        for label, name, ttl, budget in checks:
+            if not budget:
+                continue
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = await self._load_bucket(name, ttl)
+            used = bucket.used()
+            if used >= budget:
+                budget_rejections.inc(scope=label)
+                raise TokenBudgetExceeded(label, used, budget)
+
+    async def _load_bucket(self, name: str, ttl: int) -> _Bucket:
+        """Bucket for ``name`` with the totals the store holds for it"""
+        totals = {}
+        if self.store is not None:
+            try:
+                # No deltas: only reads the totals
+                [totals] = await self.store.add([(name, {}, ttl)])
+            except Exception as e:
+                logger.warning(f"Reading token usage of {name} failed, counting locally: {e}")
+        bucket = self._buckets.get(name)
+        if bucket is None:  # Not created by a record() during the read
+            bucket = self._bucket(name, ttl)
+            bucket.totals = {kind: totals.get(kind, 0) for kind in TOKEN_KINDS}
+        return bucket
+
+    async def start(self) -> None:
+        """Start the background flush task"""
+        if self._flush_task is None:
+            if self.store is not None:
+                logger.info(f"Flushing token usage to {self.store.name} every {self.flush_interval}s")
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop flushing and push what is left"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Final token usage flush failed: {e}")
+        if self.store is not None:
+            await self.store.close()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.store_available:
+                    logger.warning(f"Token usage flush failed, counting locally: {e}")
+                self.store_available = False
+            self._prune_idle()
+
+    async def flush(self) -> None:
+        """Push pending deltas and pull back the totals in one batch"""
+        start = time.perf_counter()
+        batch = []
+        for bucket in list(self._buckets.values()):
+            deltas = {kind: count for kind, count in bucket.pending.items() if count}
+            for kind in deltas:
+                bucket.pending[kind] = 0
+            batch.append((bucket, deltas))
+
+        if self.store is None:
+            for bucket, deltas in batch:
+                for kind, count in deltas.items():
+                    bucket.totals[kind] += count
+        elif batch:
+            try:
+                totals = await self.store.add(
+                    [(bucket.name, deltas, bucket.ttl) for bucket, deltas in batch]
+                )
+            except Exception:
+                # Keep the deltas for the next successful flush
+                for bucket, deltas in batch:
+                    for kind, count in deltas.items():
+                        bucket.pending[kind] += count
+                raise
+            for (bucket, _), total in zip(batch, totals):
+                bucket.totals = {kind: total.get(kind, 0) for kind in TOKEN_KINDS}
+
+        self.store_available = True
+        self.last_flush_at = time.monotonic()
+        flush_duration.observe((time.perf_counter() - start) * 1000)
+
+    def _prune_idle(self) -> None:
+        """
+        Forget flushed buckets that are idle or from past periods
+
+        Budgeted key buckets of the current period are kept, and so are
+        budgeted conversations while only this worker counts them (no
+        store): dropping them would reset the budget. Other buckets are
+        re-read from the store when next checked.
+        """
+        current = f":{self._window()}"
+        now = time.monotonic()
+        for name, bucket in list(self._buckets.items()):
+            if any(bucket.pending.values()):
+                continue
+            idle = now - bucket.touched_at
+            if name.startswith("key:"):
+                if not name.endswith(current):
+                    expired = True
+                else:
+                    expired = not self.budget_for_key(name.split(":")[1]) and idle > IDLE_SECONDS
+            elif self.conversation_budget and self.store is None:
+                expired = idle > CONVERSATION_TTL_SECONDS
+            else:
+                expired = idle > IDLE_SECONDS
+            if expired:
+                del self._buckets[name]
+
+    def get_stats(self, top: int = 20) -> dict:
+        """Usage of the keys and conversations this worker has seen"""
+        current = f":{self._window()}"
+        keys = {}
+        conversations = []
+        for name, bucket in self._buckets.items():
+            if name.startswith("key:") and name.endswith(current):
+                key = name.split(":")[1]
+                keys[key] = {**bucket.usage(), "budget": self.budget_for_key(key) or None}
+            elif name.startswith("conversation:"):
+                conversations.append({"conversation_id": name.split(":", 1)[1], **bucket.usage()})
+        conversations.sort(key=lambda usage: usage["total"], reverse=True)
+
+        return {
+            "store": self.store.name if self.store is not None else "memory",
+            "store_available": self.store_available,
+            "flush_lag_seconds": (
+                time.monotonic() - self.last_flush_at if self.last_flush_at is not None else None
+            ),
+            "period_seconds": self.period,
+            "period_started_at": self._window() * self.period,
+            "worker_totals": {kind: int(tokens_used.value(kind=kind)) for kind in TOKEN_KINDS},
+            "keys": keys,
+            "conversations": conversations[:top],
+            "conversation_budget": self.conversation_budget or None,
+        }
+
+
+def record_usage(kind: str, count: Optional[int]) -> None:
+    """Count provider tokens for the current request, key and conversation"""
+    if not count:
+        return
+    record_tokens(kind, count)
+    tokens_used.inc(count, kind=kind)
+    get_usage_accountant().record(kind, count, _usage_scope.get())
+
+
+def set_usage_conversation(conversation_id) -> None:
+    """Charge the rest of the request to a conversation as well"""
+    scope = _usage_scope.get()
+    if scope is not None:
+        scope.conversation_id = str(conversation_id)
+
+
+def copy_usage_scope() -> Optional[UsageScope]:
+    """The current scope, detached from later changes by the request"""
+    scope = _usage_scope.get()
+    return replace(scope) if scope is not None else None
+
+
+def spawn_background(coro: Coroutine, scope: Optional[UsageScope] = None) -> asyncio.Task:
+    """
+    Start a task with a clean context instead of a copy of the caller's
+
+    Tasks otherwise inherit the request's usage scope (and log context), so
+    their tokens would be charged to whichever request triggered them.
+    Without ``scope`` they are charged to the system key.
+    """
+    context = contextvars.Context()
+    context.run(_usage_scope.set, scope or UsageScope(key_id=SYSTEM))
+    return asyncio.create_task(coro, context=context)
+
+
+async def get_usage_scope(request: Request) -> UsageScope:
+    """
+    Dependency charging the request's tokens to its API key
+
+    Async so the scope is set in the request's own context, not a thread's.
+    """
+    api_key = request.headers.get("X-API-Key")
+    scope = UsageScope(key_id=key_id(api_key) if api_key else ANONYMOUS)
+    _usage_scope.set(scope)
+    return scope
+
+
+def _create_store():
+    if settings.usage_store == "redis":
+        return RedisUsageStore(settings.redis_url)
+    if settings.usage_store == "sqlite":
+        return SQLiteUsageStore(settings.usage_sqlite_path)
+    return None
+
+
+# Singleton instance
+_usage_accountant: Optional[UsageAccountant] = None
+
+
+def get_usage_accountant() -> UsageAccountant:
+    """Get or create usage accountant singleton"""
+    global _usage_accountant
+    if _usage_accountant is None:
+        _usage_accountant = UsageAccountant(
+            store=_create_store(),
+            flush_interval=settings.usage_flush_interval,
+            period_seconds=settings.usage_budget_period_seconds,
+            key_budget=settings.usage_key_token_budget,
+            key_budgets=_parse_key_budgets(settings.usage_key_budgets),
+            conversation_budget=settings.usage_conversation_token_budget,
+        )
+    return _usage_accountant
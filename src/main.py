@@ -3,31 +3,33 @@ Main FastAPI Application
 """
 import asyncio
 import logging
-import sys
+import os
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.encoders import jsonable_encoder
-from slowapi.errors import RateLimitExceeded
 
-from scripts.ingest_data import ingest_data
 from src.config.settings import get_settings
+from src.api.middleware import RequestLoggingMiddleware, SelectiveGZipMiddleware
 from src.api.routes import chat, health
-from src.core.security.auth import limiter, rate_limit_exceeded_handler
+from src.core.assets import load_assets
+from src.core.health_monitor import get_health_monitor
+from src.core.memory import register_memory_metrics
+from src.core.rag.remote_store import close_remote_search
+from src.core.security.auth import limiter
+from src.core.startup import get_startup_report
+from src.core.usage import get_usage_accountant
+from src.core.structured_logging import RequestSampler, setup_logging, shutdown_logging
 from src.models.schemas import ErrorResponse
+from src.services.ingest_jobs import FAILED, get_ingest_queue
+from src.services.ingest_worker import create_worker
 settings = get_settings()
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configure logging (JSON records written by a background thread)
+setup_logging(settings.log_level, settings.log_format)
 
 logger = logging.getLogger(__name__)
 
@@ -44,32 +46,118 @@ async def lifespan(app: FastAPI):
     logger.info(f"Debug mode: {settings.debug}")
     
     # Initialize components
+    startup_report = get_startup_report()
+    register_memory_metrics()
     try:
         from src.core.rag.vector_store import get_vector_store_manager
         from src.core.llm.client import get_llm_client
         
-        vector_store = get_vector_store_manager()
-        stats = await vector_store.get_collection_stats()
-        logger.info(f"Vector store initialized: {stats.get('count', 0)} documents")
-
-        if stats.get("count", 0) == 0:
-            logger.info("Vector store empty. Starting ingestion...")
-            await ingest_data("./data/knowledge_base")
-            logger.info("Ingestion complete.")
+        from src.core.rag.shared_index import SharedIndex, get_shared_index
+        from src.core.rag.snapshot import find_matching_snapshot
+        
+        # Tokenizers and local models from the image, never the network
+        with startup_report.phase("assets"):
+            startup_report.assets = load_assets(verify=settings.asset_verify)
+        
+        with startup_report.phase("vector_store"):
+            vector_store = get_vector_store_manager()
+        
+        shared_index = get_shared_index()
+        if shared_index is not None:
+            # Pre-forked worker: search the parent's memory-mapped snapshot
+            with startup_report.phase("shared_index"):
+                vector_store.attach_shared_index(shared_index)
+            logger.info(f"Worker {os.getpid()} serving shared index {shared_index.version}")
         else:
-            logger.info(f"Vector store already initialized with {stats['count']} chunks.")
+            # Prefer a prebuilt snapshot: no embedding calls, no ingestion wait
+            snapshot = find_matching_snapshot(
+                Path(settings.index_snapshot_directory),
+                data_dir=Path(settings.knowledge_base_directory),
+                verify=settings.index_snapshot_verify,
+            )
+            if settings.chroma_server_url and snapshot is not None:
+                # Read-only answers while the Chroma server is unreachable
+                vector_store.set_fallback_index(SharedIndex(snapshot))
+            
+            try:
+                if snapshot is not None:
+                    with startup_report.phase("snapshot_restore"):
+                        await vector_store.restore_snapshot(snapshot)
+                    logger.info(f"Index snapshot {snapshot.version} ready")
+            
+                stats = await vector_store.get_collection_stats()
+                logger.info(f"Vector store initialized: {stats.get('count', 0)} documents")
+
+                if stats["count"] == 0:
+                    # One job for every replica starting against this empty store;
+                    # queries see the index once it is switched to
+                    queue = get_ingest_queue()
+                    job, _ = await queue.enqueue_initial()
+                    if settings.ingest_worker_enabled:
+                        logger.info(f"Vector store empty. Ingestion queued for the worker (job {job.job_id})")
+                    else:
+                        logger.info("Vector store empty and no matching snapshot. Starting ingestion...")
+                        with startup_report.phase("ingestion"):
+                            ran = await create_worker(queue).run_one(job.job_id)
+                        finished = await queue.get(job.job_id) if ran else None
+                        if not ran:
+                            logger.info(f"Another replica is running ingestion job {job.job_id}")
+                        elif finished.status == FAILED:
+                            raise RuntimeError(f"Ingestion failed: {finished.error}")
+                        else:
+                            logger.info("Ingestion complete.")
+                else:
+                    logger.info(f"Vector store already initialized with {stats['count']} chunks.")
+            except OSError as e:
+                if vector_store.fallback_index is None:
+                    raise
+                logger.warning(
+                    f"Chroma server unreachable ({e}); serving snapshot "
+                    f"{snapshot.version} read-only until it is back"
+                )
         
-        llm_client = get_llm_client()
+        with startup_report.phase("llm_client"):
+            llm_client = get_llm_client()
         logger.info(f"LLM client initialized: {settings.openai_model}")
         
+        from src.api.serialization import get_response_cache
+        
+        # Answers derived from the old collection version must not outlive a switch
+        from src.services.tenants import get_tenant_registry
+        tenant_registry = get_tenant_registry()
+        tenant_registry.add_switch_listener(get_response_cache().clear)
+        with startup_report.phase("tenants"):
+            await tenant_registry.warm_pinned()
+        
     except Exception as e:
         logger.error(f"Failed to initialize components: {e}")
         raise
     
+    if settings.rate_limit_enabled:
+        await limiter.start()
+    await get_usage_accountant().start()
+    await get_health_monitor().start()
+    
+    watching = settings.knowledge_base_watch and get_shared_index() is None
+    if watching:
+        from src.core.rag.watcher import get_knowledge_base_watcher
+        get_knowledge_base_watcher().start()
+    elif settings.knowledge_base_watch:
+        logger.warning("Knowledge base watch is disabled for the read-only shared index")
+    
+    startup_report.finish()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    if watching:
+        await get_knowledge_base_watcher().stop()
+    await limiter.stop()
+    await get_usage_accountant().stop()
+    await get_health_monitor().stop()
+    await close_remote_search()
+    shutdown_logging()
 
 
 # Create FastAPI app
@@ -78,14 +166,12 @@ app = FastAPI(
     version=settings.app_version,
     description="AI-powered assistant to answer questions about Ashish using RAG",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
     openapi_url="/openapi.json" if settings.debug else None,
 )
 
-# Add rate limiter state
-app.state.limiter = limiter
-
 
 # Middleware
 # CORS
@@ -97,17 +183,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# GZip compression
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# GZip compression (SSE streams are passed through uncompressed)
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1000)
 
-
-# Exception handlers
-@app.exception_handler(RateLimitExceeded)
-async def custom_rate_limit_handler(request: Request, exc: RateLimitExceeded):
-    """Handle rate limit exceptions"""
-    return rate_limit_exceeded_handler(request, exc)
+# One sampled summary line per request
+app.add_middleware(
+    RequestLoggingMiddleware,
+    sampler=RequestSampler.from_string(settings.log_sample_rate, settings.log_route_sample_rates),
+)
 
 
+# Exception handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
@@ -143,19 +229,6 @@ async def root():
     }
 
 
-# Request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests"""
-    logger.info(f"{request.method} {request.url.path}")
-    
-    response = await call_next(request)
-    
-    logger.info(f"{request.method} {request.url.path} - {response.status_code}")
-    
-    return response
-
-
 if __name__ == "__main__":
     import uvicorn
     
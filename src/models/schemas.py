@@ -2,9 +2,10 @@
 Request and Response Models
 """
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import Optional, Union
 from uuid import UUID, uuid4
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 # ============= REQUEST MODELS =============
@@ -27,6 +28,18 @@ class ChatRequest(BaseModel):
         default=False,
         description="Set true for streaming response"
     )
+    filter: Optional[dict[str, Union[str, list[str]]]] = Field(
+        default=None,
+        description="Only search chunks whose metadata matches, e.g. {\"source\": [\"skills.md\"]}"
+    )
+    
+    @field_validator("filter")
+    @classmethod
+    def _plain_fields_only(cls, value):
+        # Operators ($and, $in, ...) are built server-side
+        if value and any(key.startswith("$") for key in value):
+            raise ValueError("filter keys must be metadata field names")
+        return value
     
     # Example of what this looks like:
     class Config:
@@ -39,12 +52,22 @@ class ChatRequest(BaseModel):
         }
 
 
+class SourcesMode(str, Enum):
+    """
+    How much of each source document to return
+    """
+    FULL = "full"          # Full chunk content and metadata
+    SNIPPETS = "snippets"  # Truncated content
+    IDS = "ids"            # Chunk IDs, source file and score only
+
+
 # ============= RESPONSE MODELS =============
 
 class SourceDocument(BaseModel):
     """
     A piece of retrieved context from the knowledge base
     """
+    id: Optional[str] = Field(default=None, description="Chunk ID")
     content: str = Field(..., description="The text content")
     metadata: dict = Field(default_factory=dict, description="File name, etc.")
     relevance_score: Optional[float] = Field(
@@ -71,6 +94,10 @@ class ChatResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     model_used: str = Field(..., description="Which LLM model was used")
     tokens_used: Optional[int] = None
+    degraded: bool = Field(
+        default=False,
+        description="True if generation ran out of time and only sources are returned"
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,210 @@
+"""
+Pre-fork Server
+Runs several uvicorn workers over one listening socket and one shared index
+
+The parent verifies the index snapshot and opens it (memory-mapped)
+before forking, so every worker searches the same physical pages. Each
+worker then imports the app and creates its own clients (Chroma, Redis,
+OpenAI) after the fork. The parent restarts workers that die and logs
+their memory as RSS vs. shared vs. proportional.
+
+Usage:
+    python -m src.server --workers 4
+    python -m src.server --workers 0   # one per core
+"""
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+from src.config.settings import get_settings
+from src.core.assets import load_assets
+from src.core.memory import memory_usage
+from src.core.rag.shared_index import load_shared_index
+from src.core.rag.snapshot import find_matching_snapshot
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("src.server")
+settings = get_settings()
+
+APP = "src.main:app"
+
+# Minimum seconds between restarts of a crashing worker slot
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, slot: int) -> None:
+    """Body of a forked worker; never returns"""
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        config = uvicorn.Config(APP, log_level=settings.log_level.lower(), lifespan="on")
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException as e:
+        logger.error(f"Worker {slot} failed: {e}")
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+class Supervisor:
+    """Forks workers and keeps the pool at full size until told to stop"""
+
+    def __init__(self, sock: socket.socket, workers: int, memory_report_interval: float) -> None:
+        self.sock = sock
+        self.workers = workers
+        self.memory_report_interval = memory_report_interval
+        self.children: dict[int, int] = {}  # pid → slot
+        self._last_start: dict[int, float] = {}
+        self._stopping = False
+
+    def _spawn(self, slot: int) -> None:
+        wait = self._last_start.get(slot, 0) + RESTART_BACKOFF_SECONDS - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_start[slot] = time.monotonic()
+
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(self.sock, slot)
+        self.children[pid] = slot
+        logger.info(f"Started worker {slot} (pid {pid})")
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report_memory(self) -> None:
+        """Log per-worker and total memory of the pool"""
+        total_rss = total_pss = 0
+        for pid, slot in sorted(self.children.items(), key=lambda item: item[1]):
+            usage = memory_usage(pid)
+            total_rss += usage["rss_bytes"]
+            total_pss += usage["pss_bytes"] or 0
+            logger.info(
+                f"Worker {slot} (pid {pid}): RSS {usage['rss_bytes'] / 2**20:.0f}MB, "
+                f"shared {usage['shared_bytes'] / 2**20:.0f}MB, "
+                f"private {usage['private_bytes'] / 2**20:.0f}MB"
+            )
+        parent = memory_usage()
+        logger.info(
+            f"{len(self.children)} workers: RSS sum {total_rss / 2**20:.0f}MB, "
+            f"PSS sum {total_pss / 2**20:.0f}MB (actual footprint); "
+            f"parent RSS {parent['rss_bytes'] / 2**20:.0f}MB"
+        )
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        next_report = time.monotonic() + self.memory_report_interval
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if self.memory_report_interval and time.monotonic() >= next_report:
+                    self.report_memory()
+                    next_report = time.monotonic() + self.memory_report_interval
+                time.sleep(0.5)
+                continue
+
+            slot = self.children.pop(pid)
+            if not self._stopping:
+                logger.warning(f"Worker {slot} (pid {pid}) exited with status {status}; restarting")
+                self._spawn(slot)
+
+        logger.info("All workers stopped")
+        return 0
+
+
+def serve(
+    host: str,
+    port: int,
+    workers: int,
+    memory_report_interval: float = 60.0
+) -> int:
+    """
+    Serve the app, pre-forking ``workers`` processes
+
+    One worker runs uvicorn in this process with the usual startup path.
+    Several workers need an index snapshot matching the knowledge base
+    (``python scripts/index.py build``), since writable Chroma stores
+    cannot be shared between processes, unless they are clients of a
+    Chroma server (settings.chroma_server_url).
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        uvicorn.run(APP, host=host, port=port, log_level=settings.log_level.lower())
+        return 0
+
+    load_assets(verify=settings.asset_verify)
+    if not settings.chroma_server_url:
+        snapshot = find_matching_snapshot(
+            Path(settings.index_snapshot_directory),
+            data_dir=Path(settings.knowledge_base_directory),
+            verify=settings.index_snapshot_verify,
+        )
+        if snapshot is None:
+            logger.error(
+                f"Multi-worker mode needs an index snapshot matching the knowledge base in "
+                f"{settings.index_snapshot_directory} (python scripts/index.py build)"
+            )
+            return 1
+        load_shared_index(snapshot)
+
+    sock = _bind(host, port)
+    logger.info(f"Listening on {host}:{port} with {workers} workers")
+    return Supervisor(sock, workers, memory_report_interval).run()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.workers,
+        help="Worker processes (0 = one per core)"
+    )
+    parser.add_argument(
+        "--memory-report-interval",
+        type=float,
+        default=60.0,
+        help="Seconds between worker memory reports (0 disables)"
+    )
+
+    args = parser.parse_args(argv)
+    return serve(args.host, args.port, args.workers, args.memory_report_interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Admission Control
+Priority classes, bounded per-class queues and weighted fair dequeuing in
+front of ChatService
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+from src.config.settings import get_settings
+from src.core.deadline import Deadline, DeadlineExceeded, run_with_deadline
+from src.core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PRIORITY_HEADER = "X-Priority"
+
+metrics = get_metrics()
+queue_depth = metrics.gauge("admission_queue_depth", "Requests waiting per priority class")
+queue_wait = metrics.histogram("admission_wait_ms", "Time spent waiting for a slot")
+rejections = metrics.counter("admission_rejected_total", "Requests rejected by admission control")
+in_flight = metrics.gauge("admission_in_flight", "Requests holding a slot")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away before doing any work"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int = 1) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class PriorityClass:
+    """A traffic class with its weight and bounded queue"""
+
+    def __init__(self, name: str, weight: int, max_queue: int) -> None:
+        self.name = name
+        self.weight = weight
+        self.max_queue = max_queue
+        self.waiters: deque[asyncio.Future] = deque()
+        self.current_weight = 0  # Smooth weighted round-robin state
+
+
+def parse_priority_classes(spec: str) -> list[PriorityClass]:
+    """Parse "name:weight:max_queue,..." (first class is the default)"""
+    classes = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, weight, max_queue = part.split(":")
+        classes.append(PriorityClass(name.strip(), int(weight), int(max_queue)))
+    if not classes:
+        raise ValueError("At least one priority class is required")
+    return classes
+
+
+class AdmissionController:
+    """
+    Limits concurrent pipeline executions and orders the backlog
+
+    Free slots are handed to waiting requests using smooth weighted
+    round-robin across classes, so background traffic only gets the share
+    its weight allows while interactive requests are queued. Requests whose
+    projected wait exceeds their deadline are rejected up front.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        classes: list[PriorityClass],
+        key_classes: Optional[dict[str, str]] = None
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.classes = {c.name: c for c in classes}
+        self.default_class = classes[0].name
+        self.key_classes = key_classes or {}
+        self._available = max_concurrency
+        # EWMA of how long a request holds a slot
+        self._avg_service_seconds = 1.0
+
+    def resolve_class(self, name: Optional[str]) -> PriorityClass:
+        return self.classes.get(name or self.default_class, self.classes[self.default_class])
+
+    def _queued_total(self) -> int:
+        return sum(len(c.waiters) for c in self.classes.values())
+
+    def projected_wait(self, priority: PriorityClass) -> float:
+        """
+        Estimate seconds until a new request of this class gets a slot
+
+        The class drains at its weighted share of the slots, so the wait is
+        its backlog divided by that share of throughput.
+        """
+        if self._available > 0 and self._queued_total() == 0:
+            return 0.0
+        active_weight = sum(
+            c.weight for c in self.classes.values() if c.waiters or c is priority
+        )
+        share = priority.weight / active_weight if active_weight else 1.0
+        throughput = (self.max_concurrency / self._avg_service_seconds) * share
+        return (len(priority.waiters) + 1) / throughput if throughput else float("inf")
+
+    def _update_depth(self, priority: PriorityClass) -> None:
+        queue_depth.set(len(priority.waiters), priority_class=priority.name)
+
+    def _next_waiter(self) -> Optional[tuple[PriorityClass, asyncio.Future]]:
+        """Pick the next waiter by smooth weighted round-robin"""
+        candidates = [c for c in self.classes.values() if c.waiters]
+        if not candidates:
+            return None
+
+        total = sum(c.weight for c in candidates)
+        for c in candidates:
+            c.current_weight += c.weight
+        chosen = max(candidates, key=lambda c: c.current_weight)
+        chosen.current_weight -= total
+        return chosen, chosen.waiters.popleft()
+
+    def _release(self) -> None:
+        """Hand the slot to the next live waiter, or return it to the pool"""
+        while True:
+            picked = self._next_waiter()
+            if picked is None:
+                self._available += 1
+                return
+            priority, waiter = picked
+            self._update_depth(priority)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        priority_name: Optional[str] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold a pipeline slot for the duration of the block
+
+        Raises:
+            AdmissionRejected: Queue full, or the wait would outlast the deadline
+        """
+        priority = self.resolve_class(priority_name)
+        enqueued_at = time.perf_counter()
+
+        if self._available > 0 and self._queued_total() == 0:
+            self._available -= 1
+        else:
+            if len(priority.waiters) >= priority.max_queue:
+                rejections.inc(priority_class=priority.name, reason="queue_full")
+                raise AdmissionRejected(429, f"Too many queued {priority.name} requests")
+
+            wait = self.projected_wait(priority)
+            if deadline is not None and wait > deadline.remaining():
+                rejections.inc(priority_class=priority.name, reason="deadline")
+                raise AdmissionRejected(
+                    503,
+                    f"Projected wait {wait:.1f}s exceeds request deadline",
+                    retry_after=max(1, int(wait)),
+                )
+
+            waiter = asyncio.get_running_loop().create_future()
+            priority.waiters.append(waiter)
+            self._update_depth(priority)
+            try:
+                await run_with_deadline(asyncio.shield(waiter), deadline, "admission")
+            except (DeadlineExceeded, asyncio.CancelledError):
+                if waiter.done() and not waiter.cancelled():
+                    # Slot was granted as we gave up; pass it on
+                    self._release()
+                else:
+                    waiter.cancel()
+                    if waiter in priority.waiters:
+                        priority.waiters.remove(waiter)
+                        self._update_depth(priority)
+                raise
+
+        queue_wait.observe((time.perf_counter() - enqueued_at) * 1000, priority_class=priority.name)
+        in_flight.set(self.max_concurrency - self._available)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - started
+            self._avg_service_seconds = 0.9 * self._avg_service_seconds + 0.1 * held
+            self._release()
+            in_flight.set(self.max_concurrency - self._available)
+
+    def get_stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "available": self._available,
+            "avg_service_seconds": round(self._avg_service_seconds, 3),
+            "queues": {
+                name: {"depth": len(c.waiters), "weight": c.weight, "max_queue": c.max_queue}
+                for name, c in self.classes.items()
+            },
+        }
+
+
+def parse_key_classes(spec: str) -> dict[str, str]:
+    """Parse "api_key=class,..." """
+    mapping = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        key, _, class_name = part.partition("=")
+        mapping[key.strip()] = class_name.strip()
+    return mapping
+
+
+def get_request_priority(request: Request) -> str:
+    """
+    Priority class for a request
+
+    The API key decides the class; the X-Priority header can only move a
+    request to a lower-weight class, never a higher one.
+    """
+    controller = get_admission_controller()
+    class_name = controller.key_classes.get(
+        request.headers.get("X-API-Key", ""), controller.default_class
+    )
+    assigned = controller.resolve_class(class_name)
+
+    requested = request.headers.get(PRIORITY_HEADER)
+    if requested in controller.classes and controller.classes[requested].weight < assigned.weight:
+        return requested
+    return assigned.name
+
+
+# Singleton instance
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get or create admission controller singleton"""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            max_concurrency=settings.admission_max_concurrency,
+            classes=parse_priority_classes(settings.admission_priority_classes),
+            key_classes=parse_key_classes(settings.api_key_priorities),
+        )
+    return _admission_controller
@@ -0,0 +1,256 @@
+"""
+Precomputed Answer Table
+Stored answers for known questions, matched by question embedding
+
+One process regenerates the table after a re-index (the ingest worker or
+scripts/precompute_answers.py); API processes only pick up the new file.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from src.config.settings import get_settings
+from src.core.rag.embeddings import get_embeddings_manager
+from src.core.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+metrics = get_metrics()
+lookups = metrics.counter("answer_table_lookups_total", "Answer table lookups by outcome")
+
+
+class AnswerEntry:
+    """One precomputed answer"""
+
+    def __init__(
+        self,
+        question: str,
+        answer: str,
+        sources: list[dict],
+        confidence: Optional[float],
+        model_used: str,
+        index_version: Optional[str],
+        embedding: list[float],
+        created_at: Optional[float] = None,
+    ) -> None:
+        self.question = question
+        self.answer = answer
+        self.sources = sources
+        self.confidence = confidence
+        self.model_used = model_used
+        self.index_version = index_version
+        self.embedding = embedding
+        self.created_at = created_at or time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "question": self.question,
+            "answer": self.answer,
+            "sources": self.sources,
+            "confidence": self.confidence,
+            "model_used": self.model_used,
+            "index_version": self.index_version,
+            "embedding": self.embedding,
+            "created_at": self.created_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AnswerEntry":
+        return cls(**data)
+
+
+class AnswerTable:
+    """
+    Question → answer lookup by cosine similarity of question embeddings
+
+    Entries built against a different index version are ignored, so a
+    re-ingest can never serve answers grounded in stale sources.
+    """
+
+    def __init__(self, path: Path, threshold: float, reload_interval: float = 10.0) -> None:
+        self.path = Path(path)
+        self.threshold = threshold
+        self.reload_interval = reload_interval
+        self.entries: list[AnswerEntry] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._refreshing = False
+        self._mtime_ns: Optional[int] = None
+        self._checked_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _rebuild_matrix(self) -> None:
+        if not self.entries:
+            self._matrix = None
+            return
+        matrix = np.asarray([e.embedding for e in self.entries], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def _read(self) -> Optional[list[AnswerEntry]]:
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self._mtime_ns = mtime_ns
+        return [AnswerEntry.from_dict(e) for e in data.get("entries", [])]
+
+    def load(self) -> None:
+        """Load entries from disk (missing file means an empty table)"""
+        entries = self._read()
+        if entries is None:
+            return
+        self.replace_entries(entries)
+        logger.info(f"Loaded {len(self.entries)} precomputed answers from {self.path}")
+
+    async def reload_if_changed(self) -> bool:
+        """
+        Pick up a table written by another process
+
+        The file is stat'ed at most every ``reload_interval`` seconds.
+
+        Returns:
+            Whether new entries were loaded
+        """
+        now = time.monotonic()
+        if self._refreshing or now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime_ns == self._mtime_ns:
+            return False
+
+        try:
+            entries = await asyncio.to_thread(self._read)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not reload precomputed answers from {self.path}: {e}")
+            return False
+        if entries is None:
+            return False
+        # Swapped in on the loop, so a lookup never sees entries and matrix out of step
+        self.replace_entries(entries)
+        logger.info(f"Reloaded {len(self.entries)} precomputed answers from {self.path}")
+        return True
+
+    def save(self) -> None:
+        """Write entries atomically (a unique temp file per writer)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"entries": [e.to_dict() for e in self.entries]}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._mtime_ns = self.path.stat().st_mtime_ns
+
+    def replace_entries(self, entries: list[AnswerEntry]) -> None:
+        self.entries = entries
+        self._rebuild_matrix()
+
+    def is_stale(self, index_version: Optional[str]) -> bool:
+        return any(e.index_version != index_version for e in self.entries)
+
+    async def lookup(
+        self,
+        question: str,
+        index_version: Optional[str]
+    ) -> Optional[AnswerEntry]:
+        """
+        Find a stored answer for a question close enough to ``question``
+
+        The query embedding goes through EmbeddingsManager's cache, so the
+        retrieval step that follows on a miss reuses it.
+        """
+        await self.reload_if_changed()
+        if self._matrix is None:
+            return None
+
+        embedding = await get_embeddings_manager().embed_text(question)
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+
+        scores = self._matrix @ (query / norm)
+        best = int(np.argmax(scores))
+        entry = self.entries[best]
+
+        if scores[best] < self.threshold:
+            lookups.inc(outcome="miss")
+            return None
+        if entry.index_version != index_version:
+            lookups.inc(outcome="stale")
+            return None
+
+        lookups.inc(outcome="hit")
+        return entry
+
+    async def regenerate(
+        self,
+        generate: Callable[[str], Awaitable[AnswerEntry]],
+        questions: Optional[list[str]] = None
+    ) -> int:
+        """
+        Rebuild entries by running each question through ``generate``
+
+        The live table keeps serving (stale entries are skipped) until the
+        new set is swapped in at the end.
+
+        Returns:
+            Number of entries generated
+        """
+        if self._refreshing:
+            return 0
+        self._refreshing = True
+        try:
+            questions = questions or [e.question for e in self.entries]
+            new_entries = []
+            for question in questions:
+                try:
+                    new_entries.append(await generate(question))
+                except Exception as e:
+                    logger.error(f"Failed to precompute answer for '{question[:50]}': {e}")
+            self.replace_entries(new_entries)
+            self.save()
+            logger.info(f"Regenerated {len(new_entries)} precomputed answers")
+            return len(new_entries)
+        finally:
+            self._refreshing = False
+
+
+# Singleton instance
+_answer_table: Optional[AnswerTable] = None
+
+
+def get_answer_table() -> AnswerTable:
+    """Get or create answer table singleton"""
+    global _answer_table
+    if _answer_table is None:
+        _answer_table = AnswerTable(
+            path=Path(settings.answer_table_path),
+            threshold=settings.answer_table_threshold,
+            reload_interval=settings.answer_table_reload_interval,
+        )
+        _answer_table.load()
+    return _answer_table
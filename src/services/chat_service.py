@@ -3,32 +3,67 @@ Chat Service
 Orchestrates the RAG pipeline for question answering
 """
 import logging
+from contextlib import asynccontextmanager
 from typing import AsyncIterator, Optional
 from uuid import UUID, uuid4
 
-from src.core.rag.vector_store import get_vector_store_manager
+from src.config.settings import get_settings
+from src.core.rag.distance import DEFAULT_SPACE, to_similarity
+from src.core.rag.router import build_where
+from src.core.rag.vector_store import VectorStoreManager, get_vector_store_manager
+from src.core.deadline import Deadline, DeadlineExceeded, run_with_deadline
 from src.core.llm.client import get_llm_client
+from src.core.structured_logging import set_context_field, stage_timer
+from src.core.usage import (
+    TokenBudgetExceeded,
+    get_usage_accountant,
+    set_usage_conversation,
+)
 from src.models.schemas import ChatRequest, ChatResponse, SourceDocument
+from src.services.answer_table import AnswerEntry, get_answer_table
+from src.services.conversations import ConversationStore
+from src.services.tenants import Tenant, get_tenant_registry
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class ChatService:
     """Service for handling chat interactions with RAG"""
     
+    DEGRADED_ANSWER = (
+        "I couldn't finish generating an answer in time. "
+        "Here are the most relevant parts of {name}'s profile instead."
+    )
+    NO_SOURCES_ANSWER = (
+        "I don't have enough information to answer that question. "
+        "Could you ask something else about {name}'s background, skills, or experience?"
+    )
+    
     def __init__(self) -> None:
         """Initialize chat service"""
         self.vector_store = get_vector_store_manager()
         self.llm_client = get_llm_client()
-        self._conversation_store: dict[UUID, list[dict]] = {}
+        self.answer_table = get_answer_table() if settings.answer_table_enabled else None
+        self.conversations = ConversationStore(
+            summarize=lambda summary, messages: self.llm_client.summarize_conversation(
+                messages, summary
+            ),
+            recent_messages=settings.conversation_recent_messages,
+            summary_batch=settings.conversation_summary_batch,
+            max_messages=settings.conversation_max_messages,
+        )
         
     def _calculate_confidence(
         self,
         sources: list[tuple[str, dict, float]],
-        answer: str
+        answer: str,
+        space: str = DEFAULT_SPACE
     ) -> float:
         """
         Calculate confidence score based on retrieval scores and answer
+        
+        ``space`` is the distance metric the scores were computed in.
         """
         if not sources:
             return 0.0
@@ -36,9 +71,8 @@ class ChatService:
         # Average of top source scores
         avg_score = sum(score for _, _, score in sources[:3]) / min(len(sources), 3)
         
-        # Normalize score (ChromaDB uses L2 distance, lower is better)
-        # Convert to similarity score (inverse and normalize)
-        confidence = max(0.0, min(1.0, 1.0 - (avg_score / 2.0)))
+        # Normalize score (distances, lower is better; see distance.to_similarity)
+        confidence = max(0.0, min(1.0, to_similarity(avg_score, space)))
         
         # Penalize if answer indicates uncertainty
         uncertainty_phrases = [
@@ -55,63 +89,182 @@ class ChatService:
         
         return round(confidence, 2)
     
+    @asynccontextmanager
+    async def _use_vector_store(self, tenant: Optional[Tenant]) -> AsyncIterator[VectorStoreManager]:
+        """Vector store for the tenant (the default tenant's when None), held for the block"""
+        if tenant is None or tenant.is_default:
+            yield self.vector_store
+            return
+        async with get_tenant_registry().use(tenant.tenant_id) as resident:
+            yield resident.vector_store
+    
+    @staticmethod
+    def _display_name(tenant: Optional[Tenant]) -> str:
+        return tenant.display_name if tenant is not None else settings.default_tenant_name
+    
+    def _system_prompt(self, tenant: Optional[Tenant]) -> Optional[str]:
+        """Tenant prompt, or the template filled with its name (None = default)"""
+        if tenant is None or tenant.is_default:
+            return None
+        return tenant.system_prompt or self.llm_client.SYSTEM_PROMPT_TEMPLATE.format(
+            name=tenant.display_name
+        )
+    
+    def _format_sources(
+        self,
+        sources: list[tuple[str, dict, float]],
+        space: str = DEFAULT_SPACE
+    ) -> list[SourceDocument]:
+        """Convert retrieval results (distances in ``space``) into response source documents"""
+        return [
+            SourceDocument(
+                id=metadata.get("chunk_id") or self.vector_store.make_chunk_id(content, metadata),
+                content=content,
+                metadata=metadata,
+                relevance_score=round(to_similarity(score, space), 2)  # Normalize score
+            )
+            for content, metadata, score in sources
+        ]
+    
+    def _answer_from_table(
+        self,
+        entry: AnswerEntry,
+        request: ChatRequest
+    ) -> ChatResponse:
+        """Build a response from a precomputed answer"""
+        conv_id = request.conversation_id or uuid4()
+        set_context_field("conversation_id", str(conv_id))
+        set_context_field("answer_table_hit", True)
+        if request.conversation_id:
+            # A stateless hit stores no turn; the store never evicts
+            self.record_turn(conv_id, request.question, entry.answer)
+        
+        return ChatResponse(
+            message_id=uuid4(),
+            conversation_id=conv_id,
+            answer=entry.answer,
+            sources=[SourceDocument(**source) for source in entry.sources],
+            confidence=entry.confidence,
+            model_used=entry.model_used,
+            tokens_used=0
+        )
+    
     async def ask_question(
         self,
         request: ChatRequest,
-        conversation_history: Optional[list[dict]] = None
+        conversation_history: Optional[list[dict]] = None,
+        deadline: Optional[Deadline] = None,
+        use_answer_table: bool = True,
+        record_history: bool = True,
+        tenant: Optional[Tenant] = None
     ) -> ChatResponse:
         """
         Process a question and generate an answer using RAG
+        
+        Questions that closely match a precomputed answer for the current
+        index version are answered from the answer table without retrieval
+        or generation (default tenant only).
+        
+        If the deadline passes during generation, the LLM call is cancelled
+        and a degraded, sources-only response is returned instead.
+        
+        Raises:
+            DeadlineExceeded: If retrieval itself cannot finish in time
+            TokenBudgetExceeded: If the API key or conversation is out of tokens
         """
         try:
-            logger.info(f"Processing question: {request.question[:100]}...")
+            logger.debug("Processing question: %.100s", request.question)
+            if request.conversation_id:
+                set_usage_conversation(request.conversation_id)
             
-            # Retrieve relevant context
-            sources = await self.vector_store.similarity_search(
-                query=request.question,
-                k=4
+            # Known questions without prior context are a lookup
+            has_history = bool(
+                conversation_history or self.conversations.has_history(request.conversation_id)
             )
+            use_answer_table = (
+                use_answer_table
+                and request.filter is None
+                and (tenant is None or tenant.is_default)
+            )
+            if use_answer_table and self.answer_table is not None and not has_history:
+                with stage_timer("answer_table"):
+                    entry = await run_with_deadline(
+                        self.answer_table.lookup(
+                            request.question,
+                            self.vector_store.get_index_version()
+                        ),
+                        deadline,
+                        "embedding"
+                    )
+                if entry is not None:
+                    return self._answer_from_table(entry, request)
+            
+            # Nothing below is free: refuse before calling any provider
+            await get_usage_accountant().check_budget()
+            
+            # Retrieve relevant context
+            async with self._use_vector_store(tenant) as vector_store:
+                with stage_timer("retrieval"):
+                    sources = await vector_store.similarity_search(
+                        query=request.question,
+                        k=4,
+                        deadline=deadline,
+                        where=build_where(request.filter)
+                    )
+                space = vector_store.distance_space
             
             if not sources:
                 logger.warning("No relevant sources found for question")
                 return ChatResponse(
                     message_id=uuid4(),
                     conversation_id=request.conversation_id or uuid4(),
-                    answer="I don't have enough information to answer that question. Could you ask something else about Ashish's background, skills, or experience?",
+                    answer=self.NO_SOURCES_ANSWER.format(name=self._display_name(tenant)),
                     sources=[],
                     confidence=0.0,
                     model_used=self.llm_client.llm.model_name,
                     tokens_used=0
                 )
             
-            # Get or create conversation history
+            # Get or create conversation history (running summary + recent turns)
             conv_id = request.conversation_id or uuid4()
-            history = conversation_history or self._conversation_store.get(conv_id, [])
+            set_context_field("conversation_id", str(conv_id))
+            set_usage_conversation(conv_id)
+            summary, history = self._conversation_context(conv_id, conversation_history)
             
             # Generate answer
-            answer, metadata = await self.llm_client.generate_answer(
-                question=request.question,
-                context_sources=sources,
-                conversation_history=history
-            )
+            try:
+                with stage_timer("generation"):
+                    answer, metadata = await self.llm_client.generate_answer(
+                        question=request.question,
+                        context_sources=sources,
+                        conversation_history=history,
+                        deadline=deadline,
+                        system_prompt=self._system_prompt(tenant),
+                        conversation_summary=summary
+                    )
+            except DeadlineExceeded:
+                logger.warning("Generation timed out; returning sources only")
+                set_context_field("degraded", True)
+                return ChatResponse(
+                    message_id=uuid4(),
+                    conversation_id=conv_id,
+                    answer=self.DEGRADED_ANSWER.format(name=self._display_name(tenant)),
+                    sources=self._format_sources(sources, space),
+                    confidence=0.0,
+                    model_used=self.llm_client.llm.model_name,
+                    tokens_used=0,
+                    degraded=True
+                )
             
             # Update conversation history
-            history.append({"role": "user", "content": request.question})
-            history.append({"role": "assistant", "content": answer})
-            self._conversation_store[conv_id] = history[-10:]  # Keep last 10 messages
+            if record_history:
+                self.record_turn(conv_id, request.question, answer)
             
             # Format sources for response
-            source_docs = [
-                SourceDocument(
-                    content=content,
-                    metadata=metadata,
-                    relevance_score=round(1.0 - (score / 2.0), 2)  # Normalize score
-                )
-                for content, metadata, score in sources
-            ]
+            source_docs = self._format_sources(sources, space)
             
             # Calculate confidence
-            confidence = self._calculate_confidence(sources, answer)
+            confidence = self._calculate_confidence(sources, answer, space)
             
             return ChatResponse(
                 message_id=uuid4(),
@@ -124,73 +277,145 @@ class ChatService:
             )
             
         except Exception as e:
-            logger.error(f"Error processing question: {e}", exc_info=True)
+            if not isinstance(e, (DeadlineExceeded, TokenBudgetExceeded)):
+                logger.error(f"Error processing question: {e}", exc_info=True)
             raise
     
     async def ask_question_stream(
         self,
         request: ChatRequest,
-        conversation_history: Optional[list[dict]] = None
+        conversation_history: Optional[list[dict]] = None,
+        deadline: Optional[Deadline] = None,
+        tenant: Optional[Tenant] = None
     ) -> AsyncIterator[str]:
         """
         Process a question and stream the answer
+        
+        The stream ends early (after what was already sent) if the deadline passes.
         """
         try:
-            logger.info(f"Streaming answer for question: {request.question[:100]}...")
+            logger.debug("Streaming answer for question: %.100s", request.question)
+            if request.conversation_id:
+                set_usage_conversation(request.conversation_id)
+            await get_usage_accountant().check_budget()
             
             # Retrieve relevant context
-            sources = await self.vector_store.similarity_search(
-                query=request.question,
-                k=4
-            )
+            async with self._use_vector_store(tenant) as vector_store:
+                with stage_timer("retrieval"):
+                    sources = await vector_store.similarity_search(
+                        query=request.question,
+                        k=4,
+                        deadline=deadline,
+                        where=build_where(request.filter)
+                    )
             
             if not sources:
-                yield "I don't have enough information to answer that question. Could you ask something else about Ashish's background, skills, or experience?"
+                yield self.NO_SOURCES_ANSWER.format(name=self._display_name(tenant))
                 return
             
-            # Get conversation history
+            # Get conversation history (running summary + recent turns)
             conv_id = request.conversation_id or uuid4()
-            history = conversation_history or self._conversation_store.get(conv_id, [])
+            set_context_field("conversation_id", str(conv_id))
+            set_usage_conversation(conv_id)
+            summary, history = self._conversation_context(conv_id, conversation_history)
             
             # Stream answer
             full_answer = ""
-            async for chunk in self.llm_client.generate_answer_stream(
-                question=request.question,
-                context_sources=sources,
-                conversation_history=history
-            ):
-                full_answer += chunk
-                yield chunk
+            try:
+                async for chunk in self.llm_client.generate_answer_stream(
+                    question=request.question,
+                    context_sources=sources,
+                    conversation_history=history,
+                    deadline=deadline,
+                    system_prompt=self._system_prompt(tenant),
+                    conversation_summary=summary
+                ):
+                    full_answer += chunk
+                    yield chunk
+            except DeadlineExceeded:
+                logger.warning("Streaming generation timed out")
+                set_context_field("degraded", True)
+                if not full_answer:
+                    raise
+                return
             
             # Update conversation history
-            history.append({"role": "user", "content": request.question})
-            history.append({"role": "assistant", "content": full_answer})
-            self._conversation_store[conv_id] = history[-10:]
+            self.record_turn(conv_id, request.question, full_answer)
             
         except Exception as e:
             logger.error(f"Error streaming answer: {e}", exc_info=True)
             raise
     
+    async def precompute_answer(self, question: str) -> AnswerEntry:
+        """Run the full pipeline for a question and package it for the answer table"""
+        response = await self.ask_question(
+            ChatRequest(question=question),
+            use_answer_table=False,
+            record_history=False
+        )
+        embedding = await self.vector_store.embeddings_manager.embed_text(question)
+        return AnswerEntry(
+            question=question,
+            answer=response.answer,
+            sources=[source.model_dump() for source in response.sources],
+            confidence=response.confidence,
+            model_used=response.model_used,
+            index_version=self.vector_store.get_index_version(),
+            embedding=embedding,
+        )
+    
+    async def refresh_answer_table(self) -> int:
+        """
+        Regenerate precomputed answers if the index changed
+        
+        Only the process that switched the index should call this; API
+        processes reload the file it writes.
+        
+        Returns:
+            Number of entries generated
+        """
+        if self.answer_table is None or not len(self.answer_table):
+            return 0
+        if not self.answer_table.is_stale(self.vector_store.get_index_version()):
+            return 0
+        
+        logger.info("Index version changed; regenerating precomputed answers")
+        return await self.answer_table.regenerate(self.precompute_answer)
+    
+    def _conversation_context(
+        self,
+        conversation_id: UUID,
+        conversation_history: Optional[list[dict]] = None
+    ) -> tuple[str, list[dict]]:
+        """Summary and recent messages for the prompt (explicit history wins)"""
+        if conversation_history:
+            return "", conversation_history
+        return self.conversations.context(conversation_id)
+    
+    def record_turn(
+        self,
+        conversation_id: UUID,
+        question: str,
+        answer: str
+    ) -> None:
+        """Append a question/answer pair; older turns are summarized in the background"""
+        self.conversations.record_turn(conversation_id, question, answer)
+    
     async def get_conversation_summary(self, conversation_id: UUID) -> Optional[str]:
         """
-        Get a summary of a conversation
+        Get the running summary of a conversation
         
         Args:
             conversation_id: Conversation ID
             
         Returns:
-            Summary text or None
+            Summary text ("" while every turn still fits the recent window),
+            or None if the conversation does not exist
         """
-        history = self._conversation_store.get(conversation_id)
-        if not history:
-            return None
-        
-        try:
-            summary = await self.llm_client.summarize_conversation(history)
-            return summary
-        except Exception as e:
-            logger.error(f"Failed to summarize conversation: {e}")
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
             return None
+        return conversation.summary
     
     def clear_conversation(self, conversation_id: UUID) -> bool:
         """
@@ -202,14 +427,11 @@ class ChatService:
         Returns:
             True if conversation was found and cleared
         """
-        if conversation_id in self._conversation_store:
-            del self._conversation_store[conversation_id]
-            return True
-        return False
+        return self.conversations.clear(conversation_id)
     
     def get_conversation_count(self) -> int:
         """Get number of active conversations"""
-        return len(self._conversation_store)
+        return len(self.conversations)
 
 
 # Singleton instance
@@ -0,0 +1,144 @@
+"""
+Conversation Memory
+Recent turns verbatim, older turns folded into a rolling summary
+
+Answering never waits for the summarizer. After a turn is recorded, once
+``summary_batch`` messages have aged out of the recent window, a
+background task merges them into the conversation's summary and drops
+them. Prompts therefore carry at most the summary plus
+``recent_messages`` messages, however long the conversation runs.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+from uuid import UUID
+
+from src.core.metrics import get_metrics
+from src.core.usage import copy_usage_scope, spawn_background
+
+logger = logging.getLogger(__name__)
+
+metrics = get_metrics()
+summary_updates = metrics.counter(
+    "conversation_summaries_total", "Rolling summary updates by outcome"
+)
+summary_duration = metrics.histogram(
+    "conversation_summary_ms", "Duration of a rolling summary update"
+)
+messages_dropped = metrics.counter(
+    "conversation_messages_dropped_total",
+    "Messages discarded unsummarized because the summarizer fell behind"
+)
+
+# (previous summary, messages to fold in) -> new summary
+Summarizer = Callable[[str, list[dict]], Awaitable[str]]
+
+
+@dataclass
+class Conversation:
+    """Messages not yet summarized, and the summary of everything before them"""
+
+    messages: list[dict] = field(default_factory=list)
+    summary: str = ""
+    summarized_messages: int = 0  # Messages folded into the summary so far
+    summarizing: bool = False
+
+
+class ConversationStore:
+    """
+    In-memory conversations with background summarization
+
+    Summarized messages are removed by position, counted from the start
+    of the conversation, so turns recorded while the summarizer runs are
+    never lost.
+    """
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        recent_messages: int = 6,
+        summary_batch: int = 4,
+        max_messages: int = 40
+    ) -> None:
+        self.summarize = summarize
+        self.recent_messages = recent_messages
+        self.summary_batch = summary_batch
+        self.max_messages = max(max_messages, recent_messages + summary_batch)
+        self._conversations: dict[UUID, Conversation] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def get(self, conversation_id: UUID) -> Optional[Conversation]:
+        return self._conversations.get(conversation_id)
+
+    def has_history(self, conversation_id: Optional[UUID]) -> bool:
+        conversation = self._conversations.get(conversation_id)
+        return conversation is not None and bool(conversation.messages or conversation.summary)
+
+    def context(self, conversation_id: UUID) -> tuple[str, list[dict]]:
+        """Summary and recent messages to send with the next question"""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return "", []
+        return conversation.summary, conversation.messages[-self.recent_messages:]
+
+    def record_turn(self, conversation_id: UUID, question: str, answer: str) -> None:
+        """Append a question/answer pair and summarize in the background if due"""
+        conversation = self._conversations.setdefault(conversation_id, Conversation())
+        conversation.messages.append({"role": "user", "content": question})
+        conversation.messages.append({"role": "assistant", "content": answer})
+
+        overflow = len(conversation.messages) - self.max_messages
+        if overflow > 0:
+            del conversation.messages[:overflow]
+            conversation.summarized_messages += overflow
+            messages_dropped.inc(overflow)
+
+        due = len(conversation.messages) - self.recent_messages >= self.summary_batch
+        if due and not conversation.summarizing:
+            conversation.summarizing = True
+            # Charged to the conversation's own key, as it was when the turn was recorded
+            task = spawn_background(self._fold(conversation), copy_usage_scope())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, conversation: Conversation) -> None:
+        """Merge everything older than the recent window into the summary"""
+        try:
+            while True:
+                count = len(conversation.messages) - self.recent_messages
+                if count < self.summary_batch:
+                    return
+                start = time.perf_counter()
+                folded_until = conversation.summarized_messages + count
+                try:
+                    summary = await self.summarize(
+                        conversation.summary, conversation.messages[:count]
+                    )
+                except Exception as e:
+                    summary_updates.inc(outcome="error")
+                    logger.warning(f"Conversation summary update failed: {e}")
+                    return
+                summary_duration.observe((time.perf_counter() - start) * 1000)
+                summary_updates.inc(outcome="ok")
+
+                # Messages dropped by the cap meanwhile are already gone
+                remove = folded_until - conversation.summarized_messages
+                if remove > 0:
+                    del conversation.messages[:remove]
+                    conversation.summarized_messages = folded_until
+                conversation.summary = summary
+        finally:
+            conversation.summarizing = False
+
+    def clear(self, conversation_id: UUID) -> bool:
+        return self._conversations.pop(conversation_id, None) is not None
+
+    async def wait_idle(self) -> None:
+        """Wait for running summary updates"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
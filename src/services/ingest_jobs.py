@@ -0,0 +1,396 @@
+"""
+Ingestion Jobs
+Durable queue of re-index jobs, drained by a separate worker process
+
+The API only enqueues; ``python scripts/ingest_worker.py`` claims jobs
+under a lease, so a job whose worker crashed is picked up again once the
+lease runs out. Job records carry their own checkpoint (the version being
+built and how many chunks are in it), which is what makes them resumable.
+Cancellation is a separate flag, so the worker's progress writes cannot
+overwrite it.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Optional
+
+from src.config.settings import get_settings
+
+settings = get_settings()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+@dataclass
+class IngestJob:
+    """A re-index of the default knowledge base or one tenant's"""
+
+    job_id: str
+    tenant_id: Optional[str] = None
+    status: str = QUEUED
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    updated_at: Optional[float] = None
+    worker: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    # Checkpoint
+    collection: Optional[str] = None  # Version being built
+    corpus_hash: Optional[str] = None
+    index_version: Optional[str] = None
+    chunks_done: int = 0  # Chunks (in corpus order) already written to ``collection``
+    chunks_total: Optional[int] = None
+    batches_done: int = 0
+
+    @classmethod
+    def from_json(cls, record: str) -> "IngestJob":
+        data = json.loads(record)
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["progress"] = (
+            round(self.chunks_done / self.chunks_total, 4) if self.chunks_total else None
+        )
+        return data
+
+
+class SQLiteJobStore:
+    """Jobs in a SQLite file on a volume shared by the API and the worker"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            " job_id TEXT PRIMARY KEY, record TEXT NOT NULL, created_at REAL NOT NULL,"
+            " lease_owner TEXT, lease_until REAL NOT NULL DEFAULT 0,"
+            " cancel_requested INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    async def _run(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        def run():
+            with self._lock, self._conn:
+                return self._conn.execute(sql, params)
+        return await asyncio.to_thread(run)
+
+    async def save(self, job: IngestJob) -> None:
+        await self._run(
+            "INSERT INTO ingest_jobs (job_id, record, created_at) VALUES (?, ?, ?)"
+            " ON CONFLICT (job_id) DO UPDATE SET record = excluded.record",
+            (job.job_id, job.to_json(), job.created_at),
+        )
+
+    async def create(self, job: IngestJob) -> bool:
+        cursor = await self._run(
+            "INSERT INTO ingest_jobs (job_id, record, created_at) VALUES (?, ?, ?)"
+            " ON CONFLICT (job_id) DO NOTHING",
+            (job.job_id, job.to_json(), job.created_at),
+        )
+        return cursor.rowcount == 1
+
+    async def load(self, job_id: str) -> Optional[IngestJob]:
+        row = (await self._run(
+            "SELECT record FROM ingest_jobs WHERE job_id = ?", (job_id,)
+        )).fetchone()
+        return IngestJob.from_json(row[0]) if row else None
+
+    async def list(self) -> list[IngestJob]:
+        rows = (await self._run(
+            "SELECT record FROM ingest_jobs ORDER BY created_at"
+        )).fetchall()
+        return [IngestJob.from_json(row[0]) for row in rows]
+
+    async def delete(self, job_id: str) -> None:
+        await self._run("DELETE FROM ingest_jobs WHERE job_id = ?", (job_id,))
+
+    async def acquire(self, job_id: str, owner: str, seconds: float) -> bool:
+        now = time.time()
+        cursor = await self._run(
+            "UPDATE ingest_jobs SET lease_owner = ?, lease_until = ?"
+            " WHERE job_id = ? AND (lease_until < ? OR lease_owner = ?)",
+            (owner, now + seconds, job_id, now, owner),
+        )
+        return cursor.rowcount == 1
+
+    async def renew(self, job_id: str, owner: str, seconds: float) -> bool:
+        cursor = await self._run(
+            "UPDATE ingest_jobs SET lease_until = ? WHERE job_id = ? AND lease_owner = ?",
+            (time.time() + seconds, job_id, owner),
+        )
+        return cursor.rowcount == 1
+
+    async def release(self, job_id: str, owner: str) -> None:
+        await self._run(
+            "UPDATE ingest_jobs SET lease_owner = NULL, lease_until = 0"
+            " WHERE job_id = ? AND lease_owner = ?",
+            (job_id, owner),
+        )
+
+    async def request_cancel(self, job_id: str) -> None:
+        await self._run(
+            "UPDATE ingest_jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,)
+        )
+
+    async def cancel_requested(self, job_id: str) -> bool:
+        row = (await self._run(
+            "SELECT cancel_requested FROM ingest_jobs WHERE job_id = ?", (job_id,)
+        )).fetchone()
+        return bool(row and row[0])
+
+    async def clear_cancel(self, job_id: str) -> None:
+        await self._run(
+            "UPDATE ingest_jobs SET cancel_requested = 0 WHERE job_id = ?", (job_id,)
+        )
+
+    async def close(self) -> None:
+        self._conn.close()
+
+
+# Extend (or release) a lease only while still holding it
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisJobStore:
+    """Jobs in a Redis hash (ingest:jobs), leases as expiring keys"""
+
+    name = "redis"
+
+    def __init__(self, redis_url: str) -> None:
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(
+            redis_url,
+            socket_timeout=5.0,
+            socket_connect_timeout=5.0,
+        )
+        self._renew = self._redis.register_script(_RENEW_SCRIPT)
+        self._release = self._redis.register_script(_RELEASE_SCRIPT)
+
+    async def save(self, job: IngestJob) -> None:
+        await self._redis.hset("ingest:jobs", job.job_id, job.to_json())
+
+    async def create(self, job: IngestJob) -> bool:
+        return bool(await self._redis.hsetnx("ingest:jobs", job.job_id, job.to_json()))
+
+    async def load(self, job_id: str) -> Optional[IngestJob]:
+        record = await self._redis.hget("ingest:jobs", job_id)
+        return IngestJob.from_json(record) if record else None
+
+    async def list(self) -> list[IngestJob]:
+        records = await self._redis.hvals("ingest:jobs")
+        return sorted(
+            (IngestJob.from_json(record) for record in records),
+            key=lambda job: job.created_at,
+        )
+
+    async def delete(self, job_id: str) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hdel("ingest:jobs", job_id)
+        pipe.srem("ingest:cancel", job_id)
+        await pipe.execute()
+
+    async def acquire(self, job_id: str, owner: str, seconds: float) -> bool:
+        key = f"ingest:lease:{job_id}"
+        if await self._redis.set(key, owner, nx=True, px=int(seconds * 1000)):
+            return True
+        return await self.renew(job_id, owner, seconds)
+
+    async def renew(self, job_id: str, owner: str, seconds: float) -> bool:
+        return bool(await self._renew(
+            keys=[f"ingest:lease:{job_id}"], args=[owner, int(seconds * 1000)]
+        ))
+
+    async def release(self, job_id: str, owner: str) -> None:
+        await self._release(keys=[f"ingest:lease:{job_id}"], args=[owner])
+
+    async def request_cancel(self, job_id: str) -> None:
+        await self._redis.sadd("ingest:cancel", job_id)
+
+    async def cancel_requested(self, job_id: str) -> bool:
+        return bool(await self._redis.sismember("ingest:cancel", job_id))
+
+    async def clear_cancel(self, job_id: str) -> None:
+        await self._redis.srem("ingest:cancel", job_id)
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+class IngestJobQueue:
+    """Enqueue, inspect, cancel and claim ingestion jobs"""
+
+    def __init__(self, store, retained: int = 50) -> None:
+        self.store = store
+        self.retained = retained
+
+    async def enqueue(self, tenant_id: Optional[str] = None) -> tuple[IngestJob, bool]:
+        """
+        Queue a re-index unless one for the same target is already pending
+
+        Returns:
+            (job, created); created is False when an existing job was returned
+        """
+        jobs = await self.store.list()
+        for job in jobs:
+            if job.tenant_id == tenant_id and job.status in ACTIVE_STATES:
+                return job, False
+
+        job = IngestJob(job_id=uuid.uuid4().hex, tenant_id=tenant_id, created_at=time.time())
+        await self.store.save(job)
+        await self._prune(jobs)
+        return job, True
+
+    async def enqueue_initial(self, tenant_id: Optional[str] = None) -> tuple[IngestJob, bool]:
+        """
+        Queue the first build of an empty store, once for all replicas
+
+        The job has a fixed ID per target and is created atomically, so
+        replicas starting together against the same empty store all get
+        the same job, and only the one holding its lease builds the index.
+
+        Returns:
+            (job, created); created is False when an existing job was returned
+        """
+        job_id = f"initial-{tenant_id or settings.default_tenant}"
+        job = IngestJob(job_id=job_id, tenant_id=tenant_id, created_at=time.time())
+        if await self.store.create(job):
+            return job, True
+
+        existing = await self.store.load(job_id)
+        if existing is None or existing.status in ACTIVE_STATES:
+            return existing or job, False
+
+        # Finished before, yet the store is empty again: queue it anew
+        owner = f"enqueue-{uuid.uuid4().hex}"
+        if not await self.store.acquire(job_id, owner, 30.0):
+            return existing, False  # Another replica is queueing it
+        try:
+            current = await self.store.load(job_id)
+            if current is not None and current.status in ACTIVE_STATES:
+                return current, False
+            if current is not None and current.status == FAILED:
+                # Continue from its checkpoint
+                current.status = QUEUED
+                current.error = None
+                job = current
+            await self.store.clear_cancel(job_id)
+            await self.store.save(job)
+            return job, True
+        finally:
+            await self.store.release(job_id, owner)
+
+    async def _prune(self, jobs: list[IngestJob]) -> None:
+        finished = [job for job in jobs if job.status not in ACTIVE_STATES and job.status != FAILED]
+        for job in finished[:max(0, len(finished) - self.retained)]:
+            await self.store.delete(job.job_id)
+
+    async def get(self, job_id: str) -> Optional[IngestJob]:
+        return await self.store.load(job_id)
+
+    async def list(self, limit: int = 50) -> list[IngestJob]:
+        """Most recent jobs first"""
+        return list(reversed(await self.store.list()))[:limit]
+
+    async def cancel(self, job_id: str, owner: str = "api") -> Optional[IngestJob]:
+        """
+        Cancel a job
+
+        A queued job is cancelled at once; a running one stops after its
+        current batch. Failed jobs are cancelled too, dropping their
+        partial version (the worker does that when it next sees them).
+        """
+        job = await self.store.load(job_id)
+        if job is None or job.status in (SUCCEEDED, CANCELLED):
+            return job
+        await self.store.request_cancel(job_id)
+        if job.status == QUEUED and job.collection is None:
+            if await self.store.acquire(job_id, owner, 5.0):
+                try:
+                    job = await self.store.load(job_id)
+                    if job.status == QUEUED:
+                        job.status = CANCELLED
+                        job.finished_at = time.time()
+                        await self.store.save(job)
+                finally:
+                    await self.store.release(job_id, owner)
+        return job
+
+    async def resume(self, job_id: str) -> Optional[IngestJob]:
+        """Queue a failed job again; it continues from its checkpoint"""
+        job = await self.store.load(job_id)
+        if job is None or job.status != FAILED:
+            return job
+        job.status = QUEUED
+        job.error = None
+        await self.store.clear_cancel(job_id)
+        await self.store.save(job)
+        return job
+
+    async def claim(self, owner: str, lease_seconds: float) -> Optional[IngestJob]:
+        """
+        Lease the oldest job that needs a worker
+
+        Queued jobs, running jobs whose worker lost its lease, and failed
+        jobs with a pending cancellation (to clean them up) qualify.
+        """
+        for job in await self.store.list():
+            if job.status not in ACTIVE_STATES and not (
+                job.status == FAILED and await self.store.cancel_requested(job.job_id)
+            ):
+                continue
+            if await self.store.acquire(job.job_id, owner, lease_seconds):
+                # Re-read under the lease; it may have finished meanwhile
+                current = await self.store.load(job.job_id)
+                if current is not None and current.status in (QUEUED, RUNNING, FAILED):
+                    return current
+                await self.store.release(job.job_id, owner)
+        return None
+
+
+def _create_store():
+    if settings.ingest_job_store == "redis":
+        return RedisJobStore(settings.redis_url)
+    return SQLiteJobStore(settings.ingest_job_sqlite_path)
+
+
+# Singleton instance
+_ingest_queue: Optional[IngestJobQueue] = None
+
+
+def get_ingest_queue() -> IngestJobQueue:
+    """Get or create ingestion job queue singleton"""
+    global _ingest_queue
+    if _ingest_queue is None:
+        _ingest_queue = IngestJobQueue(_create_store(), retained=settings.ingest_jobs_retained)
+    return _ingest_queue
@@ -0,0 +1,388 @@
+"""
+Ingestion Worker
+Runs queued re-index jobs outside the API process
+
+Each job builds a new collection version batch by batch and records a
+checkpoint after every write. A restarted job skips the chunks already
+in its version (they come out of the loaders in a stable order) and
+carries on; if the knowledge base changed in between it starts over.
+The version is switched to only when complete, and API processes follow
+the switch on their own. The worker that switched the default knowledge
+base then regenerates the precomputed answers once for every process.
+
+``ingest_data`` is the same re-index run in the calling process, for the
+CLI and for API processes without a worker.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import socket
+import time
+from collections import deque
+from typing import Optional
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+from src.services.ingest_jobs import (
+    ACTIVE_STATES,
+    CANCELLED,
+    FAILED,
+    RUNNING,
+    SUCCEEDED,
+    IngestJob,
+    IngestJobQueue,
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+metrics = get_metrics()
+jobs_finished = metrics.counter("ingest_jobs_total", "Ingestion jobs finished, by outcome")
+batches_written = metrics.counter("ingest_batches_total", "Batches embedded and written by jobs")
+batch_duration = metrics.histogram("ingest_batch_ms", "Time to embed and write one batch")
+
+
+class JobCancelled(Exception):
+    """Cancellation was requested for the running job"""
+
+
+class RatePacer:
+    """Spaces out work to at most ``per_second`` units (0 = unlimited)"""
+
+    def __init__(self, per_second: float) -> None:
+        self.per_second = per_second
+        self._next = 0.0
+
+    async def wait(self, units: int) -> None:
+        if self.per_second <= 0:
+            return
+        now = time.monotonic()
+        delay = self._next - now
+        self._next = max(now, self._next) + units / self.per_second
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class IngestWorker:
+    """
+    Claims jobs from the queue and runs up to ``concurrency`` at once
+
+    Leases are renewed in the background; when one is lost the job is
+    abandoned without touching its record, since another worker owns it.
+    """
+
+    def __init__(
+        self,
+        queue: IngestJobQueue,
+        concurrency: int = 1,
+        embed_concurrency: int = 2,
+        max_chunks_per_second: float = 0.0,
+        lease_seconds: float = 30.0,
+        poll_interval: float = 2.0,
+        batch_size: Optional[int] = None
+    ) -> None:
+        self.queue = queue
+        self.store = queue.store
+        self.concurrency = concurrency
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.max_chunks_per_second = max_chunks_per_second
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._running: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop claiming; running jobs are cancelled and resume elsewhere"""
+        self._stopping.set()
+
+    async def run(self, once: bool = False) -> None:
+        """
+        Poll for jobs until stopped
+
+        Args:
+            once: Return when the queue is empty and nothing is running
+        """
+        logger.info(f"Ingest worker {self.owner} polling every {self.poll_interval}s")
+        try:
+            while not self._stopping.is_set():
+                while len(self._running) < self.concurrency:
+                    job = await self.queue.claim(self.owner, self.lease_seconds)
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self._run_leased(job))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+
+                if once and not self._running:
+                    return
+                waiters = [asyncio.ensure_future(self._stopping.wait())]
+                await asyncio.wait(
+                    waiters + list(self._running),
+                    timeout=self.poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                waiters[0].cancel()
+        finally:
+            for task in list(self._running):
+                task.cancel()
+            if self._running:
+                await asyncio.wait(self._running)
+
+    async def run_one(self, job_id: str) -> bool:
+        """
+        Run one job in this process, unless another holds its lease
+
+        Returns:
+            Whether the job was run here
+        """
+        if not await self.store.acquire(job_id, self.owner, self.lease_seconds):
+            return False
+        job = await self.store.load(job_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            await self.store.release(job_id, self.owner)
+            return False
+        await self._run_leased(job)
+        return True
+
+    async def _run_leased(self, job: IngestJob) -> None:
+        job_task = asyncio.current_task()
+        lost = False
+
+        async def keep_lease():
+            nonlocal lost
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                try:
+                    renewed = await self.store.renew(job.job_id, self.owner, self.lease_seconds)
+                except Exception as e:
+                    logger.warning(f"Renewing lease of job {job.job_id} failed: {e}")
+                    continue
+                if not renewed:
+                    lost = True
+                    job_task.cancel()
+                    return
+
+        heartbeat = asyncio.create_task(keep_lease())
+        try:
+            await self.run_job(job)
+        except asyncio.CancelledError:
+            if lost:
+                logger.warning(f"Lost the lease of job {job.job_id}; another worker has it")
+            else:
+                logger.info(f"Job {job.job_id} interrupted at {job.chunks_done} chunks")
+        finally:
+            heartbeat.cancel()
+            if not lost:
+                try:
+                    await self.store.release(job.job_id, self.owner)
+                except Exception as e:
+                    logger.warning(f"Releasing lease of job {job.job_id} failed: {e}")
+
+    async def run_job(self, job: IngestJob) -> None:
+        """Run (or resume) one leased job to completion, cancellation or failure"""
+        from src.core.rag.loaders import iter_documents
+        from src.core.rag.snapshot import (
+            compute_corpus_hash,
+            compute_index_version,
+            get_index_config,
+        )
+        from src.services.tenants import resolve_target
+
+        vector_store, data_path = resolve_target(settings.knowledge_base_directory, job.tenant_id)
+        try:
+            if await self.store.cancel_requested(job.job_id):
+                raise JobCancelled()
+
+            corpus_hash = await asyncio.to_thread(compute_corpus_hash, data_path)
+            resumable = (
+                job.collection is not None
+                and job.corpus_hash == corpus_hash
+                and await asyncio.to_thread(vector_store.has_version, job.collection)
+            )
+            if not resumable:
+                if job.collection is not None:
+                    logger.info(f"Job {job.job_id}: knowledge base changed; starting over")
+                    await asyncio.to_thread(vector_store.discard_version, job.collection)
+                job.corpus_hash = corpus_hash
+                job.index_version = compute_index_version(corpus_hash, get_index_config())
+                job.collection = await asyncio.to_thread(
+                    vector_store.create_version, job.index_version
+                )
+                job.chunks_done = 0
+                job.batches_done = 0
+                job.chunks_total = await asyncio.to_thread(
+                    lambda: sum(1 for _ in vector_store.iter_chunks(iter_documents(data_path)))
+                )
+
+            job.status = RUNNING
+            job.worker = self.owner
+            job.attempts += 1
+            job.started_at = job.started_at or time.time()
+            job.updated_at = time.time()
+            await self.store.save(job)
+            if job.chunks_done:
+                logger.info(f"Job {job.job_id}: resuming at chunk {job.chunks_done}/{job.chunks_total}")
+
+            chunks = vector_store.iter_chunks(iter_documents(data_path))
+            await self._write_batches(
+                job, vector_store, itertools.islice(chunks, job.chunks_done, None)
+            )
+
+            count = await asyncio.to_thread(
+                lambda: vector_store.client.get_collection(job.collection).count()
+            )
+            vector_store.record_version(job.collection, job.index_version, count)
+            await vector_store.activate_version(job.collection)
+
+            job.status = SUCCEEDED
+            logger.info(f"Job {job.job_id}: {job.collection} is now active ({count} chunks)")
+        except JobCancelled:
+            if job.collection is not None:
+                await asyncio.to_thread(vector_store.discard_version, job.collection)
+            job.status = CANCELLED
+            logger.info(f"Job {job.job_id} cancelled")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.status = FAILED
+            job.error = f"{type(e).__name__}: {e}"
+            logger.error(f"Job {job.job_id} failed: {e}", exc_info=True)
+
+        jobs_finished.inc(outcome=job.status)
+        job.finished_at = job.updated_at = time.time()
+        await self.store.save(job)
+        if job.status == SUCCEEDED and job.tenant_id is None:
+            await refresh_answer_table()
+
+    async def _write_batches(self, job: IngestJob, vector_store, chunks) -> None:
+        """
+        Embed up to ``embed_concurrency`` batches ahead, write them in order,
+        and checkpoint after each write
+        """
+        pacer = RatePacer(self.max_chunks_per_second)
+        pending: deque = deque()
+
+        def batches():
+            while True:
+                raw = list(itertools.islice(chunks, self.batch_size))
+                if not raw:
+                    return
+                # Identical chunk at the same position; Chroma rejects duplicate IDs
+                unique = {metadata["chunk_id"]: (chunk, metadata) for chunk, metadata in raw}
+                yield list(unique.values()), len(raw)
+
+        async def embed(batch):
+            started = time.perf_counter()
+            return (*await vector_store._embed_batch(batch), started)
+
+        async def write_next():
+            task, consumed = pending.popleft()
+            ids, texts, metadatas, embeddings, started = await task
+            await vector_store.write_version_batch(job.collection, ids, texts, metadatas, embeddings)
+            batch_duration.observe((time.perf_counter() - started) * 1000)
+            batches_written.inc()
+
+            job.chunks_done += consumed
+            job.batches_done += 1
+            job.updated_at = time.time()
+            await self.store.save(job)
+            if await self.store.cancel_requested(job.job_id):
+                raise JobCancelled()
+
+        try:
+            for batch, consumed in batches():
+                await pacer.wait(len(batch))
+                pending.append((asyncio.create_task(embed(batch)), consumed))
+                if len(pending) >= self.embed_concurrency:
+                    await write_next()
+            while pending:
+                await write_next()
+        finally:
+            for task, _ in pending:
+                task.cancel()
+
+
+async def refresh_answer_table() -> None:
+    """Regenerate precomputed answers for a new index, charged to the system key"""
+    if not settings.answer_table_enabled:
+        return
+    from src.core.usage import spawn_background
+    from src.services.chat_service import get_chat_service
+
+    try:
+        await spawn_background(get_chat_service().refresh_answer_table())
+    except Exception as e:
+        logger.error(f"Regenerating precomputed answers failed: {e}", exc_info=True)
+
+
+async def ingest_data(data_dir: str = "./data/knowledge_base", tenant_id: Optional[str] = None):
+    """
+    Re-index a knowledge base in this process
+
+    With ``tenant_id`` the tenant's own knowledge base and collection are
+    used and ``data_dir`` is ignored.
+
+    Steps (streamed, so memory stays flat however large the corpus is):
+    1. Lazily load supported files (markdown, text, HTML, PDF, JSONL)
+    2. Split into chunks
+    3. Create embeddings in bounded batches
+    4. Store in a new collection version and switch the alias to it
+    """
+    from src.core.rag.loaders import iter_documents, supported_suffixes
+    from src.core.rag.snapshot import (
+        compute_corpus_hash,
+        compute_index_version,
+        get_index_config,
+    )
+    from src.services.tenants import resolve_target
+
+    try:
+        vector_store, data_path = resolve_target(data_dir, tenant_id)
+
+        # Load documents
+        logger.info(f"📂 Loading documents from: {data_path}")
+
+        documents = iter_documents(data_path)
+        first = next(documents, None)
+
+        if first is None:
+            logger.warning(f"⚠️  No documents found! Supported: {', '.join(sorted(supported_suffixes()))}")
+            return
+
+        # Version the index so derived data (e.g. precomputed answers) can detect staleness
+        index_version = compute_index_version(compute_corpus_hash(data_path), get_index_config())
+
+        # Build a new collection version and switch to it once complete
+        logger.info("💾 Indexing documents into a new collection version...")
+        collection_name = await vector_store.reindex(
+            documents=itertools.chain([first], documents),
+            index_version=index_version
+        )
+
+        logger.info(f"✅ Collection {collection_name} is now active")
+
+        # Show stats
+        stats = await vector_store.get_collection_stats()
+        logger.info(f"📊 Collection now has {stats.get('count', 0)} total chunks")
+
+    except Exception as e:
+        logger.error(f"❌ Ingestion failed: {e}", exc_info=True)
+        raise
+
+    if tenant_id is None:
+        await refresh_answer_table()
+
+
+def create_worker(queue: IngestJobQueue) -> IngestWorker:
+    """Worker configured from settings"""
+    return IngestWorker(
+        queue,
+        concurrency=settings.ingest_worker_concurrency,
+        embed_concurrency=settings.ingest_embed_concurrency,
+        max_chunks_per_second=settings.ingest_max_chunks_per_second,
+        lease_seconds=settings.ingest_lease_seconds,
+        poll_interval=settings.ingest_poll_interval,
+    )
@@ -0,0 +1,314 @@
+"""
+Tenants
+Per-profile knowledge bases, collections and prompts, loaded on demand
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+
+from src.config.settings import get_settings
+from src.core.metrics import get_metrics
+from src.core.rag.vector_store import VectorStoreManager, get_vector_store_manager
+from src.core.usage import spawn_background
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TENANT_HEADER = "X-Tenant-ID"
+
+# Leaves room in Chroma's 63-character limit for the version suffix
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9](?:[a-z0-9_-]{0,38}[a-z0-9])?$")
+
+metrics = get_metrics()
+tenant_loads = metrics.histogram("tenant_load_ms", "Time to load and warm a tenant index")
+tenant_evictions = metrics.counter("tenant_evictions_total", "Tenant indexes evicted from memory")
+tenant_resident = metrics.gauge("tenant_resident_bytes", "Estimated memory of resident tenant indexes")
+
+
+class Tenant:
+    """One hosted profile"""
+
+    def __init__(
+        self,
+        tenant_id: str,
+        display_name: str,
+        collection_name: str,
+        data_dir: Path,
+        system_prompt: Optional[str] = None,
+    ) -> None:
+        self.tenant_id = tenant_id
+        self.display_name = display_name
+        self.collection_name = collection_name
+        self.data_dir = data_dir
+        self.system_prompt = system_prompt
+
+    @property
+    def is_default(self) -> bool:
+        return self.tenant_id == settings.default_tenant
+
+
+def default_tenant() -> Tenant:
+    """The original single-profile deployment, configured from settings"""
+    return Tenant(
+        tenant_id=settings.default_tenant,
+        display_name=settings.default_tenant_name,
+        collection_name=settings.chroma_collection_name,
+        data_dir=Path(settings.knowledge_base_directory),
+    )
+
+
+def load_tenant(tenant_id: str) -> Optional[Tenant]:
+    """
+    Read a tenant's configuration from the tenants directory
+
+    Layout: ``<tenants_directory>/<tenant_id>/knowledge_base/*.md`` plus an
+    optional ``tenant.json`` with ``display_name`` and ``system_prompt``.
+
+    Returns:
+        The tenant, or None if it does not exist
+    """
+    if tenant_id == settings.default_tenant:
+        return default_tenant()
+    if not TENANT_ID_PATTERN.match(tenant_id):
+        return None
+
+    tenant_dir = Path(settings.tenants_directory) / tenant_id
+    if not tenant_dir.is_dir():
+        return None
+
+    config = {}
+    config_path = tenant_dir / "tenant.json"
+    if config_path.exists():
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    return Tenant(
+        tenant_id=tenant_id,
+        display_name=config.get("display_name", tenant_id),
+        collection_name=f"tenant_{tenant_id}",
+        data_dir=tenant_dir / "knowledge_base",
+        system_prompt=config.get("system_prompt"),
+    )
+
+
+def tenant_vector_store(tenant: Tenant) -> VectorStoreManager:
+    """
+    Vector store of a tenant
+
+    Tenants other than the default get their own embedded store under
+    ``<chroma_persist_directory>/tenants/<tenant_id>``, so evicting one
+    can close it and free all of its versions.
+    """
+    if tenant.is_default:
+        return get_vector_store_manager()
+    return VectorStoreManager(
+        collection_name=tenant.collection_name,
+        data_dir=tenant.data_dir,
+        persist_directory=Path(settings.chroma_persist_directory) / "tenants" / tenant.tenant_id,
+    )
+
+
+def resolve_target(
+    data_dir: str,
+    tenant_id: Optional[str] = None
+) -> tuple[VectorStoreManager, Path]:
+    """Vector store and source directory for the default knowledge base or a tenant"""
+    if tenant_id is None:
+        return get_vector_store_manager(), Path(data_dir)
+
+    tenant = load_tenant(tenant_id)
+    if tenant is None:
+        raise ValueError(f"Unknown tenant '{tenant_id}'")
+    return tenant_vector_store(tenant), tenant.data_dir
+
+
+class _Resident:
+    """A loaded tenant, its estimated memory footprint and the requests using it"""
+
+    def __init__(self, tenant: Tenant, vector_store: VectorStoreManager, size_bytes: int) -> None:
+        self.tenant = tenant
+        self.vector_store = vector_store
+        self.size_bytes = size_bytes
+        self.active = 0  # Requests holding it (see TenantRegistry.use)
+        self.evicted = False
+
+
+class TenantRegistry:
+    """
+    Lazily loaded tenant indexes in an LRU bounded by memory
+
+    A tenant's collection is opened and warmed on first use. When the
+    estimated footprint of resident tenants exceeds the budget, the least
+    recently used unpinned tenants are dropped; each one's store is closed
+    in a worker thread once the requests still using it have finished.
+    """
+
+    def __init__(self, budget_bytes: int, pinned: set[str]) -> None:
+        self.budget_bytes = budget_bytes
+        self.pinned = pinned
+        self._resident: OrderedDict[str, _Resident] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        self._switch_listeners: list[Callable[[], None]] = []
+        self._closing: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(r.size_bytes for r in self._resident.values())
+
+    def add_switch_listener(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` when any tenant's collection changes version"""
+        self._switch_listeners.append(callback)
+        for resident in self._resident.values():
+            resident.vector_store.add_switch_listener(callback)
+
+    def _load(self, tenant: Tenant) -> _Resident:
+        vector_store = tenant_vector_store(tenant)
+        for callback in self._switch_listeners:
+            vector_store.add_switch_listener(callback)
+
+        vector_store.warm()
+        return _Resident(tenant, vector_store, vector_store.estimate_memory_bytes())
+
+    def _evict(self) -> None:
+        # The most recently used tenant stays, even if it alone exceeds the budget
+        for tenant_id in list(self._resident)[:-1]:
+            if self.budget_bytes <= 0 or self.resident_bytes <= self.budget_bytes:
+                break
+            if tenant_id in self.pinned or tenant_id == settings.default_tenant:
+                continue
+            resident = self._resident.pop(tenant_id)
+            resident.evicted = True
+            if resident.active == 0:
+                self._close(resident)
+            tenant_evictions.inc()
+            logger.debug("Evicted tenant %s", tenant_id)
+        tenant_resident.set(self.resident_bytes)
+
+    def _close(self, resident: _Resident) -> None:
+        """Close an evicted tenant's store off the event loop"""
+        task = spawn_background(asyncio.to_thread(resident.vector_store.close))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @asynccontextmanager
+    async def use(self, tenant_id: str) -> AsyncIterator[Optional[_Resident]]:
+        """
+        Hold a tenant's resident entry for the duration of a request
+
+        An entry evicted meanwhile is closed only after every holder has
+        exited, so no query runs against a closed store.
+        """
+        while True:
+            resident = await self.get(tenant_id)
+            if resident is None or not resident.evicted:
+                break
+        if resident is None:
+            yield None
+            return
+
+        resident.active += 1
+        try:
+            yield resident
+        finally:
+            resident.active -= 1
+            if resident.evicted and resident.active == 0:
+                self._close(resident)
+
+    async def get(self, tenant_id: str) -> Optional[_Resident]:
+        """
+        The resident entry for a tenant, loading it if needed
+
+        Concurrent first requests for the same tenant share one load.
+
+        Returns:
+            None if the tenant does not exist
+        """
+        resident = self._resident.get(tenant_id)
+        if resident is not None:
+            self._resident.move_to_end(tenant_id)
+            self.hits += 1
+            return resident
+
+        pending = self._loading.get(tenant_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[tenant_id] = future
+        try:
+            started = time.perf_counter()
+            tenant = await asyncio.to_thread(load_tenant, tenant_id)
+            resident = None
+            if tenant is not None:
+                resident = await asyncio.to_thread(self._load, tenant)
+                self._resident[tenant_id] = resident
+                tenant_loads.observe((time.perf_counter() - started) * 1000)
+                self._evict()
+            future.set_result(resident)
+            return resident
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._loading[tenant_id]
+
+    async def warm_pinned(self) -> None:
+        """Load the default and pinned tenants up front so they never pay a cold start"""
+        for tenant_id in [settings.default_tenant, *sorted(self.pinned)]:
+            try:
+                await self.get(tenant_id)
+            except Exception as e:
+                logger.error(f"Failed to load pinned tenant {tenant_id}: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "resident": len(self._resident),
+            "resident_bytes": self.resident_bytes,
+            "budget_bytes": self.budget_bytes,
+            "pinned": sorted(self.pinned),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Singleton instance
+_tenant_registry: Optional[TenantRegistry] = None
+
+
+def get_tenant_registry() -> TenantRegistry:
+    """Get or create tenant registry singleton"""
+    global _tenant_registry
+    if _tenant_registry is None:
+        _tenant_registry = TenantRegistry(
+            budget_bytes=settings.tenant_memory_budget_mb * 1024 * 1024,
+            pinned={t.strip() for t in settings.pinned_tenants.split(",") if t.strip()},
+        )
+    return _tenant_registry
+
+
+async def get_request_tenant(request: Request) -> Tenant:
+    """
+    Dependency resolving the tenant a request is for
+
+    Requests without an X-Tenant-ID header go to the default tenant.
+    """
+    tenant_id = request.headers.get(TENANT_HEADER, settings.default_tenant)
+    resident = await get_tenant_registry().get(tenant_id)
+    if resident is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown tenant '{tenant_id}'"
+        )
+    return resident.tenant